@@ -0,0 +1,35 @@
+"""
+Scalar SCRAMSHA1 vs the NumPy batch engine, in hashes/sec.
+Run with `python benchmarks/bench_batch.py`
+"""
+import argparse
+import time
+from scram.scramsha1 import SCRAMSHA1
+from scram.batch import batch_scram_sha1
+
+SALT = 'QSXCR+Q6sek8bf92'
+
+
+def rate(func, count):
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scalar vs batch SCRAM-SHA1 throughput')
+    parser.add_argument('--iterations', default='1,4,16,64,256', help='comma separated iteration counts')
+    parser.add_argument('--batch-sizes', default='256,4096,16384', help='comma separated batch sizes')
+    args = parser.parse_args()
+
+    print(f'{"iterations":>10} {"batch":>7} {"scalar/s":>10} {"batch/s":>10} {"speedup":>8}')
+    for iterations in map(int, args.iterations.split(',')):
+        for batch_size in map(int, args.batch_sizes.split(',')):
+            plaintexts = [b'password%d' % i for i in range(batch_size)]
+            scalar = rate(lambda: [SCRAMSHA1(p, SALT, iterations) for p in plaintexts], batch_size)
+            batch = rate(lambda: batch_scram_sha1(plaintexts, SALT, iterations), batch_size)
+            print(f'{iterations:>10} {batch_size:>7} {scalar:>10.0f} {batch:>10.0f} {batch / scalar:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
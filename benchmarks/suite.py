@@ -0,0 +1,207 @@
+"""
+Throughput and latency benchmarks for scram.
+
+    python -m benchmarks.suite run -o results.json
+    python -m benchmarks.suite compare baseline.json results.json
+
+`run` writes every measurement to JSON, `compare` exits non-zero when any
+measurement regressed past the threshold against the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from base64 import b64encode
+from pathlib import Path
+from scram.scramsha1 import SCRAMSHA1
+from scram.backends import available_backends, get_backend
+
+ITERATIONS = [1, 1024, 4096, 10000]
+SALT_LENGTHS = [4, 20, 64]
+# same as the `scram` console script
+SCRAM_CMD = [sys.executable, '-c', 'from scram.scrammer import main; main()']
+DEFAULT_THRESHOLD = 0.10
+
+
+def result(value: float, unit: str, higher_is_better: bool = True):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def best_rate(func, count: int, repeat: int):
+    """
+    Best of repeat runs of func, in count per second
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count / best
+
+
+def bench_scram(iterations=ITERATIONS, salt_lengths=SALT_LENGTHS, duration: float = 0.2, repeat: int = 3):
+    """
+    SCRAMSHA1 hashes/sec for every iteration count and salt length
+    """
+    results = {}
+    for salt_len in salt_lengths:
+        salt = b64encode(b'\x5a' * salt_len).decode('utf8')
+        for count in iterations:
+            # size the loop so each timing lasts about `duration`
+            start = time.perf_counter()
+            SCRAMSHA1(b'pencil', salt, count)
+            single = max(time.perf_counter() - start, 1e-6)
+            loops = max(1, int(duration / single))
+            rate = best_rate(lambda: [SCRAMSHA1(b'pencil', salt, count) for _ in range(loops)], loops, repeat)
+            results[f'scram.iter{count}.salt{salt_len}'] = result(rate, 'hashes/s')
+    return results
+
+
+def write_wordlist(path: Path, lines: int):
+    with open(path, 'w') as file:
+        for i in range(lines):
+            file.write(f'password{i}\n')
+
+
+def run_cli(args, stdin=None):
+    start = time.perf_counter()
+    subprocess.run(SCRAM_CMD + args, stdin=stdin, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def bench_modes(lines: int = 2000, iterations: int = 1024, repeat: int = 3):
+    """
+    End-to-end single, file and stdin mode throughput of the command line tool on a generated wordlist
+    """
+    results = {}
+    common = ['-s', 'QSXCR+Q6sek8bf92', '-i', str(iterations)]
+    with tempfile.TemporaryDirectory() as tmp:
+        wordlist = Path(tmp) / 'words.txt'
+        write_wordlist(wordlist, lines)
+
+        elapsed = min(run_cli(['pencil'] + common) for _ in range(repeat))
+        results['cli.single'] = result(1 / elapsed, 'runs/s')
+
+        elapsed = min(run_cli(['-f', str(wordlist)] + common) for _ in range(repeat))
+        results['cli.file'] = result(lines / elapsed, 'lines/s')
+
+        timings = []
+        for _ in range(repeat):
+            with open(wordlist) as stdin:
+                timings.append(run_cli(common, stdin=stdin))
+        results['cli.stdin'] = result(lines / min(timings), 'lines/s')
+    return results
+
+
+def run_python(code: str):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def bench_startup(repeat: int = 10):
+    """
+    Median wall time of a one iteration `scram` call, dominated by interpreter and import time.
+    Broken down into the bare interpreter, importing the CLI, and the same call forced onto the
+    cryptography backend, which the stdlib single mode path avoids importing.
+    """
+    single = ['pencil', '-s', 'QSXCR+Q6sek8bf92', '-i', '1']
+    timings = {
+        'cli.startup': [run_cli(single) for _ in range(repeat)],
+        'cli.startup.interpreter': [run_python('pass') for _ in range(repeat)],
+        'cli.startup.import': [run_python('import scram.scrammer') for _ in range(repeat)],
+    }
+    if 'cryptography' in available_backends():
+        timings['cli.startup.cryptography'] = [run_cli(single + ['--backend', 'cryptography'])
+                                               for _ in range(repeat)]
+    return {name: result(statistics.median(values) * 1000, 'ms', higher_is_better=False)
+            for name, values in timings.items()}
+
+
+def run_suite(quick: bool = False):
+    """
+    Runs every benchmark
+    :param quick: fewer and shorter measurements
+    :return: dict ready for JSON
+    """
+    repeat = 1 if quick else 3
+    results = {}
+    if quick:
+        results.update(bench_scram([1, 4096], [20], duration=0.05, repeat=repeat))
+        results.update(bench_modes(lines=200, repeat=repeat))
+        results.update(bench_startup(repeat=3))
+    else:
+        results.update(bench_scram(repeat=repeat))
+        results.update(bench_modes(repeat=repeat))
+        results.update(bench_startup())
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'backend': get_backend().name,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD):
+    """
+    Relative change of every measurement present in both runs
+    :param baseline: run_suite output
+    :param current: run_suite output
+    :param threshold: fractional slowdown that counts as a regression
+    :return: list of (name, baseline value, current value, change, regressed)
+    """
+    rows = []
+    for name, base in sorted(baseline['results'].items()):
+        if name not in current['results']:
+            continue
+        value = current['results'][name]['value']
+        change = (value - base['value']) / base['value'] if base['value'] else 0.0
+        if not base.get('higher_is_better', True):
+            change = -change
+        rows.append((name, base['value'], value, change, change < -threshold))
+    return rows
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='scram benchmark suite')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('-o', help='JSON output file, default stdout', dest='output_file')
+    run_parser.add_argument('--quick', action='store_true', help='fewer, shorter measurements')
+    compare_parser = commands.add_parser('compare', help='flag regressions against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help='fractional slowdown counted as a regression')
+    args = parser.parse_args(args)
+
+    if args.command == 'run':
+        data = json.dumps(run_suite(args.quick), indent=2)
+        if args.output_file:
+            Path(args.output_file).write_text(data + '\n')
+        else:
+            print(data)
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    rows = compare(baseline, current, args.threshold)
+    for name, base, value, change, regressed in rows:
+        flag = 'REGRESSION' if regressed else ''
+        print(f'{name:<28} {base:>12.2f} {value:>12.2f} {change:>+8.1%} {flag}')
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+asyncio front end for SCRAM-SHA1. Derivations run on an executor so the event loop
+keeps serving other connections while PBKDF2 iterates.
+"""
+import asyncio
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Iterable, List
+from scram.scramsha1 import SCRAMSHA1, _validate, derivation_settings, init_derivation, scram_keys
+from scram.scrammer import hash_line
+from scram.parallel import cpu_count
+
+# ProcessPoolExecutor takes an initializer from 3.7 on, older workers apply the settings with their tasks
+POOL_INITIALIZER = sys.version_info >= (3, 7)
+
+_worker_settings = None
+
+
+def _task_settings():
+    """
+    derivation_settings that can be pickled into tasks
+    :return: tuple
+    """
+    backend, cache_options = derivation_settings()
+    if cache_options is not None:
+        # shared hit counters only reach workers by inheritance, pickled tasks count locally
+        cache_options = dict(cache_options, shared_counts=None)
+    return backend, cache_options
+
+
+def _with_settings(settings, func, *args):
+    # applies the settings once per worker process, then runs the task
+    global _worker_settings
+    if settings != _worker_settings:
+        init_derivation(*settings)
+        _worker_settings = settings
+    return func(*args)
+
+
+async def scramsha1(plaintext: bytes, salt: str, iterations: int, executor: Executor = None):
+    """
+    SCRAMSHA1 on an executor, arguments are validated before anything is offloaded
+    :param plaintext: plaintext data
+    :param salt: base64 encoded string
+    :param iterations: # of iterations
+    :param executor: defaults to the event loop's default executor
+    :return: bytes
+    """
+    _validate(plaintext, salt, iterations)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, SCRAMSHA1, plaintext, salt, iterations)
+
+
+class AsyncScram:
+    """
+    Runs derivations on a thread or process executor with at most `concurrency` in flight
+    """
+
+    def __init__(self, executor: Executor = None, concurrency: int = None, processes: bool = False,
+                 workers: int = None):
+        """
+        :param executor: executor to use, one is created (and owned) when None
+        :param concurrency: maximum derivations in flight, defaults to workers or the number of cores
+        :param processes: create a process pool instead of a thread pool
+        :param workers: size of the created pool
+        """
+        if concurrency is None:
+            concurrency = workers or cpu_count()
+        if concurrency < 1:
+            raise ValueError('Concurrency must be > 0')
+        self.concurrency = concurrency
+        self._owns_executor = executor is None
+        self._settings = None
+        if executor is None:
+            if processes and POOL_INITIALIZER:
+                executor = ProcessPoolExecutor(workers, initializer=init_derivation,
+                                               initargs=derivation_settings())
+            elif processes:
+                executor = ProcessPoolExecutor(workers)
+                self._settings = _task_settings()
+            else:
+                executor = ThreadPoolExecutor(workers)
+        self.executor = executor
+        self._semaphore = None
+
+    async def _run(self, func, *args):
+        # created here so it belongs to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self._settings is not None:
+            func = partial(_with_settings, self._settings, func)
+        async with self._semaphore:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self.executor, partial(func, *args))
+
+    async def scramsha1(self, plaintext: bytes, salt: str, iterations: int):
+        """
+        StoredKey, see scramsha1.SCRAMSHA1
+        :return: bytes
+        """
+        _validate(plaintext, salt, iterations)
+        return await self._run(SCRAMSHA1, plaintext, salt, iterations)
+
+    async def scram_keys(self, plaintext: bytes, salt: str, iterations: int):
+        """
+        Every SCRAM key, see scramsha1.scram_keys
+        :return: ScramKeys
+        """
+        _validate(plaintext, salt, iterations)
+        return await self._run(scram_keys, plaintext, salt, iterations)
+
+    async def hash_line(self, plaintext: bytes, salt: str = None, iterations: int = 4096, mode='hex'):
+        """
+        Formatted record, see scrammer.hash_line
+        :return: str
+        """
+        if salt is not None:
+            for count in iterations if isinstance(iterations, list) else [iterations]:
+                _validate(plaintext, salt, count)
+        return await self._run(hash_line, plaintext, salt, iterations, mode)
+
+    async def gather(self, plaintexts: Iterable[bytes], salt: str = None, iterations: int = 4096,
+                     mode='hex') -> List[str]:
+        """
+        Formatted records for many plaintexts, in input order
+        :param plaintexts: iterable of bytes
+        :param salt: b64 encoded str, a fresh salt is generated per plaintext if None
+        :param iterations: int
+        :param mode: output format
+        :return: List[str]
+        """
+        return await asyncio.gather(*(self.hash_line(plaintext, salt, iterations, mode)
+                                      for plaintext in plaintexts))
+
+    def close(self):
+        """
+        Shuts down the executor if it was created here
+        """
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
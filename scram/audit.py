@@ -0,0 +1,153 @@
+from base64 import b64decode
+from collections import defaultdict
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Tuple
+from scram.scramsha1 import SCRAMSHA1, derivation_settings, init_derivation
+from scram.parallel import DEFAULT_CHUNK_SIZE, imap_ordered, worker_pool
+from scram.rules import expand, expand_all
+
+# (b64 salt, iterations) -> {StoredKey: [target records]}
+Targets = Dict[Tuple[str, int], Dict[bytes, List[str]]]
+
+
+def parse_hashcat(record: str):
+    """
+    Parses an iterations:salt:b64hash record as written by hash_format(mode='hashcat')
+    :param record: str
+    :return: (iterations, b64 salt, StoredKey bytes)
+    """
+    try:
+        iterations, salt, stored_key = record.split(':')
+        iterations = int(iterations)
+        b64decode(salt, validate=True)
+        stored_key = b64decode(stored_key, validate=True)
+    except Exception as e:
+        raise ValueError('Invalid hashcat record {!r}: {}'.format(record, e))
+    return iterations, salt, stored_key
+
+
+def load_targets(lines: Iterable[str]) -> Targets:
+    """
+    Groups hashcat records by (salt, iterations) so every candidate is derived once per group
+    :param lines: hashcat records, blank lines are skipped
+    :return: Targets
+    """
+    targets = defaultdict(lambda: defaultdict(list))
+    for line in lines:
+        record = line.strip()
+        if not record:
+            continue
+        iterations, salt, stored_key = parse_hashcat(record)
+        targets[(salt, iterations)][stored_key].append(record)
+    return {group: dict(keys) for group, keys in targets.items()}
+
+
+def match_candidate(plaintext: bytes, targets: Targets, rules: List[str] = None) -> List[Tuple[bytes, str]]:
+    """
+    Derives the candidate once per (salt, iterations) group and looks it up in that group's keys
+    :param plaintext: candidate password
+    :param targets: Targets
+    :param rules: optional mangling rules, every candidate of the plaintext is matched
+    :return: list of (plaintext, target record)
+    """
+    hits = []
+    for candidate in (expand(plaintext, rules) if rules else [plaintext]):
+        for (salt, iterations), keys in targets.items():
+            stored_key = SCRAMSHA1(candidate, salt, iterations)
+            hits.extend((candidate, record) for record in keys.get(stored_key, ()))
+    return hits
+
+
+# targets of a pool worker, set once by _init_worker instead of shipped with every chunk
+_worker_targets = None
+
+
+def _init_worker(backend: str, cache_options: dict, targets: Targets):
+    global _worker_targets
+    init_derivation(backend, cache_options)
+    _worker_targets = targets
+
+
+def audit_pool(targets: Targets, jobs: int = None):
+    """
+    A process pool holding the targets, to share between audit calls against them
+    :param targets: Targets
+    :param jobs: worker processes, 0 or None uses every core
+    :return: multiprocessing.Pool
+    """
+    return worker_pool(jobs, initializer=_init_worker, initargs=derivation_settings() + (targets,))
+
+
+def _match_in_worker(plaintext: bytes, rules: List[str] = None):
+    return match_candidate(plaintext, _worker_targets, rules)
+
+
+def take_cracked(remaining: Targets, record: str):
+    """
+    Removes a cracked key from remaining
+    :return: every record of the key, or an empty list when it was already cracked
+    """
+    iterations, salt, stored_key = parse_hashcat(record)
+    keys = remaining.get((salt, iterations))
+    if keys is None or stored_key not in keys:
+        return []
+    records = keys.pop(stored_key)
+    if not keys:
+        del remaining[(salt, iterations)]
+    return records
+
+
+def audit(candidates: Iterable[bytes], targets: Targets, jobs: int = 1,
+          chunk_size: int = DEFAULT_CHUNK_SIZE, rules: List[str] = None, pool=None) -> Iterator[Tuple[bytes, str]]:
+    """
+    Runs every candidate against the targets. Each key is reported once, with the first
+    candidate that cracks it, and the run stops when nothing is left to crack. In a single
+    process, groups are also dropped from the derivations once all their keys are found.
+    :param candidates: iterable of candidate passwords, consumed lazily
+    :param targets: Targets, not modified
+    :param jobs: worker processes, 0 uses every core
+    :param chunk_size: candidates per worker task
+    :param rules: optional mangling rules, workers expand their own base words
+    :param pool: optional open pool of jobs workers from audit_pool with the same targets, reused
+        instead of starting one
+    :return: generator of (plaintext, target record)
+    """
+    remaining = {group: dict(keys) for group, keys in targets.items()}
+    if jobs != 1:
+        func = partial(_match_in_worker, rules=rules)
+        results = imap_ordered(func, candidates, jobs=jobs, chunk_size=chunk_size, initializer=_init_worker,
+                               initargs=derivation_settings() + (targets,), pool=pool)
+        for hits in results:
+            for plaintext, record in hits:
+                # workers match against every target, repeats of a cracked key are dropped here
+                for cracked in take_cracked(remaining, record):
+                    yield plaintext, cracked
+            if not remaining:
+                # closes a pool started here, tasks still queued on a shared one are left to finish
+                results.close()
+                return
+        return
+
+    if rules:
+        candidates = expand_all(candidates, rules)
+    for plaintext in candidates:
+        if not remaining:
+            return
+        for group, keys in list(remaining.items()):
+            salt, iterations = group
+            stored_key = SCRAMSHA1(plaintext, salt, iterations)
+            if stored_key in keys:
+                for record in keys.pop(stored_key):
+                    yield plaintext, record
+                if not keys:
+                    del remaining[group]
+
+
+def format_hit(plaintext: bytes, record: str):
+    """
+    Formats a cracked target as plaintext:target
+    :param plaintext: bytes
+    :param record: target record
+    :return: str
+    """
+    return '{}:{}'.format(plaintext.decode('utf8', errors='replace'), record)
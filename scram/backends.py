@@ -0,0 +1,167 @@
+import hashlib
+import hmac
+import time
+from contextlib import contextmanager
+from typing import Callable, List, NamedTuple
+
+DEFAULT_BACKEND = 'cryptography'
+# known answer used to check a backend before it is used, two iterations cover the chaining
+# of PBKDF2 blocks at a negligible cost, see tests/test_backends.py
+CHECK_VECTOR = (b'pencil', bytes.fromhex('4125c247e43ab1e93c6dff76'), 2,
+                bytes.fromhex('b1997270ee2b6a514fa663efa64cc14207a6c857'))
+
+
+class Backend(NamedTuple):
+    name: str
+    pbkdf2_sha1: Callable[[bytes, bytes, int], bytes]
+    hmac_sha1: Callable[[bytes, bytes], bytes]
+    sha1: Callable[[bytes], bytes]
+
+
+def _cryptography_backend():
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives import hmac as crypto_hmac
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    from cryptography.hazmat.backends import default_backend
+
+    backend = default_backend()
+    algorithm = hashes.SHA1()
+
+    def pbkdf2_sha1(plaintext, salt, iterations):
+        kdf = PBKDF2HMAC(algorithm=algorithm, length=20, salt=salt, iterations=iterations, backend=backend)
+        return kdf.derive(plaintext)
+
+    def hmac_sha1(key, message):
+        mac = crypto_hmac.HMAC(key, algorithm, backend=backend)
+        mac.update(message)
+        return mac.finalize()
+
+    def sha1(data):
+        digest = hashes.Hash(algorithm, backend=backend)
+        digest.update(data)
+        return digest.finalize()
+
+    return Backend('cryptography', pbkdf2_sha1, hmac_sha1, sha1)
+
+
+def _hashlib_backend():
+
+    def pbkdf2_sha1(plaintext, salt, iterations):
+        return hashlib.pbkdf2_hmac('sha1', plaintext, salt, iterations)
+
+    def hmac_sha1(key, message):
+        return hmac.new(key, message, 'sha1').digest()
+
+    def sha1(data):
+        return hashlib.sha1(data).digest()
+
+    return Backend('hashlib', pbkdf2_sha1, hmac_sha1, sha1)
+
+
+# name -> factory, factories raise ImportError when their library is missing
+BACKENDS = {
+    'cryptography': _cryptography_backend,
+    'hashlib': _hashlib_backend,
+}
+BACKEND_CHOICES = ['auto'] + list(BACKENDS)
+
+_loaded = {}
+_active = None
+
+
+def load_backend(name: str):
+    """
+    Builds (once) and checks the named backend
+    :param name: a key of BACKENDS
+    :return: Backend
+    """
+    if name not in BACKENDS:
+        raise ValueError(f'Not a valid backend: {name}')
+    if name not in _loaded:
+        backend = BACKENDS[name]()
+        plaintext, salt, iterations, expected = CHECK_VECTOR
+        if backend.pbkdf2_sha1(plaintext, salt, iterations) != expected:
+            raise RuntimeError(f'Backend {name} failed its known answer check')
+        _loaded[name] = backend
+    return _loaded[name]
+
+
+def available_backends() -> List[str]:
+    """
+    Names of the backends whose libraries are installed
+    :return: List[str]
+    """
+    names = []
+    for name in BACKENDS:
+        try:
+            load_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def fastest_backend(iterations: int = 4096, rounds: int = 3):
+    """
+    Times a derivation on every available backend and returns the quickest
+    :param iterations: iteration count timed
+    :param rounds: best of this many timings is used
+    :return: Backend
+    """
+    plaintext, salt = CHECK_VECTOR[:2]
+    timings = {}
+    for name in available_backends():
+        backend = load_backend(name)
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            backend.pbkdf2_sha1(plaintext, salt, iterations)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    return load_backend(min(timings, key=timings.get))
+
+
+def set_backend(name: str):
+    """
+    Selects the backend used by scramsha1, auto picks the fastest on this machine
+    :param name: one of BACKEND_CHOICES
+    :return: Backend
+    """
+    global _active
+    if name == 'auto':
+        _active = fastest_backend()
+    else:
+        _active = load_backend(name)
+    return _active
+
+
+@contextmanager
+def using_backend(name: str):
+    """
+    Selects a backend for the duration of the block, the previous selection is restored after,
+    an unselected default stays unloaded
+    :param name: one of BACKEND_CHOICES
+    :return: context manager yielding the Backend
+    """
+    global _active
+    previous = _active
+    try:
+        yield set_backend(name)
+    finally:
+        _active = previous
+
+
+def get_backend():
+    """
+    The active backend, the default is selected on first use and falls
+    back to hashlib when cryptography is not installed
+    :return: Backend
+    """
+    global _active
+    if _active is None:
+        try:
+            _active = load_backend(DEFAULT_BACKEND)
+        except ImportError:
+            _active = load_backend('hashlib')
+    return _active
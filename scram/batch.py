@@ -0,0 +1,187 @@
+"""
+Vectorized PBKDF2-HMAC-SHA1 over many passwords sharing one salt.
+Each password is a lane: SHA1 state words are uint32 arrays with one
+element per lane, so every round of the compression runs on all lanes at once.
+Requires numpy, install with `pip install scram[batch]`.
+"""
+import hashlib
+from typing import List
+from scram.scramsha1 import _validate
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DIGEST_LEN = 20
+BLOCK_LEN = 64
+SHA1_IV = (0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0)
+# bit length of the 64 byte key block plus a 20 byte digest
+_DIGEST_MESSAGE_BITS = (BLOCK_LEN + DIGEST_LEN) * 8
+
+
+if np is not None:
+    _K = [np.uint32(k) for k in (0x5A827999, 0x6ED9EBA1, 0x8F1BBCDC, 0xCA62C1D6)]
+    _SHIFTS = {n: (np.uint32(n), np.uint32(32 - n)) for n in (1, 5, 30)}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('The batch engine needs numpy, install it with `pip install scram[batch]`')
+
+
+def _rotl(x, n):
+    left, right = _SHIFTS[n]
+    return (x << left) | (x >> right)
+
+
+def _compress(state, block):
+    """
+    SHA1 compression function on every lane
+    :param state: 5 uint32 arrays
+    :param block: 16 message words, each a uint32 array or scalar shared by all lanes
+    :return: list of 5 uint32 arrays
+    """
+    with np.errstate(over='ignore'):
+        return _rounds(state, list(block))
+
+
+def _rounds(state, w):
+    for t in range(16, 80):
+        w.append(_rotl(w[t - 3] ^ w[t - 8] ^ w[t - 14] ^ w[t - 16], 1))
+
+    a, b, c, d, e = state
+    for t in range(80):
+        if t < 20:
+            f = d ^ (b & (c ^ d))
+        elif t < 40 or t >= 60:
+            f = b ^ c ^ d
+        else:
+            f = (b & c) | (d & (b | c))
+        temp = _rotl(a, 5) + f + e + _K[t // 20] + w[t]
+        e = d
+        d = c
+        c = _rotl(b, 30)
+        b = a
+        a = temp
+    return [state[0] + a, state[1] + b, state[2] + c, state[3] + d, state[4] + e]
+
+
+def _words(data: bytes):
+    """
+    Big endian uint32 words of a byte string shared by every lane
+    """
+    return [np.uint32(word) for word in np.frombuffer(data, dtype='>u4')]
+
+
+def _pad(message: bytes, prefix_len: int):
+    """
+    SHA1 padding of a message that follows prefix_len already compressed bytes
+    :return: list of 16 word blocks
+    """
+    bit_len = (prefix_len + len(message)) * 8
+    padded = message + b'\x80'
+    padded += b'\x00' * (-(len(padded) + 8) % BLOCK_LEN)
+    padded += bit_len.to_bytes(8, 'big')
+    words = _words(padded)
+    return [words[i:i + 16] for i in range(0, len(words), 16)]
+
+
+def _digest_block(digest, bit_len=_DIGEST_MESSAGE_BITS):
+    """
+    Single padded block holding a 20 byte per-lane digest
+    """
+    return list(digest) + [np.uint32(0x80000000)] + [np.uint32(0)] * 9 + [np.uint32(bit_len)]
+
+
+def _key_states(keys):
+    """
+    HMAC inner and outer pad states for a (lanes, 64) uint8 array of zero padded keys
+    """
+    lanes = keys.shape[0]
+    iv = [np.full(lanes, word, dtype=np.uint32) for word in SHA1_IV]
+    states = []
+    for pad in (0x36, 0x5C):
+        block = (keys ^ np.uint8(pad)).view('>u4').astype(np.uint32).T
+        states.append(_compress(iv, list(block)))
+    return states
+
+
+def _digest_keys(digest):
+    """
+    Zero padded HMAC keys from 5 per-lane digest words
+    """
+    lanes = digest[0].shape[0]
+    keys = np.zeros((lanes, BLOCK_LEN), dtype=np.uint8)
+    keys[:, :DIGEST_LEN] = np.stack(digest, axis=1).astype('>u4').view(np.uint8)
+    return keys
+
+
+def _hmac_digest(inner, outer, digest):
+    """
+    HMAC of a 20 byte per-lane message
+    """
+    return _compress(outer, _digest_block(_compress(inner, _digest_block(digest))))
+
+
+def _hmac_shared(inner, outer, message: bytes):
+    """
+    HMAC of a message shared by every lane
+    """
+    state = inner
+    for block in _pad(message, BLOCK_LEN):
+        state = _compress(state, block)
+    return _compress(outer, _digest_block(state))
+
+
+def _password_keys(plaintexts: List[bytes]):
+    """
+    Zero padded HMAC keys, passwords longer than a block are hashed first as HMAC requires
+    """
+    keys = np.zeros((len(plaintexts), BLOCK_LEN), dtype=np.uint8)
+    for lane, plaintext in enumerate(plaintexts):
+        if len(plaintext) > BLOCK_LEN:
+            plaintext = hashlib.sha1(plaintext).digest()
+        keys[lane, :len(plaintext)] = np.frombuffer(plaintext, dtype=np.uint8)
+    return keys
+
+
+def batch_salted_password(plaintexts: List[bytes], salt: bytes, iterations: int):
+    """
+    PBKDF2-HMAC-SHA1 of every plaintext with one salt
+    :param plaintexts: list of bytes
+    :param salt: raw salt bytes
+    :param iterations: # of iterations
+    :return: 5 per-lane uint32 word arrays
+    """
+    inner, outer = _key_states(_password_keys(plaintexts))
+    block = _hmac_shared(inner, outer, salt + b'\x00\x00\x00\x01')
+    result = list(block)
+    for _ in range(iterations - 1):
+        block = _hmac_digest(inner, outer, block)
+        for i in range(5):
+            result[i] ^= block[i]
+    return result
+
+
+def batch_scram_sha1(plaintexts: List[bytes], salt: str, iterations: int):
+    """
+    SCRAM-SHA1 StoredKeys of many plaintexts sharing one salt
+    :param plaintexts: list of bytes
+    :param salt: base64 encoded string
+    :param iterations: # of iterations
+    :return: (len(plaintexts), 20) uint8 numpy array
+    """
+    _require_numpy()
+    raw_salt = _validate(b'', salt, iterations)
+    if not all(isinstance(plaintext, bytes) for plaintext in plaintexts):
+        raise TypeError('Expected bytes type')
+    if not plaintexts:
+        return np.zeros((0, DIGEST_LEN), dtype=np.uint8)
+
+    salted_password = batch_salted_password(plaintexts, raw_salt, iterations)
+    inner, outer = _key_states(_digest_keys(salted_password))
+    client_key = _hmac_shared(inner, outer, b'Client Key')
+    iv = [np.uint32(word) for word in SHA1_IV]
+    stored_key = _compress(iv, _digest_block(client_key, bit_len=DIGEST_LEN * 8))
+    return np.stack(stored_key, axis=1).astype('>u4').view(np.uint8)
@@ -0,0 +1,250 @@
+import hashlib
+import hmac
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+DEFAULT_SIZE = 1 << 16
+DEFAULT_DISK_SIZE = 1 << 20
+# sqlite writes are committed and the disk store trimmed every this many writes
+DISK_COMMIT_INTERVAL = 32
+
+
+class SaltedPasswordCache:
+    """
+    SaltedPassword cache keyed by (plaintext, salt, iterations): an in-process LRU in front of an
+    optional sqlite store. Entries are keyed by an HMAC-SHA256 of the inputs, never the raw
+    plaintext. A SaltedPassword is as sensitive as the credential it derives, so the store is
+    created readable by its owner only. Safe to share between threads, e.g. an AsyncScram thread pool.
+    """
+
+    def __init__(self, size: int = DEFAULT_SIZE, path: str = None, disk_size: int = DEFAULT_DISK_SIZE,
+                 commit_interval: int = DISK_COMMIT_INTERVAL, shared_counts=None):
+        """
+        :param size: entries kept in memory
+        :param path: optional sqlite file shared between runs
+        :param disk_size: entries kept on disk, least recently used are evicted first
+        :param commit_interval: disk writes per commit, sqlite holds its write lock until the commit
+        :param shared_counts: optional shared array this cache adds its hits and misses to, see options()
+        """
+        if size < 1 or disk_size < 1 or commit_interval < 1:
+            raise ValueError('Cache sizes and the commit interval must be > 0')
+        self.size = size
+        self.path = path
+        self.disk_size = disk_size
+        self.commit_interval = commit_interval
+        self._hits = 0
+        self._misses = 0
+        # parent side: hits and misses added by worker caches
+        self._worker_counts = None
+        # worker side: where to add this cache's hits and misses
+        self._shared_counts = shared_counts
+        self._memory = OrderedDict()
+        # guards the LRU, the connection and the counters
+        self._lock = threading.Lock()
+        self._db = None
+        self._pending = 0
+        self._clock = 0
+        if path is None:
+            self._secret = os.urandom(32)
+        else:
+            self._secret = self._open(path)
+
+    def _open(self, path: str):
+        # only disk backed caches pay for importing sqlite3
+        import sqlite3
+
+        if not os.path.exists(path):
+            # create it private before sqlite writes anything
+            os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+        # one connection used from any thread, always under self._lock
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets worker processes read while another commits
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value BLOB)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, value BLOB, used INTEGER)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_used ON entries (used)')
+        self._db.execute('INSERT OR IGNORE INTO meta VALUES (?, ?)', ('secret', os.urandom(32)))
+        self._db.commit()
+        self._clock = self._db.execute('SELECT COALESCE(MAX(used), 0) FROM entries').fetchone()[0]
+        return self._db.execute("SELECT value FROM meta WHERE name = 'secret'").fetchone()[0]
+
+    def options(self):
+        """
+        Keyword arguments that recreate this cache in a worker process. Worker caches commit every
+        write, so workers never queue behind each other for the sqlite write lock, and add their
+        hits and misses to this cache's counts.
+        :return: dict, passed through a pool initializer's arguments
+        """
+        if self._worker_counts is None:
+            # deferred, only runs with a worker pool need shared memory
+            import multiprocessing
+
+            self._worker_counts = multiprocessing.Array('q', 2)
+        # release the write lock before workers start writing
+        self.flush()
+        return {'size': self.size, 'path': self.path, 'disk_size': self.disk_size, 'commit_interval': 1,
+                'shared_counts': self._worker_counts}
+
+    def key(self, plaintext: bytes, salt: bytes, iterations: int):
+        """
+        Digest identifying the inputs
+        :param plaintext: bytes
+        :param salt: raw salt bytes
+        :param iterations: int
+        :return: bytes
+        """
+        mac = hmac.new(self._secret, digestmod=hashlib.sha256)
+        mac.update(struct.pack('>I', len(plaintext)))
+        mac.update(plaintext)
+        mac.update(struct.pack('>I', len(salt)))
+        mac.update(salt)
+        mac.update(struct.pack('>Q', iterations))
+        return mac.digest()
+
+    def get(self, plaintext: bytes, salt: bytes, iterations: int):
+        """
+        Looks up a SaltedPassword, counting the hit or miss
+        :return: bytes or None
+        """
+        key = self.key(plaintext, salt, iterations)
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    value = row[0]
+                    self._touch(key)
+                    self._remember(key, value)
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        if self._shared_counts is not None:
+            with self._shared_counts.get_lock():
+                self._shared_counts[value is None] += 1
+        return value
+
+    def put(self, plaintext: bytes, salt: bytes, iterations: int, salted_password: bytes):
+        """
+        Stores a SaltedPassword
+        """
+        key = self.key(plaintext, salt, iterations)
+        with self._lock:
+            self._remember(key, salted_password)
+            if self._db is not None:
+                self._clock += 1
+                self._db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)',
+                                 (key, salted_password, self._clock))
+                self._written()
+
+    def _remember(self, key: bytes, value: bytes):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.size:
+            self._memory.popitem(last=False)
+
+    def _touch(self, key: bytes):
+        self._clock += 1
+        self._db.execute('UPDATE entries SET used = ? WHERE key = ?', (self._clock, key))
+        self._written()
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= self.commit_interval:
+            self._flush()
+
+    def flush(self):
+        """
+        Trims the disk store to disk_size entries and commits
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._db is None:
+            return
+        # every write takes the next clock value, so anything older than the last disk_size writes goes
+        self._db.execute('DELETE FROM entries WHERE used <= ?', (self._clock - self.disk_size,))
+        self._db.commit()
+        self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+                self._db.close()
+                self._db = None
+
+    @property
+    def hits(self):
+        """
+        Lookups answered by this cache or its worker caches
+        """
+        return self._hits + (self._worker_counts[0] if self._worker_counts is not None else 0)
+
+    @property
+    def misses(self):
+        return self._misses + (self._worker_counts[1] if self._worker_counts is not None else 0)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self):
+        """
+        One line summary of the hit rate
+        :return: str
+        """
+        return f'cache: {self.hits} hits, {self.misses} misses ({self.hit_rate:.1%} hit rate)'
+
+
+_active = None
+
+
+def enable_cache(size: int = DEFAULT_SIZE, path: str = None, disk_size: int = DEFAULT_DISK_SIZE):
+    """
+    Turns on SaltedPassword caching for scramsha1, replacing any active cache
+    :return: SaltedPasswordCache
+    """
+    global _active
+    disable_cache()
+    _active = SaltedPasswordCache(size, path, disk_size)
+    return _active
+
+
+def disable_cache():
+    """
+    Turns off caching, flushing the active cache to disk
+    """
+    global _active
+    if _active is not None:
+        _active.close()
+        _active = None
+
+
+def init_worker_cache(options: dict = None):
+    """
+    Replaces a cache inherited from the parent process, leaving the parent's connection alone
+    :param options: SaltedPasswordCache.options() or None for no cache
+    """
+    global _active
+    _active = None if options is None else SaltedPasswordCache(**options)
+    if _active is not None and _active.path is not None:
+        from multiprocessing.util import Finalize
+
+        # runs when the worker exits with its pool
+        Finalize(None, disable_cache, exitpriority=10)
+
+
+def get_cache():
+    """
+    The active cache
+    :return: SaltedPasswordCache or None
+    """
+    return _active
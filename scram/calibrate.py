@@ -0,0 +1,220 @@
+"""
+Picks an iteration count for a latency budget on this machine.
+
+    scram calibrate --target-ms 50
+
+Times SCRAMSHA1 at a few iteration counts, fits the cost as a fixed overhead plus a per
+iteration cost, and reports the count that meets the budget along with the bulk throughput
+to expect at 1..N cores. The recommendation is for the default backend, which logins through
+the library and `scram daemon` run on. Without --backend, the stdlib backend that
+`scram <plaintext>` picks for short derivations is also timed and reported on its own line.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from base64 import b64encode
+from functools import partial
+from typing import List, Tuple
+from scram.backends import BACKEND_CHOICES, get_backend, set_backend
+from scram.parallel import cpu_count
+from scram.scramsha1 import SCRAMSHA1, derivation_settings, init_derivation
+from scram.scrammer import SINGLE_MODE_BACKEND, SINGLE_MODE_MAX_ITERATIONS, iteration_counts
+
+DEFAULT_TARGET_MS = 50.0
+DEFAULT_REPEAT = 5
+# first guess at the per iteration cost, refined with counts near the target
+PROBE_ITERATIONS = 1024
+PROBE_FRACTIONS = [0.25, 0.5, 1.0]
+PLAINTEXT = b'calibrate'
+# seconds of derivations timed per pool by --measure
+MEASURE_SECONDS = 1.0
+
+
+def _salt():
+    # a fresh salt per derivation, nothing can be served from a cache
+    return b64encode(os.urandom(20)).decode('utf8')
+
+
+def time_derivation(iterations: int, repeat: int = DEFAULT_REPEAT):
+    """
+    Median seconds one SCRAMSHA1 derivation takes on the active backend
+    :param iterations: # of iterations
+    :param repeat: derivations timed
+    :return: float
+    """
+    if repeat < 1:
+        raise ValueError('Repeat must be > 0')
+    timings = []
+    for _ in range(repeat):
+        salt = _salt()
+        start = time.perf_counter()
+        SCRAMSHA1(PLAINTEXT, salt, iterations)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def fit(samples: List[Tuple[int, float]]):
+    """
+    Least squares fit of seconds = overhead + per_iteration * iterations
+    :param samples: (iterations, seconds) pairs with at least two distinct counts
+    :return: (overhead, per_iteration) in seconds, overhead clamped to >= 0
+    """
+    if len({count for count, _ in samples}) < 2:
+        raise ValueError('Fitting needs samples at two or more iteration counts')
+    mean_count = statistics.mean(count for count, _ in samples)
+    mean_seconds = statistics.mean(seconds for _, seconds in samples)
+    covariance = sum((count - mean_count) * (seconds - mean_seconds) for count, seconds in samples)
+    variance = sum((count - mean_count) ** 2 for count, _ in samples)
+    per_iteration = covariance / variance
+    if per_iteration <= 0:
+        raise ValueError('Timings did not grow with the iteration count')
+    return max(mean_seconds - per_iteration * mean_count, 0.0), per_iteration
+
+
+def recommend(target: float, overhead: float, per_iteration: float):
+    """
+    Largest iteration count whose predicted derivation time fits the target
+    :param target: seconds per derivation
+    :param overhead: fitted seconds per derivation
+    :param per_iteration: fitted seconds per iteration
+    :return: int, at least 1
+    """
+    return max(int((target - overhead) / per_iteration), 1)
+
+
+def calibrate(target: float, repeat: int = DEFAULT_REPEAT):
+    """
+    Times the active derivation path and fits its cost
+    :param target: seconds per derivation the fit should be accurate around
+    :param repeat: derivations timed per count
+    :return: (overhead, per_iteration, samples)
+    """
+    # loads and checks the backend, which would otherwise be charged to the first sample
+    time_derivation(1, 1)
+    samples = [(PROBE_ITERATIONS, time_derivation(PROBE_ITERATIONS, repeat))]
+    estimate = max(int(target * PROBE_ITERATIONS / samples[0][1]), 1)
+    for fraction in PROBE_FRACTIONS:
+        count = max(int(estimate * fraction), 1)
+        samples.append((count, time_derivation(count, repeat)))
+    if len({count for count, _ in samples}) < 2:
+        samples.append((PROBE_ITERATIONS * 2, time_derivation(PROBE_ITERATIONS * 2, repeat)))
+    overhead, per_iteration = fit(samples)
+    return overhead, per_iteration, samples
+
+
+def _derive(salt: str, iterations: int):
+    return SCRAMSHA1(PLAINTEXT, salt, iterations)
+
+
+def measure_throughput(iterations: int, jobs: int, count: int):
+    """
+    Derivations per second actually reached by a process pool, not counting its start up
+    :param iterations: # of iterations
+    :param jobs: worker processes
+    :param count: derivations timed
+    :return: float
+    """
+    # deferred like in scram.parallel, only --measure needs a pool
+    import multiprocessing
+
+    func = partial(_derive, iterations=iterations)
+    salts = [_salt() for _ in range(count)]
+    with multiprocessing.Pool(jobs, initializer=init_derivation, initargs=derivation_settings()) as pool:
+        # every worker has loaded its backend before the clock starts
+        pool.map(partial(_derive, iterations=1), salts[:jobs], chunksize=1)
+        start = time.perf_counter()
+        pool.map(func, salts, chunksize=1)
+        return count / (time.perf_counter() - start)
+
+
+def core_counts(cores: int):
+    """
+    1, 2, 4, ... up to and including cores
+    :param cores: int
+    :return: List[int]
+    """
+    counts = []
+    count = 1
+    while count < cores:
+        counts.append(count)
+        count *= 2
+    return counts + [cores]
+
+
+def calibrate_main(args):
+    parser = argparse.ArgumentParser(prog='scram calibrate',
+                                     description='Recommend an iteration count for a latency budget.')
+    parser.add_argument('--target-ms', help='milliseconds one derivation may take', default=DEFAULT_TARGET_MS,
+                        type=float, metavar='ms', dest='target_ms')
+    parser.add_argument('-i', '--iter', help='also predict these counts, as a count or a comma separated list',
+                        default=None, type=iteration_counts, metavar='iterations', dest='iterations')
+    parser.add_argument('--backend', choices=BACKEND_CHOICES, default=None, dest='backend',
+                        help='hashing library to time, default the ones scram picks for single and bulk runs')
+    parser.add_argument('--repeat', help='derivations timed per iteration count', default=DEFAULT_REPEAT,
+                        type=int, metavar='count', dest='repeat')
+    parser.add_argument('--cores', help='report throughput up to this many cores, default every core',
+                        default=None, type=int, metavar='cores', dest='cores')
+    parser.add_argument('--measure', action='store_true', dest='measure',
+                        help='time bulk throughput on worker pools instead of extrapolating from one core')
+    args = parser.parse_args(args)
+    if args.target_ms <= 0:
+        parser.error('--target-ms must be > 0')
+    if args.repeat < 1:
+        parser.error('--repeat must be > 0')
+    if args.cores is not None and args.cores < 1:
+        parser.error('--cores must be > 0')
+
+    if args.backend is not None:
+        set_backend(args.backend)
+    bulk = get_backend().name
+    # without --backend, the CLI's single mode runs short derivations on another backend, see scrammer.main
+    single = bulk if args.backend is not None else SINGLE_MODE_BACKEND
+    fits = {}
+    try:
+        for name in dict.fromkeys([bulk, single]):
+            set_backend(name)
+            fits[name] = calibrate(args.target_ms / 1000, args.repeat)[:2]
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        # pools started by --measure take the active backend
+        set_backend(bulk)
+
+    def seconds(count, name=bulk):
+        overhead, per_iteration = fits[name]
+        return overhead + per_iteration * count
+
+    def single_seconds(count):
+        return seconds(count, single if count < SINGLE_MODE_MAX_ITERATIONS else bulk)
+
+    for name, (overhead, per_iteration) in fits.items():
+        used = f', single runs below -i {SINGLE_MODE_MAX_ITERATIONS}' if name != bulk else ''
+        print(f'backend {name}{used}: {per_iteration * 1e6:.4f} us per iteration, '
+              f'{overhead * 1e6:.1f} us per derivation')
+    iterations = recommend(args.target_ms / 1000, *fits[bulk])
+    print(f'-i {iterations} meets {args.target_ms:g} ms '
+          f'(predicted {seconds(iterations) * 1000:.1f} ms)')
+    if single != bulk:
+        print(f'scram <plaintext> -i {iterations} takes {single_seconds(iterations) * 1000:.1f} ms '
+              f'on {single if iterations < SINGLE_MODE_MAX_ITERATIONS else bulk}')
+    predicted = [iterations]
+    if args.iterations is not None:
+        counts = args.iterations if isinstance(args.iterations, list) else [args.iterations]
+        for count in counts:
+            print(f'-i {count} takes {seconds(count) * 1000:.2f} ms')
+        predicted = counts + [iterations]
+
+    cores = core_counts(args.cores or cpu_count())
+    print('cores ' + ' '.join(f'{f"-i {count}":>14}' for count in predicted))
+    for jobs in cores:
+        if args.measure:
+            rates = [measure_throughput(count, jobs, max(int(MEASURE_SECONDS * jobs / seconds(count)), jobs))
+                     for count in predicted]
+        else:
+            # derivations are CPU bound and independent, expected to scale with cores
+            rates = [jobs / seconds(count) for count in predicted]
+        print(f'{jobs:>5} ' + ' '.join(f'{f"{rate:,.1f}/s":>14}' for rate in rates))
+    return 0
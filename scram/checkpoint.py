@@ -0,0 +1,106 @@
+import json
+import os
+import time
+from collections import deque
+from typing import Iterable, Iterator
+
+CHECKPOINT_SUFFIX = '.ckpt'
+DEFAULT_INTERVAL = 10.0
+
+
+class Checkpoint:
+    """
+    Records how far a bulk run got: the input offset just past the last line whose record
+    reached the output, and the output size at that moment. Resuming truncates the output
+    back to that size and restarts the input at that offset, so the output has neither
+    duplicates nor gaps no matter where the run was killed.
+    """
+
+    def __init__(self, path: str, run: dict, interval: float = DEFAULT_INTERVAL):
+        """
+        :param path: checkpoint file
+        :param run: description of the run, a checkpoint only resumes an identical run
+        :param interval: seconds between checkpoints
+        """
+        self.path = path
+        self.run = run
+        self.interval = interval
+        self.input_offset = None
+        self._offsets = deque()
+        self._next_save = time.monotonic() + interval
+
+    def load(self):
+        """
+        Last saved state of this run
+        :return: dict or None when there is no checkpoint
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as file:
+            state = json.load(file)
+        if state.get('run') != self.run:
+            raise ValueError(f'Checkpoint {self.path} belongs to a different run: {state.get("run")}')
+        return state
+
+    def save(self, output_offset: int, complete: bool = False):
+        """
+        Atomically replaces the checkpoint file
+        :param output_offset: output bytes that are on disk
+        :param complete: the run finished
+        """
+        state = {'run': self.run, 'input_offset': self.input_offset, 'output_offset': output_offset,
+                 'complete': complete}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def lines(self, reader) -> Iterator[bytes]:
+        """
+        Yields the reader's plaintexts, remembering the input offset after each line
+        :param reader: MappedLineReader
+        """
+        if self.input_offset is None:
+            self.input_offset = reader.offset
+        for plaintext in reader:
+            self._offsets.append(reader.offset)
+            yield plaintext
+
+    def written(self, records: Iterable[str], file) -> Iterator[str]:
+        """
+        Yields records, one per line from lines(), checkpointing once the consumer has written them
+        :param records: records in input order
+        :param file: output file the consumer writes to
+        """
+        for record in records:
+            offset = self._offsets.popleft()
+            yield record
+            # resumed by the consumer asking for the next record, so this one is written
+            self.input_offset = offset
+            if time.monotonic() >= self._next_save:
+                self.sync(file)
+
+    def sync(self, file, complete: bool = False):
+        """
+        Flushes the output to disk and saves the checkpoint
+        :param file: output file
+        :param complete: the run finished
+        """
+        file.flush()
+        os.fsync(file.fileno())
+        self.save(file.tell(), complete)
+        self._next_save = time.monotonic() + self.interval
+
+
+def truncate_output(path: str, size: int):
+    """
+    Drops output written after the checkpoint was taken
+    :param path: output file
+    :param size: checkpointed output size
+    """
+    with open(path, 'r+b') as file:
+        if file.seek(0, 2) < size:
+            raise ValueError(f'Output {path} is shorter than its checkpoint')
+        file.truncate(size)
@@ -0,0 +1,403 @@
+"""
+Long running SCRAM-SHA1 service on a Unix socket, so credential checks skip interpreter start up
+and repeat logins skip PBKDF2.
+
+    scram daemon /run/scram.sock --jobs 4
+
+Requests and responses are JSON objects, one per line. A connection may pipeline any number of
+requests, responses come back in request order.
+
+    {"id": 1, "op": "hash", "plaintext": "pencil", "salt": "QSXCR+Q6sek8bf92", "iterations": 4096}
+    {"id": 1, "ok": true, "stored_key": "<hex>", "server_key": "<hex>"}
+    {"id": 2, "op": "verify", "plaintext": "pencil", "salt": "QSXCR+Q6sek8bf92", "iterations": 4096,
+     "expected": "<hex or base64 StoredKey>"}
+    {"id": 2, "ok": true, "match": true}
+
+Failed requests get {"id": ..., "ok": false, "error": "..."}. Derivations run on a worker pool
+and SaltedPasswords are kept in a bounded in-memory cache of the daemon process.
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import signal
+import socket
+import sys
+from typing import Iterable, List
+from scram.aio import AsyncScram
+from scram.cache import SaltedPasswordCache
+from scram.scramsha1 import _keys, _validate
+from scram.table import parse_stored_key
+
+DEFAULT_CACHE_SIZE = 1 << 14
+# requests of one connection being worked on before the daemon stops reading it
+DEFAULT_PIPELINE = 128
+DEFAULT_CLIENT_TIMEOUT = 30.0
+
+
+class Daemon:
+    """
+    Serves hash and verify requests on a Unix socket
+    """
+
+    def __init__(self, path: str, workers: int = None, processes: bool = True,
+                 cache_size: int = DEFAULT_CACHE_SIZE, pipeline: int = DEFAULT_PIPELINE):
+        """
+        :param path: socket path, a stale socket file is replaced
+        :param workers: size of the worker pool, defaults to the number of cores
+        :param processes: derive on worker processes rather than threads
+        :param cache_size: SaltedPasswords kept
+        :param pipeline: requests per connection in flight
+        """
+        if pipeline < 1:
+            raise ValueError('Pipeline depth must be > 0')
+        self.path = path
+        self.pipeline = pipeline
+        self.cache = SaltedPasswordCache(cache_size)
+        self.scram = AsyncScram(processes=processes, workers=workers)
+        self.requests = 0
+        self.derivations = 0
+        self._inflight = {}
+        self._server = None
+        self._loop = None
+        self._listening = False
+        self._clients = set()
+
+    async def keys(self, plaintext: bytes, salt: str, iterations: int):
+        """
+        SCRAM keys, from the cache or the pool. Concurrent misses for the same inputs share one derivation.
+        :return: ScramKeys
+        """
+        raw_salt = _validate(plaintext, salt, iterations)
+        salted_password = self.cache.get(plaintext, raw_salt, iterations)
+        if salted_password is not None:
+            return _keys(salted_password)
+        inputs = (plaintext, raw_salt, iterations)
+        future = self._inflight.get(inputs)
+        if future is None:
+            self.derivations += 1
+            future = asyncio.ensure_future(self.scram.scram_keys(plaintext, salt, iterations))
+            self._inflight[inputs] = future
+            future.add_done_callback(lambda _: self._inflight.pop(inputs, None))
+        keys = await asyncio.shield(future)
+        self.cache.put(plaintext, raw_salt, iterations, keys.salted_password)
+        return keys
+
+    async def handle(self, request: dict):
+        """
+        Answers one request
+        :param request: decoded request
+        :return: response dict
+        """
+        response = {'id': request.get('id') if isinstance(request, dict) else None}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError('Requests must be JSON objects')
+            op = request.get('op')
+            if op not in ('hash', 'verify'):
+                raise ValueError(f'Not a valid op: {op}')
+            plaintext = request['plaintext']
+            if not isinstance(plaintext, str):
+                raise TypeError('plaintext must be a string')
+            keys = await self.keys(plaintext.encode('utf8'), request['salt'], request['iterations'])
+            if op == 'hash':
+                response.update(ok=True, stored_key=keys.stored_key.hex(), server_key=keys.server_key.hex())
+            else:
+                expected = parse_stored_key(request['expected'])
+                response.update(ok=True, match=hmac.compare_digest(keys.stored_key, expected))
+        except KeyError as e:
+            response.update(ok=False, error=f'Missing field: {e.args[0]}')
+        except (TypeError, ValueError) as e:
+            response.update(ok=False, error=str(e))
+        except Exception as e:
+            # e.g. a broken worker pool, reported rather than dropping the connection
+            response.update(ok=False, error=f'Internal error: {e!r}')
+        self.requests += 1
+        return response
+
+    async def _respond(self, line: bytes):
+        try:
+            request = json.loads(line.decode('utf8'))
+        except ValueError as e:
+            return {'id': None, 'ok': False, 'error': f'Invalid JSON: {e}'}
+        return await self.handle(request)
+
+    async def _send(self, queue: asyncio.Queue, writer):
+        while True:
+            task = await queue.get()
+            if task is None:
+                return
+            response = await task
+            writer.write(json.dumps(response).encode('utf8') + b'\n')
+            await writer.drain()
+
+    def _accept(self, reader, writer):
+        task = asyncio.ensure_future(self._serve_client(reader, writer))
+        self._clients.add(task)
+        task.add_done_callback(self._clients.discard)
+
+    async def _serve_client(self, reader, writer):
+        queue = asyncio.Queue(self.pipeline)
+        sender = asyncio.ensure_future(self._send(queue, writer))
+        try:
+            while not sender.done():
+                line = await reader.readline()
+                if not line.strip():
+                    if not line:
+                        break
+                    continue
+                await queue.put(asyncio.ensure_future(self._respond(line)))
+            if not sender.done():
+                await queue.put(None)
+            await sender
+        except (ConnectionError, ValueError):
+            # reset by the client, or a request line over the stream limit
+            pass
+        finally:
+            # cancelled by close(), or the client went away with requests queued
+            sender.cancel()
+            writer.close()
+
+    async def start(self):
+        """
+        Starts listening on the running loop
+        """
+        if os.path.exists(self.path):
+            # refuse to take over a socket another daemon is serving
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise OSError(f'{self.path} is served by another process')
+            finally:
+                probe.close()
+        self._loop = asyncio.get_event_loop()
+        # credentials pass through the socket, keep it to its owner from the moment it is bound
+        umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self._accept, path=self.path)
+        finally:
+            os.umask(umask)
+        self._listening = True
+
+    async def _cancel_clients(self):
+        clients = list(self._clients)
+        for task in clients:
+            task.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # idle client connections would otherwise hold wait_closed open
+            await self._cancel_clients()
+            await self._server.wait_closed()
+            # connections accepted while closing
+            await self._cancel_clients()
+            self._server = None
+        self.scram.close()
+        if self._listening and os.path.exists(self.path):
+            os.unlink(self.path)
+            self._listening = False
+
+    def run(self, ready=None):
+        """
+        Serves until stop() is called, on a new event loop
+        :param ready: optional callable run once the socket accepts connections
+        """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.start())
+            if ready is not None:
+                ready()
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self.close())
+            loop.close()
+
+    def stop(self):
+        """
+        Stops run(), safe to call from other threads and signal handlers
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class ScramClient:
+    """
+    Client for the daemon keeping one connection open across calls. Requests are pipelined:
+    up to `pipeline` requests of a batch are in flight while the responses are read back in order.
+    """
+
+    def __init__(self, path: str, timeout: float = DEFAULT_CLIENT_TIMEOUT, pipeline: int = DEFAULT_PIPELINE):
+        """
+        :param path: daemon socket path
+        :param timeout: seconds to wait on the daemon
+        :param pipeline: requests sent ahead of their responses, at most the daemon's --pipeline
+        """
+        if pipeline < 1:
+            raise ValueError('Pipeline depth must be > 0')
+        self.path = path
+        self.timeout = timeout
+        self.pipeline = pipeline
+        self._sock = None
+        self._file = None
+        self._next_id = 0
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._file = sock.makefile('rwb')
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._file.close()
+            except OSError:
+                # unsent requests of a broken connection
+                pass
+            self._sock.close()
+            self._sock = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _exchange(self, requests: List[dict]):
+        if self._sock is None:
+            self._connect()
+        responses = []
+        sent = 0
+        while len(responses) < len(requests):
+            # the daemon stops reading past its pipeline depth, so writing a whole large batch before
+            # reading would leave both sides blocked; top the window up once half of it is answered
+            if sent - len(responses) <= self.pipeline // 2:
+                window = requests[sent:len(responses) + self.pipeline]
+                self._file.write(b''.join(json.dumps(request).encode('utf8') + b'\n' for request in window))
+                self._file.flush()
+                sent += len(window)
+            line = self._file.readline()
+            if not line:
+                raise ConnectionError('Daemon closed the connection')
+            responses.append(json.loads(line.decode('utf8')))
+        return responses
+
+    def request_many(self, requests: Iterable[dict]) -> List[dict]:
+        """
+        Sends requests in one pipelined batch, ids are added where missing
+        :param requests: request dicts
+        :return: List[dict] responses in request order
+        """
+        requests = list(requests)
+        for request in requests:
+            if 'id' not in request:
+                request['id'] = self._next_id
+                self._next_id += 1
+        reused = self._sock is not None
+        try:
+            return self._exchange(requests)
+        except ConnectionError:
+            self.close()
+            if not reused:
+                raise
+        except Exception:
+            # a timeout or garbage leaves unread responses behind, start over on the next call
+            self.close()
+            raise
+        # the daemon restarted or dropped an idle connection, requests are idempotent so resend once
+        try:
+            return self._exchange(requests)
+        except Exception:
+            self.close()
+            raise
+
+    def request(self, request: dict):
+        return self.request_many([request])[0]
+
+    @staticmethod
+    def _result(response: dict):
+        if not response.get('ok'):
+            raise ValueError(response.get('error', 'Request failed'))
+        return response
+
+    @staticmethod
+    def _request(op: str, plaintext, salt: str, iterations: int, **fields):
+        if isinstance(plaintext, bytes):
+            plaintext = plaintext.decode('utf8')
+        return dict(fields, op=op, plaintext=plaintext, salt=salt, iterations=iterations)
+
+    def hash(self, plaintext, salt: str, iterations: int):
+        """
+        StoredKey and ServerKey
+        :param plaintext: str or utf8 bytes
+        :param salt: b64 encoded str
+        :param iterations: int
+        :return: (StoredKey bytes, ServerKey bytes)
+        """
+        response = self._result(self.request(self._request('hash', plaintext, salt, iterations)))
+        return bytes.fromhex(response['stored_key']), bytes.fromhex(response['server_key'])
+
+    def verify(self, plaintext, salt: str, iterations: int, expected):
+        """
+        Checks a plaintext against a StoredKey
+        :param expected: StoredKey as bytes, hex or base64
+        :return: bool
+        """
+        return self.verify_many([(plaintext, salt, iterations, expected)])[0]
+
+    def verify_many(self, checks: Iterable[tuple]) -> List[bool]:
+        """
+        Pipelined verify of (plaintext, salt, iterations, expected) tuples
+        :return: List[bool]
+        """
+        requests = []
+        for plaintext, salt, iterations, expected in checks:
+            if isinstance(expected, bytes):
+                expected = expected.hex()
+            requests.append(self._request('verify', plaintext, salt, iterations, expected=expected))
+        return [self._result(response)['match'] for response in self.request_many(requests)]
+
+
+def daemon_main(args):
+    parser = argparse.ArgumentParser(prog='scram daemon', description='Serve SCRAM-SHA1 requests on a Unix socket.')
+    parser.add_argument('socket', help='Unix socket path')
+    parser.add_argument('-j', '--jobs', help='worker pool size, default every core', default=None, type=int,
+                        metavar='jobs', dest='jobs')
+    parser.add_argument('--threads', action='store_true', dest='threads',
+                        help='derive on threads instead of processes')
+    parser.add_argument('--cache-size', help='SaltedPasswords kept in memory', default=DEFAULT_CACHE_SIZE,
+                        type=int, metavar='entries', dest='cache_size')
+    parser.add_argument('--pipeline', help='requests per connection worked on at once', default=DEFAULT_PIPELINE,
+                        type=int, metavar='requests', dest='pipeline')
+    args = parser.parse_args(args)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be > 0')
+    if args.cache_size < 1 or args.pipeline < 1:
+        parser.error('--cache-size and --pipeline must be > 0')
+
+    try:
+        daemon = Daemon(args.socket, args.jobs, not args.threads, args.cache_size, args.pipeline)
+    except ValueError as e:
+        parser.error(str(e))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: daemon.stop())
+    try:
+        daemon.run(ready=lambda: print(f'[daemon] listening on {args.socket}', file=sys.stderr, flush=True))
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f'[daemon] {daemon.requests} requests, {daemon.derivations} derivations, {daemon.cache.report()}',
+          file=sys.stderr)
+    return 0
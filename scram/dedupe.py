@@ -0,0 +1,159 @@
+import hashlib
+import math
+from collections import OrderedDict, deque
+from typing import Callable, Iterable, Iterator
+
+DEFAULT_EXPECTED = 10_000_000
+DEFAULT_ERROR_RATE = 0.01
+
+
+class BloomFilter:
+    """
+    Set membership in a fixed bit array: no false negatives, false positives at about error_rate
+    once capacity items were added
+    """
+
+    def __init__(self, capacity: int = DEFAULT_EXPECTED, error_rate: float = DEFAULT_ERROR_RATE):
+        """
+        :param capacity: items expected
+        :param error_rate: false positive rate at capacity
+        """
+        if capacity < 1:
+            raise ValueError('Capacity must be > 0')
+        if not 0 < error_rate < 1:
+            raise ValueError('Error rate must be between 0 and 1')
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: bytes):
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def __contains__(self, item: bytes):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def add(self, item: bytes):
+        """
+        Adds item
+        :return: True if item may have been added before
+        """
+        present = True
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                present = False
+                self.bits[position >> 3] |= mask
+        return present
+
+
+class BoundedRecords:
+    """
+    Mapping of at most size entries, the least recently used is evicted first
+    """
+
+    def __init__(self, size: int):
+        if size < 1:
+            raise ValueError('Size must be > 0')
+        self.size = size
+        self._entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def __setitem__(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+
+class Deduper:
+    """
+    Derives each distinct plaintext once while keeping one record per input line, in input order.
+    Exact mode remembers every record. Bounded mode remembers at most max_entries, and a Bloom
+    filter keeps first sightings out of the map: only plaintexts seen before are remembered, so a
+    repeated plaintext is derived twice, then served from the map while it stays there.
+    """
+
+    def __init__(self, max_entries: int = None, expected: int = DEFAULT_EXPECTED,
+                 error_rate: float = DEFAULT_ERROR_RATE):
+        """
+        :param max_entries: records remembered, None for exact mode
+        :param expected: distinct plaintexts expected, sizes the Bloom filter of bounded mode
+        :param error_rate: Bloom filter false positive rate
+        """
+        if max_entries is None:
+            self.records = {}
+            self.prefilter = None
+        else:
+            self.records = BoundedRecords(max_entries)
+            self.prefilter = BloomFilter(expected, error_rate)
+        self.lines = 0
+        self.derived = 0
+
+    def dedupe(self, plaintexts: Iterable[bytes], hash_records: Callable[[Iterable[bytes]], Iterable[str]],
+               fallback: Callable[[bytes], str]) -> Iterator[str]:
+        """
+        Yields one record per plaintext, deriving through hash_records only the ones not remembered
+        :param plaintexts: iterable of bytes
+        :param hash_records: takes an iterable of plaintexts, yields their records in order, e.g. hash_lines
+        :param fallback: derives one plaintext, used for a repeat evicted before it was written
+        :return: generator of str
+        """
+        # (plaintext, derived by hash_records, remember the record) in input order
+        order = deque()
+        pending = set()
+
+        def unique():
+            for plaintext in plaintexts:
+                self.lines += 1
+                if plaintext in pending or plaintext in self.records:
+                    order.append((plaintext, False, False))
+                    continue
+                remember = self.prefilter is None or self.prefilter.add(plaintext)
+                if remember:
+                    pending.add(plaintext)
+                order.append((plaintext, True, remember))
+                self.derived += 1
+                yield plaintext
+
+        def remembered(plaintext):
+            record = self.records.get(plaintext)
+            if record is None:
+                self.derived += 1
+                record = fallback(plaintext)
+            return record
+
+        for record in hash_records(unique()):
+            while True:
+                plaintext, derived, remember = order.popleft()
+                if derived:
+                    break
+                yield remembered(plaintext)
+            if remember:
+                self.records[plaintext] = record
+                pending.discard(plaintext)
+            yield record
+        while order:
+            yield remembered(order.popleft()[0])
+
+    def report(self):
+        """
+        One line summary for stderr
+        :return: str
+        """
+        saved = self.lines - self.derived
+        share = saved / self.lines if self.lines else 0.0
+        return f'[dedupe] {self.lines} lines, {self.derived} derivations, {saved} repeats skipped ({share:.1%})'
@@ -0,0 +1,395 @@
+"""
+Spreads a file mode or audit run over hosts. The coordinator memory maps the wordlist and hands
+line aligned byte ranges to workers over TCP. Workers hash each range with the usual pipeline and
+send its records back, and the coordinator writes them in input order. A range whose worker
+disconnects or times out goes back to the front of the queue for the next worker.
+
+    export SCRAM_DISTRIBUTE_TOKEN=<shared secret>
+    scram -f words.txt -s <salt> -o out.txt --distribute 0.0.0.0:7878
+    scram worker coordinator-host:7878 --jobs 0
+
+Every message is a frame: header and body lengths (4 bytes each, big endian), a JSON header, then
+the body. A worker says hello with the shared token, receives the job, then alternates between
+receiving a chunk, whose body is a slice of the wordlist, and answering with its result, whose body
+is the chunk's records. `done` ends the session.
+
+This is a protocol for trusted networks. Frames are neither encrypted nor signed: the token only keeps
+out hosts that do not know it, anyone able to watch or alter the traffic sees the wordlist and audit
+targets and can change the records.
+"""
+import argparse
+import heapq
+import hmac
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+from scram.audit import audit, audit_pool, format_hit, load_targets, take_cracked
+from scram.parallel import DEFAULT_CHUNK_SIZE, worker_pool
+from scram.salts import random_salts
+from scram.scramsha1 import derivation_settings, init_derivation
+from scram.scrammer import DISTRIBUTE_TOKEN_ENV, address_spec, hash_lines
+from scram.wordlist import MappedLineReader
+
+FRAME = struct.Struct('>II')
+DEFAULT_CHUNK_BYTES = 1 << 16
+# seconds a worker may take on one chunk before it is presumed dead
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_CONNECT_TIMEOUT = 30.0
+# chunks handed out past the oldest unwritten one, bounds results held for reordering
+DEFAULT_WINDOW = 64
+
+
+def send_frame(sock, header: dict, body: bytes = b''):
+    """
+    Sends one message
+    :param sock: connected socket
+    :param header: JSON serializable dict
+    :param body: bytes
+    """
+    data = json.dumps(header).encode('utf8')
+    sock.sendall(FRAME.pack(len(data), len(body)) + data + body)
+
+
+def _recv_exact(sock, size: int):
+    parts = []
+    while size:
+        part = sock.recv(min(size, 1 << 20))
+        if not part:
+            raise ConnectionError('Connection closed')
+        parts.append(part)
+        size -= len(part)
+    return b''.join(parts)
+
+
+def recv_frame(sock) -> Tuple[dict, bytes]:
+    """
+    Receives one message
+    :param sock: connected socket
+    :return: (header, body)
+    """
+    header_len, body_len = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    header = json.loads(_recv_exact(sock, header_len).decode('utf8'))
+    return header, _recv_exact(sock, body_len)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.coordinator.serve_worker(self.request)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    # server_close waits for sessions to send `done`
+    daemon_threads = False
+
+
+class Coordinator:
+    """
+    Hands out byte ranges of a wordlist to workers and yields their records in input order
+    """
+
+    def __init__(self, wordlist, job: dict, address: Tuple[str, int], start: int = 0, end: int = None,
+                 chunk_bytes: int = None, timeout: float = None, window: int = DEFAULT_WINDOW, token: str = None):
+        """
+        :param wordlist: MappedWordlist
+        :param job: settings sent to workers, see process_chunk
+        :param address: (host, port) to listen on, port 0 picks a free port
+        :param start: first byte of the range to hash, a line start
+        :param end: end of the range, a line start, defaults to the end of the file
+        :param chunk_bytes: approximate bytes per chunk, chunks end on line boundaries, default DEFAULT_CHUNK_BYTES
+        :param timeout: seconds a worker may take per chunk, default DEFAULT_TIMEOUT
+        :param window: chunks handed out past the oldest unwritten one
+        :param token: shared secret workers must say hello with, None accepts any worker
+        """
+        chunk_bytes = DEFAULT_CHUNK_BYTES if chunk_bytes is None else chunk_bytes
+        timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+        if chunk_bytes < 1 or window < 1:
+            raise ValueError('Chunk size and window must be > 0')
+        self.wordlist = wordlist
+        self.job = job
+        self.end = wordlist.size if end is None else end
+        self.chunk_bytes = chunk_bytes
+        self.timeout = timeout
+        self.window = window
+        self.token = token
+        self._cond = threading.Condition()
+        self._cursor = start
+        self._next_id = 0
+        self._total = 0 if start >= self.end else None
+        self._retry = []
+        self._results = {}
+        self._completed = 0
+        self._written = 0
+        self.reassigned = 0
+        # audits: keys not cracked yet, workers match every target so repeats are dropped here
+        self._remaining = load_targets(job['targets']) if job.get('mode') == 'audit' else None
+        self._sessions = set()
+        self._server = _Server(address, _Handler)
+        self._server.coordinator = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        with self._cond:
+            # a run ended early: idle sessions say `done` and busy ones are cut off
+            if self._total is None or self._completed < self._total:
+                self._total = self._completed = self._next_id
+                for sock in self._sessions:
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _next_chunk(self):
+        with self._cond:
+            while True:
+                if self._total is not None and self._completed >= self._total:
+                    return None
+                if self._retry:
+                    return heapq.heappop(self._retry)
+                if self._total is None and self._next_id < self._written + self.window:
+                    start = self._cursor
+                    end = min(self.wordlist.line_start(start + self.chunk_bytes), self.end)
+                    chunk = (self._next_id, start, end)
+                    self._next_id += 1
+                    self._cursor = end
+                    if end >= self.end:
+                        self._total = self._next_id
+                    return chunk
+                self._cond.wait()
+
+    def _complete(self, chunk_id: int, records: str):
+        with self._cond:
+            if chunk_id >= self._written and chunk_id not in self._results:
+                self._results[chunk_id] = records
+                self._completed += 1
+                self._cond.notify_all()
+
+    def _requeue(self, chunk):
+        with self._cond:
+            self.reassigned += 1
+            heapq.heappush(self._retry, chunk)
+            self._cond.notify_all()
+
+    def _authorized(self, hello: dict):
+        if self.token is None:
+            return True
+        token = hello.get('token')
+        return isinstance(token, str) and hmac.compare_digest(token.encode('utf8'), self.token.encode('utf8'))
+
+    def serve_worker(self, sock):
+        """
+        Runs one worker session, called on the server's handler threads
+        :param sock: connected socket
+        """
+        sock.settimeout(self.timeout)
+        with self._cond:
+            self._sessions.add(sock)
+        try:
+            header, _ = recv_frame(sock)
+            if header.get('type') != 'hello' or not self._authorized(header):
+                return
+            send_frame(sock, dict(self.job, type='job'))
+            while True:
+                chunk = self._next_chunk()
+                if chunk is None:
+                    send_frame(sock, {'type': 'done'})
+                    return
+                chunk_id, start, end = chunk
+                try:
+                    send_frame(sock, {'type': 'chunk', 'id': chunk_id}, self.wordlist.data[start:end])
+                    header, body = recv_frame(sock)
+                    if header.get('type') != 'result' or header.get('id') != chunk_id:
+                        raise ValueError('Unexpected reply')
+                    records = body.decode('utf8')
+                except (OSError, ValueError):
+                    # covers timeouts, resets and garbage, another worker gets the chunk
+                    self._requeue(chunk)
+                    return
+                self._complete(chunk_id, records)
+        except (OSError, ValueError):
+            return
+        finally:
+            with self._cond:
+                self._sessions.discard(sock)
+
+    def _new_hits(self, records: str):
+        """
+        Hits of an audit chunk for keys no earlier chunk cracked, each key reported once like in audit()
+        :param records: newline separated plaintext:target hits
+        :return: str
+        """
+        hits = []
+        for hit in records.split('\n'):
+            # plaintexts may hold colons, the target record is the last three fields
+            fields = hit.rsplit(':', 3)
+            hits.extend(f'{fields[0]}:{cracked}' for cracked in take_cracked(self._remaining, ':'.join(fields[1:])))
+        return '\n'.join(hits)
+
+    def results(self) -> Iterator[str]:
+        """
+        Records of every chunk in input order, waiting for workers as needed. An audit ends once
+        every target is cracked, closing the coordinator then sends `done` to its workers.
+        :return: generator of str, one per chunk that has records
+        """
+        while True:
+            if self._remaining is not None and not self._remaining:
+                with self._cond:
+                    # every target is cracked, sessions say `done` once their current chunk is in
+                    self._total = self._completed = self._next_id
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                while self._written not in self._results:
+                    if self._total is not None and self._written >= self._total:
+                        return
+                    self._cond.wait()
+                records = self._results.pop(self._written)
+                self._written += 1
+                self._cond.notify_all()
+            if records and self._remaining is not None:
+                records = self._new_hits(records)
+            if records:
+                yield records
+
+
+def process_chunk(job: dict, data: bytes, jobs: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE, targets=None,
+                  pool=None):
+    """
+    A worker's answer to one chunk
+    :param job: mode ('hash' or 'audit'), salt, iterations, format and rules
+    :param data: wordlist slice
+    :param jobs: local worker processes
+    :param chunk_size: lines per local worker task
+    :param targets: loaded audit targets
+    :param pool: optional local pool from session_pool, reused across chunks
+    :return: str, newline separated records
+    """
+    lines = MappedLineReader(data, 0, len(data))
+    if job['mode'] == 'audit':
+        hits = audit(lines, targets, jobs=jobs, chunk_size=chunk_size, rules=job.get('rules'), pool=pool)
+        return '\n'.join(format_hit(plaintext, record) for plaintext, record in hits)
+    return '\n'.join(hash_lines(lines, job['salt'], job['iterations'], mode=job['format'], jobs=jobs,
+                                chunk_size=chunk_size, rules=job.get('rules'),
+                                salts=random_salts() if job['salt'] is None else None, pool=pool))
+
+
+@contextmanager
+def session_pool(job: dict, jobs: int = 1, targets=None):
+    """
+    Local process pool shared by every chunk of a session, rather than one started per chunk
+    :param job: the session's job
+    :param jobs: local worker processes, 0 uses every core
+    :param targets: loaded audit targets
+    :return: context manager yielding the pool, or None when chunks are hashed in this process
+    """
+    if jobs == 1:
+        yield None
+        return
+    if job['mode'] == 'audit':
+        pool = audit_pool(targets, jobs)
+    else:
+        pool = worker_pool(jobs, initializer=init_derivation, initargs=derivation_settings())
+    with pool:
+        yield pool
+        # let workers exit on their own, running their exit handlers, e.g. closing caches
+        pool.close()
+        pool.join()
+
+
+def connect(address: Tuple[str, int], timeout: float = DEFAULT_CONNECT_TIMEOUT):
+    """
+    Connects to the coordinator, retrying until timeout so workers may start first
+    :return: socket
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection(address)
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.2)
+
+
+def run_worker(address: Tuple[str, int], jobs: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+               connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, token: str = None):
+    """
+    Processes chunks from a coordinator until it says done
+    :param address: coordinator (host, port)
+    :param jobs: local worker processes, 0 uses every core
+    :param chunk_size: lines per local worker task
+    :param connect_timeout: seconds to keep trying to connect
+    :param token: the coordinator's shared secret
+    :return: number of chunks processed
+    """
+    processed = 0
+    hello = {'type': 'hello'} if token is None else {'type': 'hello', 'token': token}
+    with connect(address, connect_timeout) as sock:
+        send_frame(sock, hello)
+        job, _ = recv_frame(sock)
+        if job.get('type') != 'job':
+            raise ValueError(f'Unexpected message: {job.get("type")}')
+        targets = load_targets(job['targets']) if job['mode'] == 'audit' else None
+        with session_pool(job, jobs, targets) as pool:
+            while True:
+                header, body = recv_frame(sock)
+                if header.get('type') == 'done':
+                    break
+                if header.get('type') != 'chunk':
+                    raise ValueError(f'Unexpected message: {header.get("type")}')
+                records = process_chunk(job, body, jobs, chunk_size, targets, pool)
+                send_frame(sock, {'type': 'result', 'id': header['id']}, records.encode('utf8'))
+                processed += 1
+    return processed
+
+
+def worker_main(args):
+    parser = argparse.ArgumentParser(prog='scram worker', description='Hash chunks for a scram coordinator.')
+    parser.add_argument('address', type=address_spec, help='coordinator host:port')
+    parser.add_argument('-j', '--jobs', help='local worker processes, 0 uses every core', default=1, type=int,
+                        metavar='jobs', dest='jobs')
+    parser.add_argument('--chunk-size', help='lines sent to a local worker at a time', default=DEFAULT_CHUNK_SIZE,
+                        type=int, metavar='lines', dest='chunk_size')
+    parser.add_argument('--connect-timeout', help='seconds to keep trying to reach the coordinator',
+                        default=DEFAULT_CONNECT_TIMEOUT, type=float, metavar='seconds', dest='connect_timeout')
+    parser.add_argument('--token', help=f'the coordinator\'s shared secret, default ${DISTRIBUTE_TOKEN_ENV}',
+                        default=os.environ.get(DISTRIBUTE_TOKEN_ENV), metavar='token', dest='token')
+    args = parser.parse_args(args)
+    if args.jobs < 0:
+        parser.error('--jobs must be >= 0')
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be > 0')
+
+    try:
+        processed = run_worker(args.address, args.jobs, args.chunk_size, args.connect_timeout, args.token)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f'[worker] {processed} chunks', file=sys.stderr)
+    return 0
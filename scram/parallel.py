@@ -0,0 +1,115 @@
+import os
+from collections import deque
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List
+
+DEFAULT_CHUNK_SIZE = 256
+
+
+def cpu_count():
+    """
+    Number of usable cores
+    :return: int
+    """
+    return os.cpu_count() or 1
+
+
+def chunked(iterable: Iterable, size: int):
+    """
+    Splits an iterable into lists of at most size items
+    :param iterable: any iterable
+    :param size: maximum chunk length
+    :return: generator of lists
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _apply_chunk(func: Callable, chunk: List):
+    return [func(item) for item in chunk]
+
+
+def worker_pool(jobs: int = None, initializer=None, initargs=()):
+    """
+    A process pool, e.g. to share between imap_ordered calls instead of starting one per call
+    :param jobs: number of worker processes, defaults to the number of cores
+    :param initializer: optional callable run in each worker on start
+    :param initargs: arguments for initializer
+    :return: multiprocessing.Pool
+    """
+    if jobs is None or jobs < 1:
+        jobs = cpu_count()
+    # deferred, importing multiprocessing is a large share of the CLI's start up time
+    import multiprocessing
+
+    return multiprocessing.Pool(jobs, initializer=initializer, initargs=initargs)
+
+
+def _imap_window(pool, func: Callable, iterable: Iterable, chunk_size: int, window: int,
+                 idle: Callable[[], bool] = None) -> Iterator:
+    pending = deque()
+    iterator = iter(iterable)
+    chunk = []
+    while True:
+        if idle is not None and idle():
+            # the input is about to wait: send the partial chunk and hand out every result first
+            if chunk:
+                pending.append(pool.apply_async(_apply_chunk, (func, chunk)))
+                chunk = []
+            while pending:
+                yield from pending.popleft().get()
+        try:
+            chunk.append(next(iterator))
+        except StopIteration:
+            break
+        if len(chunk) >= chunk_size:
+            pending.append(pool.apply_async(_apply_chunk, (func, chunk)))
+            chunk = []
+            if len(pending) >= window:
+                yield from pending.popleft().get()
+            # finished results go out without waiting for the window to fill
+            while pending and pending[0].ready():
+                yield from pending.popleft().get()
+    if chunk:
+        pending.append(pool.apply_async(_apply_chunk, (func, chunk)))
+    while pending:
+        yield from pending.popleft().get()
+
+
+def imap_ordered(func: Callable, iterable: Iterable, jobs: int = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, initializer=None, initargs=(), pool=None,
+                 idle: Callable[[], bool] = None) -> Iterator:
+    """
+    Applies func to every item on a process pool, yielding results in input order.
+    Only a bounded window of chunks is in flight at once, so the input is consumed
+    lazily and memory stays flat regardless of input size.
+    :param func: picklable callable taking one item
+    :param iterable: input items
+    :param jobs: number of worker processes, defaults to the number of cores
+    :param chunk_size: items sent to a worker per task
+    :param initializer: optional callable run in each worker on start
+    :param initargs: arguments for initializer
+    :param pool: optional open pool of jobs workers, see worker_pool, used instead of starting one and
+        left open, its workers must already be initialized
+    :param idle: optional callable telling whether taking the next item would wait, e.g. BlockLineReader.idle,
+        items read so far are then sent as a partial chunk and their results yielded before waiting
+    :return: generator of results
+    """
+    if jobs is None or jobs < 1:
+        jobs = cpu_count()
+    if chunk_size < 1:
+        raise ValueError('Chunk size must be > 0')
+
+    window = jobs * 4
+    if pool is not None:
+        yield from _imap_window(pool, func, iterable, chunk_size, window, idle)
+        return
+    with worker_pool(jobs, initializer, initargs) as pool:
+        yield from _imap_window(pool, func, iterable, chunk_size, window, idle)
+        # let workers exit on their own, running their exit handlers, e.g. closing caches
+        pool.close()
+        pool.join()
@@ -0,0 +1,84 @@
+"""
+Mangling rules expanding a base word into candidates. Rules are applied in the order given and
+each keeps its input, so `case,digits` yields every case variant with and without a digit.
+Candidates are generated lazily, in a fixed order, without repeats within a base word.
+"""
+from typing import Iterator, List
+
+# ascii letters and their common digit and symbol substitutes
+LEET = bytes.maketrans(b'aeiostAEIOST', b'431057431057')
+
+
+def _case(word: bytes) -> Iterator[bytes]:
+    yield word
+    yield word.lower()
+    yield word.upper()
+    yield word.capitalize()
+    yield word.swapcase()
+
+
+def _digits(width: int):
+    def append(word: bytes) -> Iterator[bytes]:
+        yield word
+        for number in range(10 ** width):
+            yield word + str(number).zfill(width).encode('ascii')
+    return append
+
+
+def _leet(word: bytes) -> Iterator[bytes]:
+    yield word
+    yield word.translate(LEET)
+
+
+RULES = {
+    'case': _case,
+    'digits': _digits(1),
+    'digits2': _digits(2),
+    'leet': _leet,
+}
+
+
+def parse_rules(spec: str) -> List[str]:
+    """
+    Parses a comma separated rule list
+    :param spec: e.g. 'case,digits'
+    :return: List[str]
+    """
+    rules = [rule.strip() for rule in spec.split(',') if rule.strip()]
+    if not rules:
+        raise ValueError('No rules given')
+    for rule in rules:
+        if rule not in RULES:
+            raise ValueError(f'Not a valid rule: {rule}, expected one of {", ".join(RULES)}')
+    return rules
+
+
+def _apply(words: Iterator[bytes], rules: List[str]) -> Iterator[bytes]:
+    if not rules:
+        yield from words
+        return
+    rule = RULES[rules[0]]
+    for word in words:
+        yield from _apply(rule(word), rules[1:])
+
+
+def expand(word: bytes, rules: List[str]) -> Iterator[bytes]:
+    """
+    Candidates of one base word, the word itself first
+    :param word: base word
+    :param rules: rule names, see parse_rules
+    :return: generator of bytes
+    """
+    seen = set()
+    for candidate in _apply(iter([word]), rules):
+        if candidate not in seen:
+            seen.add(candidate)
+            yield candidate
+
+
+def expand_all(words: Iterator[bytes], rules: List[str]) -> Iterator[bytes]:
+    """
+    Candidates of every base word in turn
+    """
+    for word in words:
+        yield from expand(word, rules)
@@ -0,0 +1,68 @@
+"""
+Per-line salts for runs without a fixed salt. Both providers yield raw salt bytes, which go
+straight to the derivation; only formats that print the salt encode it.
+"""
+import hashlib
+import os
+from itertools import count
+from typing import Iterator
+
+SALT_LEN = 20
+# bytes of randomness fetched per os.urandom call
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+
+def random_salts(salt_len: int = SALT_LEN, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    Endless random salts sliced from large os.urandom blocks
+    :param salt_len: bytes per salt
+    :param block_size: bytes fetched at a time, rounded down to whole salts
+    :return: generator of bytes
+    """
+    if salt_len < 1 or block_size < 1:
+        raise ValueError('Salt length and block size must be > 0')
+    block_size = max(block_size // salt_len, 1) * salt_len
+    while True:
+        block = os.urandom(block_size)
+        for start in range(0, block_size, salt_len):
+            yield block[start:start + salt_len]
+
+
+def seeded_salts(seed: bytes, start: int = 0, salt_len: int = SALT_LEN) -> Iterator[bytes]:
+    """
+    Endless salts derived from a seed and the line index, the same line always gets the same salt
+    however the input is split between shards or workers
+    :param seed: any bytes
+    :param start: index of the first line
+    :param salt_len: bytes per salt, at most 64
+    :return: generator of bytes
+    """
+    if not isinstance(seed, bytes):
+        raise TypeError('Expected bytes type')
+    if not 1 <= salt_len <= 64:
+        raise ValueError('Salt length must be between 1 and 64')
+    if start < 0:
+        raise ValueError('Start index must be >= 0')
+    # keyed blake2b of the index, the key state is set up once and copied per line
+    key = hashlib.blake2b(seed, digest_size=32, person=b'scram-salts').digest()
+    keyed = hashlib.blake2b(digest_size=salt_len, key=key)
+    for index in count(start):
+        line = keyed.copy()
+        line.update(index.to_bytes(8, 'big'))
+        yield line.digest()
+
+
+def candidate_salt(line_salt: bytes, number: int) -> bytes:
+    """
+    Salt of a line's rule candidate, so every record gets its own salt while a line draws one from
+    its provider. The first candidate, the line itself, keeps the line's salt, the others get a keyed
+    blake2b of their number, as reproducible as the line's salt.
+    :param line_salt: raw salt of the line, at most 64 bytes
+    :param number: candidate number in rules.expand order
+    :return: bytes, as long as line_salt
+    """
+    if not number:
+        return line_salt
+    salt = hashlib.blake2b(digest_size=len(line_salt), key=line_salt, person=b'scram-candidate')
+    salt.update(number.to_bytes(8, 'big'))
+    return salt.digest()
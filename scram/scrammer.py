@@ -1,12 +1,52 @@
 import argparse
 from base64 import b64decode, b64encode
+from contextlib import ExitStack, contextmanager
+from functools import partial
+from importlib import import_module
+from itertools import islice
 import os
 import sys
-from typing import List
-from scram.scramsha1 import SCRAMSHA1
+from typing import Callable, Iterable, Iterator, List
+from scram.scramsha1 import (SCRAMSHA1, derivation_settings, init_derivation, scram_keys, scram_keys_multi,
+                             scram_keys_salts, scram_sha1_multi)
+from scram.parallel import DEFAULT_CHUNK_SIZE, chunked, imap_ordered
+from scram.backends import BACKEND_CHOICES, set_backend, using_backend
+from scram.cache import DEFAULT_DISK_SIZE, DEFAULT_SIZE, disable_cache, enable_cache
+from scram.stats import DEFAULT_INTERVAL, RunStats, stderr_reporter
+from scram.dedupe import DEFAULT_EXPECTED, Deduper
+from scram.rules import RULES, expand, parse_rules
+from scram.salts import candidate_salt, random_salts, seeded_salts
+from scram.stream import DEFAULT_BLOCK_SIZE, DEFAULT_FLUSH_INTERVAL, DEFAULT_FLUSH_SIZE, EMPTY_POLICIES, \
+    BlockLineReader, RecordWriter
+from scram.checkpoint import CHECKPOINT_SUFFIX, DEFAULT_INTERVAL as DEFAULT_CHECKPOINT_INTERVAL, Checkpoint, \
+    truncate_output
+# modules only some modes need (audit, table, wordlist, batch) are imported by those modes,
+# keeping `scram <plaintext>` start up cheap
 
-OUTPUT_FORMATS = ['hex', 'b64', 'hashcat']
+OUTPUT_FORMATS = ['hex', 'b64', 'hashcat', 'credential']
+# fixed-width records for `scram index` and `scram lookup`, written by file mode only
+TABLE_FORMAT = 'binary'
+# formats that need the ServerKey as well as the StoredKey
+KEY_FORMATS = ['credential']
+# formats that print the salt
+SALTED_FORMATS = ['hashcat', 'credential']
 HASH_LEN = 20
+OUTPUT_BUFFER_SIZE = 1 << 16
+# single mode runs one derivation, which pays back importing cryptography only for long ones,
+# the stdlib backend produces identical keys
+SINGLE_MODE_BACKEND = 'hashlib'
+# measured break-even, above it the faster cryptography iterations outweigh its import
+SINGLE_MODE_MAX_ITERATIONS = 100000
+# shared secret of --distribute runs and their workers, so it stays out of the process list
+DISTRIBUTE_TOKEN_ENV = 'SCRAM_DISTRIBUTE_TOKEN'
+# subcommands, `scram <command> ...`, as (module, function) loaded on use
+COMMANDS = {
+    'index': ('scram.table', 'index_main'),
+    'lookup': ('scram.table', 'lookup_main'),
+    'worker': ('scram.distributed', 'worker_main'),
+    'daemon': ('scram.daemon', 'daemon_main'),
+    'calibrate': ('scram.calibrate', 'calibrate_main'),
+}
 
 
 def gen_salt(byte_num: int):
@@ -19,13 +59,14 @@ def gen_salt(byte_num: int):
     return salt
 
 
-def hash_format(scram_res: bytes, salt: str, iterations: int, mode='hex'):
+def hash_format(scram_res: bytes, salt: str, iterations: int, mode='hex', server_key: bytes = None):
     """
     Formats the SCRAM result according to the mode
     :param scram_res: bytes
     :param salt: b64 encoded str
     :param iterations: int
-    :param mode: [hex, b64, hashcat]
+    :param mode: [hex, b64, hashcat, credential]
+    :param server_key: bytes, required for credential
     :return: str
     """
 
@@ -35,16 +76,262 @@ def hash_format(scram_res: bytes, salt: str, iterations: int, mode='hex'):
         output_content = b64encode(scram_res).decode('utf8')
     elif mode == 'hashcat':
         output_content = f'{iterations}:{salt}:{b64encode(scram_res).decode("utf8")}'
+    elif mode == 'credential':
+        # PostgreSQL style SCRAM secret, the same fields MongoDB keeps in its SCRAM-SHA-1 credentials
+        if server_key is None:
+            raise ValueError('The credential format needs the ServerKey')
+        output_content = (f'SCRAM-SHA-1${iterations}:{salt}$'
+                          f'{b64encode(scram_res).decode("utf8")}:{b64encode(server_key).decode("utf8")}')
     else:
         raise ValueError(f'Not a valid output mode: {mode}')
 
     return output_content
 
 
-def output_data(data: List[str], file=None):
+class _Untimed:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_UNTIMED = _Untimed()
+
+
+def _untimed(stage):
+    return _UNTIMED
+
+
+def derive(plaintext: bytes, salt: str, iterations: int, mode='hex'):
+    """
+    Runs the derivation the output format needs
+    :param plaintext: bytes
+    :param salt: b64 encoded str
+    :param iterations: int, or a list of increasing ints
+    :param mode: output format
+    :return: list of (iterations, StoredKey, ServerKey or None)
+    """
+    counts = iterations if isinstance(iterations, list) else [iterations]
+    if mode in KEY_FORMATS:
+        # one derivation gives the StoredKey and the ServerKey
+        if isinstance(iterations, list):
+            keys = scram_keys_multi(plaintext, salt, iterations)
+        else:
+            keys = [scram_keys(plaintext, salt, iterations)]
+        return [(count, key.stored_key, key.server_key) for count, key in zip(counts, keys)]
+    if isinstance(iterations, list):
+        hashes = scram_sha1_multi(plaintext, salt, iterations)
+    else:
+        hashes = [SCRAMSHA1(plaintext, salt, iterations)]
+    return [(count, hash_res, None) for count, hash_res in zip(counts, hashes)]
+
+
+def hash_line(plaintext: bytes, salt: str = None, iterations: int = 4096, mode='hex', stats: RunStats = None,
+              rules: List[str] = None, candidate_salts: bool = False):
+    """
+    Hashes and formats a single plaintext
+    :param plaintext: bytes
+    :param salt: b64 encoded str or raw salt bytes, generated if None
+    :param iterations: int, or a list of increasing ints for one record per count
+    :param mode: output format
+    :param stats: optional RunStats charged with the salt, pbkdf2 and format stages
+    :param rules: optional mangling rules, every candidate of the plaintext is hashed in rules.expand order
+    :param candidate_salts: salt is the line's raw salt from a provider, each candidate gets its own, see
+        salts.candidate_salt
+    :return: str, records for several counts or candidates are newline separated
+    """
+    timer = _untimed if stats is None else stats.timer
+    if rules:
+        records = []
+        for number, candidate in enumerate(expand(plaintext, rules)):
+            salt_of_candidate = salt
+            if candidate_salts:
+                with timer('salt'):
+                    salt_of_candidate = candidate_salt(salt, number)
+            records.append(hash_line(candidate, salt_of_candidate, iterations, mode, stats))
+        return '\n'.join(records)
+    with timer('salt'):
+        if salt is None:
+            salt = gen_salt(HASH_LEN)
+    with timer('pbkdf2'):
+        results = derive(plaintext, salt, iterations, mode)
+    with timer('format'):
+        if isinstance(salt, bytes) and mode in SALTED_FORMATS:
+            salt = b64encode(salt).decode('utf8')
+        return '\n'.join(hash_format(hash_res, salt, count, mode=mode, server_key=server_key)
+                         for count, hash_res, server_key in results)
+
+
+def hash_batch(plaintexts: List[bytes], salt: str, iterations: int, mode='hex'):
+    """
+    Hashes and formats plaintexts sharing one salt with the vectorized batch engine
+    :param plaintexts: list of bytes
+    :param salt: b64 encoded str
+    :param iterations: int
+    :param mode: output format, except credential
+    :return: List[str]
+    """
+    # numpy is optional and slow to import, only load it for batch runs
+    from scram.batch import batch_scram_sha1
+
+    hashes = batch_scram_sha1(plaintexts, salt, iterations)
+    return [hash_format(hash_res.tobytes(), salt, iterations, mode=mode) for hash_res in hashes]
+
+
+def _hash_salted(item, iterations, mode, rules):
+    plaintext, salt = item
+    return hash_line(plaintext, salt, iterations, mode, rules=rules, candidate_salts=True)
+
+
+def hash_lines(plaintexts: Iterable[bytes], salt: str = None, iterations: int = 4096, mode='hex',
+               jobs: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE, batch_size: int = None,
+               stats: RunStats = None, rules: List[str] = None, salts: Iterable[bytes] = None,
+               pool=None, idle: Callable[[], bool] = None) -> Iterator[str]:
+    """
+    Hashes and formats many plaintexts, optionally across a process pool.
+    Results are yielded in input order regardless of the number of jobs.
+    :param plaintexts: iterable of bytes
+    :param salt: b64 encoded str, a fresh salt is generated per plaintext if None
+    :param iterations: int
+    :param mode: output format
+    :param jobs: worker processes, 1 hashes in this process, 0 uses every core
+    :param chunk_size: plaintexts per worker task
+    :param batch_size: plaintexts per call to the batch engine, needs a salt
+    :param stats: optional RunStats, stages are only broken out when hashing in this process
+    :param rules: optional mangling rules, expanded where the plaintext is hashed, so only base words reach workers
+    :param salts: optional raw salts, one per plaintext, used instead of generating each salt when salt is None,
+        rule candidates of a plaintext get salts derived from its salt
+    :param pool: optional open pool of jobs workers initialized with init_derivation, reused instead of
+        starting one, see parallel.worker_pool
+    :param idle: optional callable telling whether the next plaintext would wait for its producer, so workers
+        get the lines read so far and their records are yielded first, see parallel.imap_ordered
+    :return: generator of str
+    """
+    if salt is None and salts is not None:
+        if stats is not None:
+            salts = stats.timed('salt', salts)
+        salted = zip(plaintexts, salts)
+        if jobs == 1:
+            for plaintext, line_salt in salted:
+                yield hash_line(plaintext, line_salt, iterations, mode, stats=stats, rules=rules, candidate_salts=True)
+        else:
+            func = partial(_hash_salted, iterations=iterations, mode=mode, rules=rules)
+            yield from imap_ordered(func, salted, jobs=jobs, chunk_size=chunk_size,
+                                    initializer=init_derivation, initargs=derivation_settings(), pool=pool,
+                                    idle=idle)
+    elif batch_size is not None:
+        batches = chunked(plaintexts, batch_size)
+        func = partial(hash_batch, salt=salt, iterations=iterations, mode=mode)
+        if jobs == 1:
+            results = map(func, batches)
+        else:
+            results = imap_ordered(func, batches, jobs=jobs, chunk_size=1, pool=pool)
+        for records in results:
+            yield from records
+    elif jobs == 1:
+        for plaintext in plaintexts:
+            yield hash_line(plaintext, salt, iterations, mode, stats=stats, rules=rules)
+    else:
+        func = partial(hash_line, salt=salt, iterations=iterations, mode=mode, rules=rules)
+        yield from imap_ordered(func, plaintexts, jobs=jobs, chunk_size=chunk_size,
+                                initializer=init_derivation, initargs=derivation_settings(), pool=pool, idle=idle)
+
+
+def hash_salts(plaintext: bytes, salts: Iterable, iterations: int, mode='hex') -> List[str]:
+    """
+    Hashes and formats one plaintext under many salts, keying the plaintext once, see scram_keys_salts
+    :param plaintext: bytes
+    :param salts: iterable of b64 encoded str or raw salt bytes
+    :param iterations: int
+    :param mode: output format
+    :return: List[str], one record per salt
+    """
+    salts = list(salts)
+    records = []
+    for salt, keys in zip(salts, scram_keys_salts(plaintext, salts, iterations)):
+        if isinstance(salt, bytes) and mode in SALTED_FORMATS:
+            salt = b64encode(salt).decode('utf8')
+        records.append(hash_format(keys.stored_key, salt, iterations, mode=mode, server_key=keys.server_key))
+    return records
+
+
+class LineReader:
+    """
+    Lazily reads plaintexts from a text file, one per line, counting the bytes consumed
+    """
+
+    def __init__(self, file):
+        """
+        :param file: open text file
+        """
+        self.file = file
+        self.bytes_read = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        for line in self.file:
+            stripped = line.strip()
+            plaintext = stripped.encode('utf8')
+            # exact for utf8 input, the stripped whitespace is ascii
+            self.bytes_read += len(plaintext) + len(line) - len(stripped)
+            yield plaintext
+
+    def position(self):
+        return self.bytes_read
+
+
+def stdin_lines(empty: str = 'stop') -> Iterator[bytes]:
+    """
+    Lazily reads plaintexts from stdin until EOF, or an empty line with the stop policy
+    :param empty: empty line policy, one of stream.EMPTY_POLICIES
+    :return: generator of bytes
+    """
+    while True:
+        try:
+            content = input()
+        except EOFError:
+            return
+        if content == '':
+            if empty == 'stop':
+                return
+            if empty == 'skip':
+                continue
+        yield content.strip().encode('utf8')
+
+
+@contextmanager
+def open_output(path: str = None, append: bool = False):
+    """
+    Opens the output file with a large write buffer, else uses stdout.
+    Results reach the file as each buffer fills, so an interrupted run keeps
+    everything but the last partial buffer.
+    :param path: optional output file path
+    :param append: add to the end of an existing file
+    :return: writable text file
+    """
+    if path is None:
+        yield sys.stdout
+    else:
+        with open(path, 'a' if append else 'w', buffering=OUTPUT_BUFFER_SIZE) as file:
+            yield file
+
+
+def salt_lines(file) -> Iterator[str]:
+    """
+    Lazily reads b64 salts from a text file, one per line, skipping blank lines
+    :param file: open text file
+    :return: generator of str
+    """
+    for line in file:
+        salt = line.strip()
+        if salt:
+            yield salt
+
+
+def output_data(data: Iterable[str], file=None):
     """
     Outputs the data to the file, else to stdout
-    :param data: List[str]
+    :param data: iterable of str, consumed lazily
     :param file: optional file
     """
     for item in data:
@@ -54,83 +341,402 @@ def output_data(data: List[str], file=None):
             print(item)
 
 
+def iteration_counts(value: str):
+    """
+    argparse type for --iter, a count or a comma separated list of counts
+    :param value: str
+    :return: int, or a sorted list of ints when several counts are given
+    """
+    try:
+        counts = sorted({int(count) for count in value.split(',')})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid iteration count: {value!r}')
+    return counts[0] if len(counts) == 1 else counts
+
+
+def rule_list(value: str):
+    """
+    argparse type for --rules, a comma separated list of rule names
+    :param value: str
+    :return: List[str]
+    """
+    try:
+        return parse_rules(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def address_spec(value: str):
+    """
+    argparse type for host:port
+    :param value: str
+    :return: (host, port)
+    """
+    host, _, port = value.rpartition(':')
+    try:
+        port = int(port)
+    except ValueError:
+        port = -1
+    if not host or not 0 <= port < 1 << 16:
+        raise argparse.ArgumentTypeError(f'invalid address: {value!r}, expected host:port')
+    return host, port
+
+
+def shard_spec(value: str):
+    """
+    argparse type for --shard, i/N with 1 <= i <= N
+    :param value: str
+    :return: (0 based index, count)
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid shard: {value!r}, expected i/N')
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f'invalid shard: {value!r}, expected 1 <= i <= N')
+    return index - 1, count
+
+
+def line_salts(args, first_line: int = 0):
+    """
+    Raw per-line salts for a run without a fixed salt
+    :param args: parsed arguments
+    :param first_line: index of the run's first line in the input, for --salt-seed
+    :return: iterator of bytes, or None when the run has a fixed salt
+    """
+    if args.salt is not None:
+        return None
+    if args.salt_seed is not None:
+        return seeded_salts(args.salt_seed.encode('utf8'), first_line, HASH_LEN)
+    return random_salts(HASH_LEN)
+
+
 def single_mode(args):
-    # gen salt if not given
-    if args.salt is None:
-        salt = gen_salt(HASH_LEN)
-    else:
-        salt = args.salt
+    if args.salts_file is not None or args.salt_count is not None:
+        return salts_mode(args)
+    plaintext = args.plaintext.encode('utf8')
+    salt = args.salt
+    if args.salt_seed is not None:
+        salt = next(line_salts(args))
+    data = [hash_line(plaintext, salt, args.iterations, mode=args.format, rules=args.rules)]
+
+    with open_output(args.output_file) as file:
+        output_data(data, file=file)
 
+
+def salts_mode(args):
+    """
+    One record per salt for the plaintext, e.g. a temporary password shared by many new accounts
+    """
     plaintext = args.plaintext.encode('utf8')
-    iterations = args.iterations
+    with ExitStack() as stack:
+        if args.salts_file is None:
+            salts = islice(line_salts(args), args.salt_count)
+        elif args.salts_file == '-':
+            salts = salt_lines(sys.stdin)
+        else:
+            salts = salt_lines(stack.enter_context(open(args.salts_file, 'r')))
+        file = stack.enter_context(open_output(args.output_file))
+        func = partial(hash_salts, plaintext, iterations=args.iterations, mode=args.format)
+        batches = chunked(salts, args.chunk_size)
+        if args.jobs == 1:
+            results = map(func, batches)
+        else:
+            results = imap_ordered(func, batches, jobs=args.jobs, chunk_size=1,
+                                   initializer=init_derivation, initargs=derivation_settings())
+        try:
+            output_data((record for records in results for record in records), file=file)
+        except ValueError as e:
+            # a malformed salt in the salts file
+            print(e, file=sys.stderr)
+
+
+def run_stats(args, total_bytes: int = None, position=None):
+    """
+    RunStats for the run when --stats or a stats callback asked for it
+    :param args: parsed arguments
+    :param total_bytes: input size
+    :param position: returns input bytes consumed
+    :return: RunStats or None
+    """
+    callbacks = list(getattr(args, 'stats_callbacks', []))
+    if args.stats:
+        callbacks.append(stderr_reporter)
+    if not callbacks:
+        return None
+    hashes_per_line = len(args.iterations) if isinstance(args.iterations, list) else 1
+    return RunStats(total_bytes, position, hashes_per_line, interval=args.stats_interval, callbacks=callbacks)
 
-    hash_res = SCRAMSHA1(plaintext, salt, iterations)
-    data = [hash_format(hash_res, salt, iterations, mode=args.format)]
 
-    output_data(data, file=args.output_file)
+def hash_stream(args, plaintexts: Iterable[bytes], file, stats: RunStats = None, checkpoint: Checkpoint = None,
+                first_line: int = 0, idle: Callable[[], bool] = None):
+    """
+    Hashes plaintexts and writes the records, instrumenting each stage when stats is given
+    :param args: parsed arguments
+    :param plaintexts: iterable of bytes, a MappedLineReader when checkpointing
+    :param file: writable text file
+    :param stats: optional RunStats
+    :param checkpoint: optional Checkpoint saved as records are written
+    :param first_line: index of the first plaintext in the input, seeds its salt with --salt-seed
+    :param idle: optional callable telling whether the next plaintext would wait, see hash_lines
+    """
+    if checkpoint is not None:
+        plaintexts = checkpoint.lines(plaintexts)
+    if stats is not None:
+        plaintexts = stats.timed('read', plaintexts)
+    hash_records = partial(hash_lines, salt=args.salt, iterations=args.iterations, mode=args.format, jobs=args.jobs,
+                           chunk_size=args.chunk_size, batch_size=args.batch_size, stats=stats, rules=args.rules,
+                           salts=line_salts(args, first_line), idle=idle)
+    deduper = None
+    if args.dedupe:
+        deduper = Deduper(args.dedupe_memory, args.dedupe_expected)
+        data = deduper.dedupe(plaintexts, hash_records,
+                              partial(hash_line, salt=args.salt, iterations=args.iterations, mode=args.format,
+                                      rules=args.rules))
+    else:
+        data = hash_records(plaintexts)
+    if stats is not None:
+        # one newline separated record per derivation, rules expand a line into several
+        data = stats.written(data, hashes=lambda records: records.count('\n') + 1)
+    if checkpoint is not None:
+        data = checkpoint.written(data, file)
+    try:
+        output_data(data, file=file)
+        if checkpoint is not None:
+            checkpoint.sync(file, complete=True)
+    finally:
+        if stats is not None:
+            stats.report(final=True)
+        if deduper is not None:
+            print(deduper.report(), file=sys.stderr)
 
 
 def file_mode(args):
+    if args.distribute is not None:
+        return distributed_mode(args)
+    if args.format == TABLE_FORMAT:
+        return table_mode(args)
+    if args.mmap or args.shard is not None or args.checkpoint:
+        return mapped_file_mode(args)
+
+    with open(args.input_file, 'r') as input_file, open_output(args.output_file) as file:
+        reader = LineReader(input_file)
+        stats = run_stats(args, os.fstat(input_file.fileno()).st_size, reader.position)
+        hash_stream(args, reader, file, stats)
+
 
-    with open(args.input_file, 'r') as input_file:
-        data = []
-        for line in input_file:
-            if args.salt is None:
-                salt = gen_salt(HASH_LEN)
-            else:
-                salt = args.salt
-            plaintext = line.strip().encode('utf8')
-            iterations = args.iterations
-            hash_res = SCRAMSHA1(plaintext, salt, iterations)
-            data.append(hash_format(hash_res, salt, iterations, mode=args.format))
+def mapped_file_mode(args):
+    from scram.wordlist import MappedWordlist
 
-    output_data(data, file=args.output_file)
+    with MappedWordlist(args.input_file) as wordlist:
+        if args.shard is None:
+            start, end = 0, wordlist.size
+        else:
+            start, end = wordlist.shard(*args.shard)
+
+        checkpoint = None
+        append = False
+        if args.checkpoint:
+            run = {'input': os.path.abspath(args.input_file), 'input_size': wordlist.size, 'range': [start, end],
+                   'salt': args.salt, 'iterations': args.iterations, 'format': args.format}
+            # only set when used, so checkpoints of plain runs keep resuming
+            if args.rules is not None:
+                run['rules'] = args.rules
+            if args.salt_seed is not None:
+                run['salt_seed'] = args.salt_seed
+            checkpoint = Checkpoint(args.checkpoint_file or args.output_file + CHECKPOINT_SUFFIX, run,
+                                    interval=args.checkpoint_interval)
+            state = checkpoint.load() if args.resume else None
+            if state is not None:
+                if state['complete']:
+                    return
+                truncate_output(args.output_file, state['output_offset'])
+                start = state['input_offset']
+                append = True
+
+        with open_output(args.output_file, append=append) as file:
+            reader = wordlist.reader(start, end)
+            stats = run_stats(args, end - start, reader.position)
+            first_line = wordlist.line_index(start) if args.salt_seed is not None else 0
+            hash_stream(args, reader, file, stats, checkpoint, first_line)
+
+
+def table_mode(args):
+    """
+    Writes a binary table of the input file's StoredKeys and line offsets
+    """
+    from scram.table import table_record, write_table
+    from scram.wordlist import MappedWordlist
+
+    with MappedWordlist(args.input_file) as wordlist:
+        start, end = (0, wordlist.size) if args.shard is None else wordlist.shard(*args.shard)
+        reader = wordlist.reader(start, end)
+        stats = run_stats(args, end - start, reader.position)
+        lines = reader.lines()
+        if stats is not None:
+            lines = stats.timed('read', lines)
+        func = partial(table_record, salt=args.salt, iterations=args.iterations)
+        if args.jobs == 1:
+            records = map(func, lines)
+        else:
+            records = imap_ordered(func, lines, jobs=args.jobs, chunk_size=args.chunk_size,
+                                   initializer=init_derivation, initargs=derivation_settings())
+        if stats is not None:
+            records = stats.written(records)
+        try:
+            with open(args.output_file, 'wb', buffering=OUTPUT_BUFFER_SIZE) as file:
+                write_table(file, records, b64decode(args.salt), args.iterations)
+        finally:
+            if stats is not None:
+                stats.report(final=True)
+
+
+def distributed_mode(args):
+    """
+    Serves byte ranges of the input file to `scram worker` processes and writes their records in order
+    """
+    from scram.audit import load_targets
+    from scram.distributed import Coordinator
+    from scram.wordlist import MappedWordlist
+
+    if args.audit_file is not None:
+        with open(args.audit_file, 'r') as target_file:
+            job = {'mode': 'audit', 'targets': [line.strip() for line in target_file if line.strip()]}
+        # bad targets fail here like in audit_mode, every worker would otherwise fail and requeue its chunks
+        load_targets(job['targets'])
+    else:
+        job = {'mode': 'hash', 'salt': args.salt, 'iterations': args.iterations, 'format': args.format}
+    job['rules'] = args.rules
+
+    with MappedWordlist(args.input_file) as wordlist:
+        start, end = (0, wordlist.size) if args.shard is None else wordlist.shard(*args.shard)
+        with Coordinator(wordlist, job, args.distribute, start, end, chunk_bytes=args.distribute_chunk,
+                         timeout=args.distribute_timeout, token=args.distribute_token) as coordinator, \
+                open_output(args.output_file) as file:
+            host, port = coordinator.address
+            print(f'[coordinator] listening on {host}:{port}', file=sys.stderr, flush=True)
+            output_data(coordinator.results(), file=file)
+        if coordinator.reassigned:
+            print(f'[coordinator] {coordinator.reassigned} chunks reassigned', file=sys.stderr)
 
 
 def stdin_mode(args):
-    salt = args.salt
-    needs_salt = True if salt is None else False
-    data = []
+    if args.stream:
+        return stream_mode(args)
     try:
-        while True:
-            content = input()
-            if content == '':
-                break
-            plaintext = content.strip().encode('utf8')
-            if needs_salt:
-                salt = gen_salt(HASH_LEN)
-            iterations = args.iterations
-            hash_res = SCRAMSHA1(plaintext, salt, iterations)
-            final = hash_format(hash_res, salt, iterations, mode=args.format)
-            if args.output_file is None:
-                output_data([final])
-            else:
-                data.append(final)
-    except EOFError:
-        pass
+        with open_output(args.output_file) as file:
+            hash_stream(args, stdin_lines(args.empty), file, run_stats(args))
     except KeyboardInterrupt:
         pass
     except Exception as e:
         print(e, file=sys.stderr)
-    finally:
-        if args.output_file:
-            with open(args.output_file, 'w') as file:
-                output_data(data, file=file)
 
 
-def main(args=None):
+def stream_mode(args):
+    """
+    stdin read in blocks and records written through a size and age flushed binary buffer
+    """
+    with ExitStack() as stack:
+        if args.output_file is None:
+            sys.stdout.flush()
+            raw = sys.stdout.buffer
+        else:
+            raw = stack.enter_context(open(args.output_file, 'wb'))
+        file = RecordWriter(raw, args.flush_size, args.flush_interval)
+        # records go out before waiting on a slow producer, not only when the next line arrives
+        reader = BlockLineReader(sys.stdin.buffer, args.block_size, args.empty, on_wait=file.flush)
+        try:
+            hash_stream(args, reader, file, run_stats(args, position=reader.position), idle=reader.idle)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            file.flush()
+
+
+def audit_mode(args):
+    from scram.audit import audit, format_hit, load_targets
+
+    with open(args.audit_file, 'r') as target_file:
+        targets = load_targets(target_file)
+
+    with ExitStack() as stack:
+        if args.input_file is None:
+            candidates = stdin_lines()
+        else:
+            candidates = LineReader(stack.enter_context(open(args.input_file, 'r')))
+        file = stack.enter_context(open_output(args.output_file))
+        hits = audit(candidates, targets, jobs=args.jobs, chunk_size=args.chunk_size, rules=args.rules)
+        output_data((format_hit(plaintext, record) for plaintext, record in hits), file=file)
+
+
+def run_command(name: str, args):
+    """
+    Runs a subcommand
+    :param name: key of COMMANDS
+    :param args: the subcommand's argument list
+    :return: exit code
+    """
+    module, function = COMMANDS[name]
+    return getattr(import_module(module), function)(args)
+
+
+def main(args=None, stats_callback=None):
+    """
+    Command line entry point
+    :param args: argument list, defaults to sys.argv
+    :param stats_callback: optional callable receiving RunStats snapshots of file and stdin runs
+    :return: exit code of subcommands
+    """
     if args is None:
-        args = parse_args(sys.argv[1:])
-    else:
-        args = parse_args(args)
+        args = sys.argv[1:]
+    # hash a plaintext named like a command with `scram [options] -- index`
+    if args and args[0] in COMMANDS:
+        return run_command(args[0], args[1:])
+    args = parse_args(args)
+    args.stats_callbacks = [stats_callback] if stats_callback is not None else []
+
+    backend_scope = ExitStack()
+    if args.backend is not None:
+        set_backend(args.backend)
+    elif args.plaintext is not None and args.salts_file is None and args.salt_count is None:
+        longest = max(args.iterations) if isinstance(args.iterations, list) else args.iterations
+        if longest < SINGLE_MODE_MAX_ITERATIONS:
+            # this run only, later runs and library calls in the process keep their backend
+            backend_scope.enter_context(using_backend(SINGLE_MODE_BACKEND))
+    with backend_scope:
+        run_modes(args)
+
+
+def run_modes(args):
+    """
+    Runs the mode selected by the parsed arguments, with the cache they ask for
+    """
+    cache = None
+    if args.cache or args.cache_file is not None:
+        cache = enable_cache(args.cache_size, args.cache_file, args.cache_disk_size)
 
     # activate modes
-    if args.plaintext is not None:
-        single_mode(args)
-    elif args.input_file is not None:
-        file_mode(args)
-    else:
-        stdin_mode(args)
+    try:
+        if args.audit_file is not None and args.distribute is not None:
+            distributed_mode(args)
+        elif args.audit_file is not None:
+            audit_mode(args)
+        elif args.plaintext is not None:
+            single_mode(args)
+        elif args.input_file is not None:
+            file_mode(args)
+        else:
+            stdin_mode(args)
+    except BrokenPipeError:
+        # reader went away, e.g. `scram -f words.txt | head`
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        if cache is not None:
+            if cache.hits + cache.misses:
+                print(cache.report(), file=sys.stderr)
+            disable_cache()
 
 
 def parse_args(args):
@@ -138,16 +744,159 @@ def parse_args(args):
     input_group = parser.add_mutually_exclusive_group()
     input_group.add_argument('plaintext', help='data fed to SCRAM-SHA1', nargs='?')
     input_group.add_argument('-f', '--file', help='input file', dest='input_file')
+    parser.add_argument('-a', '--audit', help='hashcat format targets to check the input wordlist against',
+                        metavar='target_file', dest='audit_file')
     parser.add_argument('-s', '--salt', help='B64 encoded salt', default=None,
                         type=str, metavar='salt', dest='salt')
-    parser.add_argument('-i', '--iter', help='iteration count', default=4096,
-                        type=int, metavar='iterations', dest='iterations')
+    parser.add_argument('--salt-seed', help='derive each line\'s salt from this seed and the line number instead '
+                                            'of at random, reproducible across shards and job counts',
+                        default=None, metavar='seed', dest='salt_seed')
+    parser.add_argument('--salts', help='hash the plaintext once per b64 salt in this file, one per line, '
+                                        '- reads stdin', default=None, metavar='salts_file', dest='salts_file')
+    parser.add_argument('--salt-count', help='hash the plaintext under this many generated salts',
+                        default=None, type=int, metavar='count', dest='salt_count')
+    parser.add_argument('-i', '--iter', help='iteration count, or a comma separated list of counts',
+                        default=4096, type=iteration_counts, metavar='iterations', dest='iterations')
     parser.add_argument('-o', help='output file', type=str, metavar='output_file', dest='output_file')
-    parser.add_argument('--format', '-fmt', choices=OUTPUT_FORMATS, help='output format',
+    parser.add_argument('--format', '-fmt', choices=OUTPUT_FORMATS + [TABLE_FORMAT],
+                        help=f'output format, {TABLE_FORMAT} writes a table for `scram index`',
                         default='hex', dest='format')
+    parser.add_argument('--backend', choices=BACKEND_CHOICES, default=None, dest='backend',
+                        help='hashing library, auto times each and picks the fastest')
+    parser.add_argument('--cache', action='store_true', dest='cache',
+                        help='cache SaltedPasswords in memory and report the hit rate on stderr')
+    parser.add_argument('--cache-size', help='entries kept in memory', default=DEFAULT_SIZE,
+                        type=int, metavar='entries', dest='cache_size')
+    parser.add_argument('--cache-file', help='sqlite file persisting the cache between runs, implies --cache',
+                        default=None, metavar='path', dest='cache_file')
+    parser.add_argument('--cache-disk-size', help='entries kept in the cache file', default=DEFAULT_DISK_SIZE,
+                        type=int, metavar='entries', dest='cache_disk_size')
+    parser.add_argument('-j', '--jobs', help='worker processes for file mode, 0 uses every core', default=1,
+                        type=int, metavar='jobs', dest='jobs')
+    parser.add_argument('--chunk-size', help='lines sent to a worker at a time', default=DEFAULT_CHUNK_SIZE,
+                        type=int, metavar='lines', dest='chunk_size')
+    parser.add_argument('--mmap', action='store_true', dest='mmap',
+                        help='memory map the input file and hash its lines as raw bytes')
+    parser.add_argument('--shard', help='only hash shard i of N equal byte ranges of the input file, implies --mmap',
+                        default=None, type=shard_spec, metavar='i/N', dest='shard')
+    parser.add_argument('--checkpoint', action='store_true', dest='checkpoint',
+                        help='periodically record progress of a file mode run so it can be resumed, implies --mmap')
+    parser.add_argument('--resume', action='store_true', dest='resume',
+                        help='continue a checkpointed run from its last checkpoint, implies --checkpoint')
+    parser.add_argument('--checkpoint-file', help=f'checkpoint path, default the output file + {CHECKPOINT_SUFFIX}',
+                        default=None, metavar='path', dest='checkpoint_file')
+    parser.add_argument('--checkpoint-interval', help='seconds between checkpoints',
+                        default=DEFAULT_CHECKPOINT_INTERVAL, type=float, metavar='seconds', dest='checkpoint_interval')
+    parser.add_argument('--stats', action='store_true', dest='stats',
+                        help='report throughput, progress and stage timings on stderr')
+    parser.add_argument('--stats-interval', help='seconds between --stats reports', default=DEFAULT_INTERVAL,
+                        type=float, metavar='seconds', dest='stats_interval')
+    parser.add_argument('--stream', action='store_true', dest='stream',
+                        help='read stdin in blocks and buffer output, for long running pipes')
+    parser.add_argument('--empty', choices=EMPTY_POLICIES, default=None, dest='empty',
+                        help='empty stdin lines end the input (stop), are dropped (skip) or hashed (hash), '
+                             'default stop, or skip with --stream')
+    parser.add_argument('--block-size', help='bytes read from stdin at a time with --stream',
+                        default=DEFAULT_BLOCK_SIZE, type=int, metavar='bytes', dest='block_size')
+    parser.add_argument('--flush-size', help='buffered output bytes that trigger a write with --stream',
+                        default=DEFAULT_FLUSH_SIZE, type=int, metavar='bytes', dest='flush_size')
+    parser.add_argument('--flush-interval', help='seconds output may stay buffered with --stream',
+                        default=DEFAULT_FLUSH_INTERVAL, type=float, metavar='seconds', dest='flush_interval')
+    parser.add_argument('--rules', help=f'comma separated mangling rules ({", ".join(RULES)}) expanding every '
+                                        'input line into candidates, one record per candidate',
+                        default=None, type=rule_list, metavar='rules', dest='rules')
+    parser.add_argument('--dedupe', action='store_true', dest='dedupe',
+                        help='derive each distinct plaintext once, repeats reuse its record, needs -s')
+    parser.add_argument('--dedupe-memory', help='remember at most this many records behind a Bloom filter '
+                                                'instead of every record, implies --dedupe',
+                        default=None, type=int, metavar='entries', dest='dedupe_memory')
+    parser.add_argument('--dedupe-expected', help='distinct plaintexts expected, sizes the Bloom filter',
+                        default=DEFAULT_EXPECTED, type=int, metavar='lines', dest='dedupe_expected')
+    parser.add_argument('--distribute', help='serve the input file to `scram worker` processes on host:port, '
+                                             'port 0 picks a free one, for trusted networks only: traffic is '
+                                             'not encrypted',
+                        default=None, type=address_spec, metavar='host:port', dest='distribute')
+    # defaults live in scram.distributed, which is only imported by --distribute runs
+    parser.add_argument('--distribute-chunk', help='approximate bytes of input per worker task, default 65536',
+                        default=None, type=int, metavar='bytes', dest='distribute_chunk')
+    parser.add_argument('--distribute-timeout', help='seconds a worker may take per task before it is reassigned, '
+                                                     'default 300',
+                        default=None, type=float, metavar='seconds', dest='distribute_timeout')
+    parser.add_argument('--distribute-token', help=f'shared secret workers must present, default '
+                                                   f'${DISTRIBUTE_TOKEN_ENV}',
+                        default=os.environ.get(DISTRIBUTE_TOKEN_ENV), metavar='token', dest='distribute_token')
+    parser.add_argument('--batch-size', help='hash file mode lines in vectorized batches of this size, needs -s',
+                        default=None, type=int, metavar='lines', dest='batch_size')
     args = parser.parse_args(args)
+    if args.audit_file is not None and args.plaintext is not None:
+        parser.error('--audit reads candidates from a file or stdin')
+    if args.jobs < 0:
+        parser.error('--jobs must be >= 0')
+    if args.chunk_size < 1:
+        parser.error('--chunk-size must be > 0')
+    if args.salt_seed is not None and (args.salt is not None or args.distribute is not None):
+        parser.error('--salt-seed cannot be combined with a fixed salt (-s) or --distribute')
+    if args.salts_file is not None or args.salt_count is not None:
+        if args.plaintext is None:
+            parser.error('--salts and --salt-count hash a plaintext argument')
+        if args.salts_file is not None and (args.salt_count is not None or args.salt_seed is not None):
+            parser.error('--salts cannot be combined with --salt-count or --salt-seed')
+        if args.salt_count is not None and args.salt_count < 1:
+            parser.error('--salt-count must be > 0')
+        if args.salt is not None or isinstance(args.iterations, list) or args.rules is not None \
+                or args.batch_size is not None:
+            parser.error('--salts and --salt-count cannot be combined with -s, several iteration counts, '
+                         '--rules or --batch-size')
+    if args.resume:
+        args.checkpoint = True
+    if args.checkpoint and (args.input_file is None or args.output_file is None):
+        parser.error('--checkpoint and --resume need an input file (-f) and an output file (-o)')
+    if (args.mmap or args.shard is not None) and args.input_file is None:
+        parser.error('--mmap and --shard need an input file (-f)')
+    if args.cache_size < 1 or args.cache_disk_size < 1:
+        parser.error('cache sizes must be > 0')
+    if args.batch_size is not None:
+        if args.batch_size < 1:
+            parser.error('--batch-size must be > 0')
+        if args.salt is None:
+            parser.error('--batch-size needs a fixed salt (-s)')
+        if isinstance(args.iterations, list) or args.format in KEY_FORMATS:
+            parser.error('--batch-size supports one iteration count and the hex, b64 and hashcat formats')
+    if args.stream and (args.plaintext is not None or args.input_file is not None or args.audit_file is not None):
+        parser.error('--stream reads plaintexts from stdin')
+    if args.block_size < 1 or args.flush_size < 1:
+        parser.error('--block-size and --flush-size must be > 0')
+    if args.empty is None:
+        args.empty = 'skip' if args.stream else 'stop'
+    if args.dedupe_memory is not None:
+        args.dedupe = True
+        if args.dedupe_memory < 1 or args.dedupe_expected < 1:
+            parser.error('--dedupe-memory and --dedupe-expected must be > 0')
+    if args.dedupe and (args.salt is None or args.plaintext is not None or args.audit_file is not None):
+        parser.error('--dedupe needs a fixed salt (-s) and a file or stdin run')
+    if args.rules is not None and args.batch_size is not None:
+        parser.error('--rules cannot be combined with --batch-size')
+    if args.distribute is not None:
+        if args.input_file is None:
+            parser.error('--distribute needs an input file (-f)')
+        if args.checkpoint or args.dedupe or args.batch_size is not None or args.stats or args.format == TABLE_FORMAT:
+            parser.error(f'--distribute cannot be combined with --checkpoint, --dedupe, --batch-size, --stats '
+                         f'or --format {TABLE_FORMAT}')
+        if args.distribute_chunk is not None and args.distribute_chunk < 1:
+            parser.error('--distribute-chunk must be > 0')
+        if not args.distribute_token:
+            parser.error(f'--distribute needs a shared token, --distribute-token or ${DISTRIBUTE_TOKEN_ENV}')
+    if args.format == TABLE_FORMAT:
+        if args.input_file is None or args.output_file is None or args.salt is None:
+            parser.error(f'--format {TABLE_FORMAT} needs an input file (-f), an output file (-o) and a salt (-s)')
+        if isinstance(args.iterations, list):
+            parser.error(f'--format {TABLE_FORMAT} supports one iteration count')
+        if (args.checkpoint or args.batch_size is not None or args.audit_file is not None or args.dedupe
+                or args.rules is not None):
+            parser.error(f'--format {TABLE_FORMAT} cannot be combined with --checkpoint, --batch-size, --audit, '
+                         f'--dedupe or --rules')
     return args
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
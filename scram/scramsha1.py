@@ -1,46 +1,265 @@
 from base64 import b64decode
-from cryptography.hazmat.primitives import hashes, hmac
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.backends import default_backend
+import hashlib
+from typing import Iterable, Iterator, List, NamedTuple
+from scram.backends import get_backend, set_backend
+from scram.cache import get_cache, init_worker_cache
 
+# stepping the PBKDF2 chain in Python costs roughly this many native iterations per iteration
+CHAIN_OVERHEAD = 6
+# up to this many iterations, stepping the chain from a password's precomputed HMAC pads beats
+# a native derivation, whose fixed cost per call dominates at low counts
+PAD_REUSE_ITERATIONS = 3
+# byte translation tables xoring a key with the HMAC inner and outer pads
+_INNER_PAD = bytes(b ^ 0x36 for b in range(256))
+_OUTER_PAD = bytes(b ^ 0x5c for b in range(256))
 
-def SCRAMSHA1(plaintext: bytes, salt: str, iterations: int):
+
+class ScramKeys(NamedTuple):
+    salted_password: bytes
+    client_key: bytes
+    stored_key: bytes
+    server_key: bytes
+
+
+def _validate(plaintext: bytes, salt: str, iterations: int):
     """
-    Implementation of SCRAM-SHA1
+    Validates SCRAM-SHA1 arguments
     :param plaintext: plaintext data
-    :param salt: base64 encoded string
+    :param salt: base64 encoded string, or the raw salt bytes
     :param iterations: # of iterations
-    :return: bytes
+    :return: decoded salt bytes
     """
-    # validate args
     if not isinstance(plaintext, bytes):
         raise TypeError('Expected bytes type')
 
-    try:
-        salt = b64decode(salt, validate=True)
-    except Exception as e:
-        raise ValueError('Invalid salt: {}'.format(e))
+    if not isinstance(salt, bytes):
+        try:
+            salt = b64decode(salt, validate=True)
+        except Exception as e:
+            raise ValueError('Invalid salt: {}'.format(e))
 
     if not isinstance(iterations, int):
         raise TypeError('Iterations must be an int.')
     if iterations < 1:
         raise ValueError('Iterations must be > 0')
 
-    backend = default_backend()
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA1(),
-        length=20,
-        salt=salt,
-        iterations=iterations,
-        backend=backend
-    )
-    salted_password = kdf.derive(plaintext)
-    # hmac
-    mac = hmac.HMAC(salted_password, hashes.SHA1(), backend=backend)
-    mac.update(b'Client Key')
-    client_key = mac.finalize()
-    # sha1
-    digest = hashes.Hash(hashes.SHA1(), backend=backend)
-    digest.update(client_key)
-    stored_key = digest.finalize()
-    return stored_key
+    return salt
+
+
+def _stored_key(salted_password: bytes):
+    """
+    Derives the StoredKey from a SaltedPassword
+    :param salted_password: PBKDF2 output
+    :return: bytes
+    """
+    backend = get_backend()
+    return backend.sha1(backend.hmac_sha1(salted_password, b'Client Key'))
+
+
+def _keys(salted_password: bytes):
+    """
+    Derives every SCRAM key from a SaltedPassword
+    :param salted_password: PBKDF2 output
+    :return: ScramKeys
+    """
+    backend = get_backend()
+    client_key = backend.hmac_sha1(salted_password, b'Client Key')
+    server_key = backend.hmac_sha1(salted_password, b'Server Key')
+    return ScramKeys(salted_password, client_key, backend.sha1(client_key), server_key)
+
+
+def _keys_keyed(salted_password: bytes):
+    """
+    _keys with the SaltedPassword keyed into HMAC pad states once, shared by both key HMACs
+    :param salted_password: PBKDF2 output
+    :return: ScramKeys
+    """
+    prf = _hmac_sha1_prf(salted_password)
+    client_key = prf(b'Client Key')
+    return ScramKeys(salted_password, client_key, hashlib.sha1(client_key).digest(), prf(b'Server Key'))
+
+
+def _salted_password(plaintext: bytes, salt: bytes, iterations: int):
+    """
+    PBKDF2-HMAC-SHA1 of the plaintext
+    :param plaintext: plaintext data
+    :param salt: raw salt bytes
+    :param iterations: # of iterations
+    :return: bytes
+    """
+    cache = get_cache()
+    if cache is not None:
+        salted_password = cache.get(plaintext, salt, iterations)
+        if salted_password is not None:
+            return salted_password
+    salted_password = get_backend().pbkdf2_sha1(plaintext, salt, iterations)
+    if cache is not None:
+        cache.put(plaintext, salt, iterations, salted_password)
+    return salted_password
+
+
+def derivation_settings():
+    """
+    Backend and cache settings of this process, to be applied in workers with init_derivation
+    :return: tuple
+    """
+    cache = get_cache()
+    return get_backend().name, None if cache is None else cache.options()
+
+
+def init_derivation(backend: str, cache_options: dict = None):
+    """
+    Applies derivation_settings, e.g. as a process pool initializer
+    :param backend: backend name
+    :param cache_options: SaltedPasswordCache options or None
+    """
+    set_backend(backend)
+    init_worker_cache(cache_options)
+
+
+def _hmac_sha1_prf(key: bytes):
+    """
+    HMAC-SHA1 keyed once: the inner and outer pad states are computed here and copied per message
+    :param key: HMAC key
+    :return: callable taking the message bytes and returning the MAC
+    """
+    key = key if len(key) <= 64 else hashlib.sha1(key).digest()
+    key = key.ljust(64, b'\x00')
+    inner = hashlib.sha1(key.translate(_INNER_PAD))
+    outer = hashlib.sha1(key.translate(_OUTER_PAD))
+
+    def prf(message):
+        inner_hash = inner.copy()
+        inner_hash.update(message)
+        outer_hash = outer.copy()
+        outer_hash.update(inner_hash.digest())
+        return outer_hash.digest()
+
+    return prf
+
+
+def _pbkdf2_sha1_chain(plaintext: bytes, salt: bytes, iterations: List[int], prf=None):
+    """
+    Walks a single PBKDF2-HMAC-SHA1 U-chain, recording the SaltedPassword at each count
+    :param plaintext: plaintext data
+    :param salt: raw salt bytes
+    :param iterations: strictly increasing iteration counts
+    :param prf: optional _hmac_sha1_prf of the plaintext, reused across salts
+    :return: List[bytes]
+    """
+    if prf is None:
+        prf = _hmac_sha1_prf(plaintext)
+    results = []
+    block = prf(salt + b'\x00\x00\x00\x01')
+    accumulator = int.from_bytes(block, 'big')
+    count = 1
+    for target in iterations:
+        while count < target:
+            block = prf(block)
+            accumulator ^= int.from_bytes(block, 'big')
+            count += 1
+        results.append(accumulator.to_bytes(20, 'big'))
+    return results
+
+
+def SCRAMSHA1(plaintext: bytes, salt: str, iterations: int):
+    """
+    Implementation of SCRAM-SHA1
+    :param plaintext: plaintext data
+    :param salt: base64 encoded string, or raw salt bytes
+    :param iterations: # of iterations
+    :return: bytes
+    """
+    salt = _validate(plaintext, salt, iterations)
+    salted_password = _salted_password(plaintext, salt, iterations)
+    return _stored_key(salted_password)
+
+
+def scram_keys(plaintext: bytes, salt: str, iterations: int):
+    """
+    SaltedPassword, ClientKey, StoredKey and ServerKey from a single PBKDF2 derivation
+    :param plaintext: plaintext data
+    :param salt: base64 encoded string, or raw salt bytes
+    :param iterations: # of iterations
+    :return: ScramKeys
+    """
+    salt = _validate(plaintext, salt, iterations)
+    return _keys(_salted_password(plaintext, salt, iterations))
+
+
+def scram_keys_multi(plaintext: bytes, salt: str, iterations: List[int], single_pass: bool = None):
+    """
+    SCRAM keys for several iteration counts of the same plaintext and salt.
+    The PBKDF2 chain for a smaller count is a prefix of the chain for a larger one, so a
+    single pass up to the largest count yields every key. The single pass is stepped in
+    Python, so by default it is only used when it beats one native derivation per count.
+    :param plaintext: plaintext data
+    :param salt: base64 encoded string, or raw salt bytes
+    :param iterations: strictly increasing iteration counts
+    :param single_pass: force (True) or avoid (False) the single pass, None picks the cheaper
+    :return: List[ScramKeys] in the order of iterations
+    """
+    if not isinstance(iterations, (list, tuple)) or not iterations:
+        raise TypeError('Iterations must be a non-empty list of ints.')
+    for count in iterations:
+        raw_salt = _validate(plaintext, salt, count)
+    if any(a >= b for a, b in zip(iterations, iterations[1:])):
+        raise ValueError('Iterations must be strictly increasing')
+
+    if single_pass is None:
+        single_pass = sum(iterations) > CHAIN_OVERHEAD * iterations[-1]
+    if single_pass:
+        salted_passwords = _pbkdf2_sha1_chain(plaintext, raw_salt, iterations)
+    else:
+        salted_passwords = [_salted_password(plaintext, raw_salt, count) for count in iterations]
+    return [_keys(salted_password) for salted_password in salted_passwords]
+
+
+def scram_sha1_multi(plaintext: bytes, salt: str, iterations: List[int], single_pass: bool = None):
+    """
+    SCRAM-SHA1 StoredKeys for several iteration counts, see scram_keys_multi
+    :param plaintext: plaintext data
+    :param salt: base64 encoded string, or raw salt bytes
+    :param iterations: strictly increasing iteration counts
+    :param single_pass: force (True) or avoid (False) the single pass, None picks the cheaper
+    :return: List[bytes] in the order of iterations
+    """
+    return [keys.stored_key for keys in scram_keys_multi(plaintext, salt, iterations, single_pass)]
+
+
+def scram_keys_salts(plaintext: bytes, salts: Iterable, iterations: int,
+                     reuse_pads: bool = None) -> Iterator[ScramKeys]:
+    """
+    SCRAM keys of one plaintext under many salts, e.g. a temporary password for many accounts.
+    The plaintext is checked and keyed into HMAC pad states once; at low iteration counts every
+    chain is stepped from those states, otherwise each salt gets a native derivation.
+    :param plaintext: plaintext data
+    :param salts: iterable of base64 encoded strings or raw salt bytes
+    :param iterations: # of iterations
+    :param reuse_pads: force (True) or avoid (False) stepping from the shared pad states, None picks the cheaper
+    :return: generator of ScramKeys, one per salt
+    """
+    _validate(plaintext, b'', iterations)
+    if reuse_pads is None:
+        reuse_pads = iterations <= PAD_REUSE_ITERATIONS
+    prf = _hmac_sha1_prf(plaintext) if reuse_pads else None
+    for salt in salts:
+        raw_salt = _validate(plaintext, salt, iterations)
+        if prf is not None:
+            salted_password = _pbkdf2_sha1_chain(plaintext, raw_salt, [iterations], prf)[0]
+        else:
+            salted_password = _salted_password(plaintext, raw_salt, iterations)
+        yield _keys_keyed(salted_password)
+
+
+def scram_sha1_salts(plaintext: bytes, salts: Iterable, iterations: int, reuse_pads: bool = None) -> Iterator[bytes]:
+    """
+    SCRAM-SHA1 StoredKeys of one plaintext under many salts, see scram_keys_salts
+    :param plaintext: plaintext data
+    :param salts: iterable of base64 encoded strings or raw salt bytes
+    :param iterations: # of iterations
+    :param reuse_pads: force (True) or avoid (False) stepping from the shared pad states, None picks the cheaper
+    :return: generator of bytes, one per salt
+    """
+    for keys in scram_keys_salts(plaintext, salts, iterations, reuse_pads):
+        yield keys.stored_key
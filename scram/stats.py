@@ -0,0 +1,139 @@
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, List
+
+STAGES = ['read', 'salt', 'pbkdf2', 'format', 'write']
+DEFAULT_INTERVAL = 2.0
+
+
+class RunStats:
+    """
+    Throughput, progress and per-stage timings of a hashing run. Callbacks receive a
+    snapshot dict every `interval` seconds and once more, with final=True, when the run ends.
+    """
+
+    def __init__(self, total_bytes: int = None, position: Callable[[], int] = None, hashes_per_line: int = 1,
+                 interval: float = DEFAULT_INTERVAL, callbacks: List[Callable[[dict], None]] = None):
+        """
+        :param total_bytes: input size, enables the ETA
+        :param position: returns the number of input bytes consumed so far
+        :param hashes_per_line: derivations per input line, e.g. several iteration counts
+        :param interval: seconds between progress callbacks
+        :param callbacks: called with snapshot()
+        """
+        self.total_bytes = total_bytes
+        self.position = position
+        self.hashes_per_line = hashes_per_line
+        self.interval = interval
+        self.callbacks = list(callbacks or [])
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.lines = 0
+        self.hashes = 0
+        self.start = time.perf_counter()
+        self._next_report = self.start + interval
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def timed(self, stage: str, iterable: Iterable):
+        """
+        Yields from iterable, charging the time spent producing each item to stage
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - start)
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+    def written(self, records: Iterable[str], hashes: Callable[[str], int] = None):
+        """
+        Yields records, charging the time the consumer keeps each one to 'write' and counting lines
+        :param records: one per input line
+        :param hashes: optional, derivations behind a line's record, default hashes_per_line
+        """
+        for record in records:
+            start = time.perf_counter()
+            yield record
+            self.add('write', time.perf_counter() - start)
+            self.lines += 1
+            self.hashes += self.hashes_per_line if hashes is None else hashes(record)
+            if time.perf_counter() >= self._next_report:
+                self.report()
+
+    def snapshot(self, final: bool = False):
+        """
+        Current metrics
+        :param final: marks the end of run summary
+        :return: dict
+        """
+        elapsed = time.perf_counter() - self.start
+        hashes = self.hashes
+        bytes_read = self.position() if self.position is not None else None
+        eta = None
+        if self.total_bytes and bytes_read and not final:
+            eta = elapsed * (self.total_bytes - bytes_read) / bytes_read
+        return {
+            'final': final,
+            'elapsed': elapsed,
+            'lines': self.lines,
+            'hashes': hashes,
+            'hashes_per_sec': hashes / elapsed if elapsed else 0.0,
+            'bytes_read': bytes_read,
+            'total_bytes': self.total_bytes,
+            'eta': eta,
+            'stages': dict(self.stages),
+        }
+
+    def report(self, final: bool = False):
+        """
+        Sends a snapshot to every callback
+        """
+        snapshot = self.snapshot(final)
+        for callback in self.callbacks:
+            callback(snapshot)
+        self._next_report = time.perf_counter() + self.interval
+        return snapshot
+
+
+def format_snapshot(snapshot: dict):
+    """
+    One line human readable summary of a snapshot
+    :param snapshot: RunStats.snapshot()
+    :return: str
+    """
+    parts = [f'{snapshot["lines"]} lines', f'{snapshot["hashes_per_sec"]:.1f} hashes/s']
+    if snapshot['final']:
+        parts.insert(0, 'done')
+        parts.append(f'{snapshot["elapsed"]:.1f}s')
+    elif snapshot['total_bytes'] and snapshot['bytes_read'] is not None:
+        parts.append(f'{snapshot["bytes_read"] / snapshot["total_bytes"]:.1%}')
+        if snapshot['eta'] is not None:
+            minutes, seconds = divmod(int(snapshot['eta']), 60)
+            hours, minutes = divmod(minutes, 60)
+            parts.append(f'ETA {hours}:{minutes:02d}:{seconds:02d}')
+    stages = ' '.join(f'{stage} {seconds:.2f}s' for stage, seconds in snapshot['stages'].items())
+    # time spent outside the stages, e.g. waiting on --jobs workers
+    other = max(0.0, snapshot['elapsed'] - sum(snapshot['stages'].values()))
+    stages += f' other {other:.2f}s'
+    return '[stats] ' + ', '.join(parts) + ' | ' + stages
+
+
+def stderr_reporter(snapshot: dict):
+    """
+    RunStats callback printing progress to stderr
+    """
+    print(format_snapshot(snapshot), file=sys.stderr, flush=True)
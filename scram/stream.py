@@ -0,0 +1,131 @@
+"""
+High volume stdin: lines are split out of large binary blocks and records leave through a
+buffer flushed by size or age, so `generator | scram --stream | consumer` does not pay a
+system call per line in either direction.
+"""
+import select
+import time
+from typing import Callable, Iterator
+
+DEFAULT_BLOCK_SIZE = 1 << 16
+DEFAULT_FLUSH_SIZE = 1 << 16
+DEFAULT_FLUSH_INTERVAL = 1.0
+# what an empty input line does: end the input, get dropped, or be hashed like any plaintext
+EMPTY_POLICIES = ['stop', 'skip', 'hash']
+
+
+class BlockLineReader:
+    """
+    Splits a binary stream read in blocks into stripped lines, counting the bytes consumed
+    """
+
+    def __init__(self, stream, block_size: int = DEFAULT_BLOCK_SIZE, empty: str = 'skip',
+                 on_wait: Callable[[], None] = None):
+        """
+        :param stream: binary file, e.g. sys.stdin.buffer
+        :param block_size: bytes requested per read
+        :param empty: one of EMPTY_POLICIES
+        :param on_wait: optional callable run before a read that would wait for the producer,
+            e.g. RecordWriter.flush so buffered records do not sit behind a slow producer
+        """
+        if block_size < 1:
+            raise ValueError('Block size must be > 0')
+        if empty not in EMPTY_POLICIES:
+            raise ValueError(f'Not a valid empty line policy: {empty}')
+        self.stream = stream
+        self.block_size = block_size
+        self.empty = empty
+        self.bytes_read = 0
+        self.on_wait = on_wait
+        # lines split out of the last block and not yet yielded
+        self._buffered = 0
+        # deferred like the other scram.wordlist users, single mode does not load it
+        from scram.wordlist import strip_line
+        self._strip = strip_line
+        # read1 returns what a pipe has without waiting for a full block
+        self._read = getattr(stream, 'read1', stream.read)
+
+    def position(self):
+        return self.bytes_read
+
+    def _ready(self):
+        try:
+            return bool(select.select([self.stream], [], [], 0)[0])
+        except (OSError, ValueError, TypeError, AttributeError):
+            # not selectable, e.g. a Windows pipe or an in-memory stream: assume the read waits
+            return False
+
+    def idle(self):
+        """
+        Whether the next line needs a read that would wait for the producer
+        :return: bool
+        """
+        return not self._buffered and not self._ready()
+
+    def _lines(self) -> Iterator[bytes]:
+        remainder = b''
+        while True:
+            if self.on_wait is not None and not self._ready():
+                self.on_wait()
+            block = self._read(self.block_size)
+            if not block:
+                break
+            lines = (remainder + block).split(b'\n')
+            remainder = lines.pop()
+            self._buffered = len(lines)
+            for line in lines:
+                self._buffered -= 1
+                self.bytes_read += len(line) + 1
+                yield self._strip(line)
+        if remainder:
+            self.bytes_read += len(remainder)
+            yield self._strip(remainder)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for plaintext in self._lines():
+            if not plaintext:
+                if self.empty == 'stop':
+                    return
+                if self.empty == 'skip':
+                    continue
+            yield plaintext
+
+
+class RecordWriter:
+    """
+    Text records written to a binary file in large writes, flushed once flush_size bytes
+    are pending or the oldest pending record is flush_interval seconds old
+    """
+
+    def __init__(self, raw, flush_size: int = DEFAULT_FLUSH_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        :param raw: binary file, e.g. sys.stdout.buffer
+        :param flush_size: pending bytes that trigger a write
+        :param flush_interval: seconds a record may wait, checked as records arrive; pair with
+            BlockLineReader's on_wait so records are also flushed while the input is idle
+        """
+        self.raw = raw
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = bytearray()
+        self._deadline = None
+
+    def write(self, text: str):
+        if not self._pending:
+            self._deadline = time.monotonic() + self.flush_interval
+        self._pending += text.encode('utf8')
+        if len(self._pending) >= self.flush_size or time.monotonic() >= self._deadline:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self._pending:
+            self.raw.write(self._pending)
+            self._pending.clear()
+        self.raw.flush()
+
+    def fileno(self):
+        return self.raw.fileno()
+
+    def tell(self):
+        return self.raw.tell() + len(self._pending)
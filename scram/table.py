@@ -0,0 +1,322 @@
+"""
+Fixed-salt precomputed tables: a binary file of fixed-width records, each a 20 byte StoredKey
+followed by the offset of its plaintext's line in the wordlist, behind a header holding the salt
+and iteration count.
+
+    scram -f words.txt -s <salt> -i 4096 --format binary -o words.tbl
+    scram index words.tbl -o words.idx
+    scram lookup words.idx words.txt <StoredKey>
+
+`index` sorts the records by StoredKey, `lookup` memory maps the sorted file and binary searches it.
+"""
+import argparse
+import heapq
+import mmap
+import os
+import sys
+import tempfile
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from struct import Struct
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+from scram.scramsha1 import SCRAMSHA1
+from scram.wordlist import strip_line
+
+MAGIC = b'SCRAMTB1'
+# magic, flags, salt length, iterations, record count
+HEADER = Struct('>8sBxHIQ')
+# StoredKey, plaintext line offset
+RECORD = Struct('>20sQ')
+DIGEST_LEN = 20
+FLAG_SORTED = 1
+# records sorted in memory at a time by `index`, about 60MB of Python objects per million
+DEFAULT_SORT_RECORDS = 1 << 20
+
+
+class TableHeader(NamedTuple):
+    salt: bytes
+    iterations: int
+    count: int
+    sorted: bool = False
+
+    @property
+    def size(self):
+        return HEADER.size + len(self.salt)
+
+    def pack(self):
+        return HEADER.pack(MAGIC, FLAG_SORTED if self.sorted else 0, len(self.salt), self.iterations,
+                           self.count) + self.salt
+
+
+def read_header(data) -> TableHeader:
+    """
+    Parses the header at the start of a table
+    :param data: bytes-like, at least the header
+    :return: TableHeader
+    """
+    if len(data) < HEADER.size:
+        raise ValueError('Not a scram table: truncated header')
+    magic, flags, salt_len, iterations, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a scram table: bad magic')
+    header = TableHeader(bytes(data[HEADER.size:HEADER.size + salt_len]), iterations, count,
+                         bool(flags & FLAG_SORTED))
+    if len(header.salt) != salt_len:
+        raise ValueError('Not a scram table: truncated header')
+    return header
+
+
+def read_table_header(path: str) -> TableHeader:
+    with open(path, 'rb') as file:
+        data = file.read(HEADER.size)
+        if len(data) == HEADER.size:
+            data += file.read(HEADER.unpack_from(data)[2])
+    return read_header(data)
+
+
+def table_record(item: Tuple[int, bytes], salt: str, iterations: int):
+    """
+    Hashes one wordlist line into a record
+    :param item: (line offset, plaintext)
+    :param salt: b64 encoded str
+    :param iterations: int
+    :return: bytes
+    """
+    offset, plaintext = item
+    return RECORD.pack(SCRAMSHA1(plaintext, salt, iterations), offset)
+
+
+def write_table(file, records: Iterable[bytes], salt: bytes, iterations: int, sorted_records: bool = False):
+    """
+    Writes a table, the record count in the header is filled in once every record is written
+    :param file: binary file open for writing, must be seekable
+    :param records: iterable of packed records
+    :param salt: raw salt
+    :param iterations: int
+    :param sorted_records: the records are in StoredKey order
+    :return: number of records
+    """
+    start = file.tell()
+    file.write(TableHeader(salt, iterations, 0, sorted_records).pack())
+    count = 0
+    for record in records:
+        file.write(record)
+        count += 1
+    end = file.tell()
+    file.seek(start)
+    file.write(TableHeader(salt, iterations, count, sorted_records).pack())
+    file.seek(end)
+    return count
+
+
+def read_records(file, header: TableHeader, limit: int = None) -> Iterator[bytes]:
+    """
+    Yields the packed records of a table opened past its header
+    :param file: binary file
+    :param header: the table's header
+    :param limit: records read per call to the file
+    """
+    limit = limit or DEFAULT_SORT_RECORDS
+    remaining = header.count
+    while remaining:
+        data = file.read(RECORD.size * min(remaining, limit))
+        if len(data) % RECORD.size or not data:
+            raise ValueError('Truncated scram table')
+        for position in range(0, len(data), RECORD.size):
+            yield data[position:position + RECORD.size]
+        remaining -= len(data) // RECORD.size
+
+
+def _spill(records: List[bytes], directory: str):
+    records.sort()
+    run = tempfile.TemporaryFile(dir=directory)
+    run.write(b''.join(records))
+    run.seek(0)
+    return run
+
+
+def _run_records(run) -> Iterator[bytes]:
+    while True:
+        data = run.read(RECORD.size * 4096)
+        if not data:
+            return
+        for position in range(0, len(data), RECORD.size):
+            yield data[position:position + RECORD.size]
+
+
+def sort_table(source: str, destination: str, max_records: int = DEFAULT_SORT_RECORDS):
+    """
+    Sorts a table by StoredKey, tables larger than max_records are merge sorted through temporary runs
+    :param source: table path
+    :param destination: sorted table path, may be the source
+    :param max_records: records held in memory at a time
+    :return: TableHeader of the sorted table
+    """
+    if max_records < 1:
+        raise ValueError('max_records must be > 0')
+    directory = os.path.dirname(os.path.abspath(destination))
+    runs = []
+    try:
+        with open(source, 'rb') as file:
+            header = read_table_header(source)
+            file.seek(header.size)
+            chunk = []
+            for record in read_records(file, header):
+                chunk.append(record)
+                if len(chunk) == max_records:
+                    runs.append(_spill(chunk, directory))
+                    chunk = []
+        if runs:
+            if chunk:
+                runs.append(_spill(chunk, directory))
+            records = heapq.merge(*(_run_records(run) for run in runs))
+        else:
+            chunk.sort()
+            records = chunk
+        # written next to the destination and renamed, so sorting in place is safe
+        tmp_path = destination + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            write_table(file, records, header.salt, header.iterations, sorted_records=True)
+        os.replace(tmp_path, destination)
+    finally:
+        for run in runs:
+            run.close()
+    return header._replace(sorted=True)
+
+
+class Table:
+    """
+    Memory mapped sorted table, StoredKeys are found by binary search
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: table path, written by sort_table
+        """
+        self._file = open(path, 'rb')
+        try:
+            self.header = read_table_header(path)
+            if not self.header.sorted:
+                raise ValueError(f'Table {path} is not sorted, run `scram index` first')
+            size = self._file.seek(0, 2)
+            if size != self.header.size + self.header.count * RECORD.size:
+                raise ValueError(f'Table {path} is truncated')
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __len__(self):
+        return self.header.count
+
+    def _digest(self, index: int):
+        position = self.header.size + index * RECORD.size
+        return self.data[position:position + DIGEST_LEN]
+
+    def find(self, stored_key: bytes) -> List[int]:
+        """
+        Line offsets of every plaintext whose StoredKey is stored_key
+        :param stored_key: 20 bytes
+        :return: List[int], in wordlist order
+        """
+        if len(stored_key) != DIGEST_LEN:
+            raise ValueError(f'A StoredKey is {DIGEST_LEN} bytes, got {len(stored_key)}')
+        low, high = 0, self.header.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._digest(middle) < stored_key:
+                low = middle + 1
+            else:
+                high = middle
+        offsets = []
+        while low < self.header.count and self._digest(low) == stored_key:
+            offsets.append(RECORD.unpack_from(self.data, self.header.size + low * RECORD.size)[1])
+            low += 1
+        return offsets
+
+    def close(self):
+        self.data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_line(wordlist, offset: int):
+    """
+    Plaintext of the wordlist line starting at offset, stripped like the line that was hashed
+    :param wordlist: binary file
+    :param offset: int
+    :return: bytes
+    """
+    wordlist.seek(offset)
+    return strip_line(wordlist.readline())
+
+
+def parse_stored_key(value: str):
+    """
+    StoredKey given as hex or base64
+    :param value: str
+    :return: bytes
+    """
+    try:
+        if len(value) == DIGEST_LEN * 2:
+            return bytes.fromhex(value)
+        stored_key = b64decode(value, validate=True)
+    except (ValueError, BinasciiError):
+        raise ValueError(f'Not a hex or base64 StoredKey: {value!r}')
+    if len(stored_key) != DIGEST_LEN:
+        raise ValueError(f'Not a hex or base64 StoredKey: {value!r}')
+    return stored_key
+
+
+def index_main(args):
+    parser = argparse.ArgumentParser(prog='scram index', description='Sort a binary table by StoredKey.')
+    parser.add_argument('table', help='table written with --format binary')
+    parser.add_argument('-o', help='sorted table, default sorts in place', metavar='output_file',
+                        dest='output_file')
+    parser.add_argument('--max-records', help='records sorted in memory at a time', default=DEFAULT_SORT_RECORDS,
+                        type=int, metavar='records', dest='max_records')
+    args = parser.parse_args(args)
+    if args.max_records < 1:
+        parser.error('--max-records must be > 0')
+
+    try:
+        header = sort_table(args.table, args.output_file or args.table, args.max_records)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f'{header.count} records, salt {b64encode(header.salt).decode("utf8")}, '
+          f'{header.iterations} iterations', file=sys.stderr)
+    return 0
+
+
+def lookup_main(args):
+    parser = argparse.ArgumentParser(prog='scram lookup',
+                                     description='Find the plaintexts of StoredKeys in a sorted table.')
+    parser.add_argument('table', help='table sorted with `scram index`')
+    parser.add_argument('wordlist', help='wordlist the table was built from')
+    parser.add_argument('stored_keys', help='hex or base64 StoredKeys', nargs='+', metavar='stored_key')
+    args = parser.parse_args(args)
+
+    try:
+        stored_keys = [parse_stored_key(value) for value in args.stored_keys]
+    except ValueError as e:
+        parser.error(str(e))
+
+    found = 0
+    try:
+        with Table(args.table) as table, open(args.wordlist, 'rb') as wordlist:
+            for value, stored_key in zip(args.stored_keys, stored_keys):
+                offsets = table.find(stored_key)
+                for offset in offsets:
+                    print(f'{value}:{read_line(wordlist, offset).decode("utf8", "replace")}')
+                found += bool(offsets)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    # like grep, 1 when nothing was found
+    return 0 if found else 1
@@ -0,0 +1,137 @@
+import mmap
+from typing import Iterator, List, Tuple
+
+# stripped by str.strip but not bytes.strip: the ascii separators 0x1c-0x1f and every
+# non ascii whitespace, whose utf8 encoding starts and ends with a byte >= 0x80
+_TEXT_ONLY_WHITESPACE = frozenset(range(0x1c, 0x20)) | frozenset(range(0x80, 0x100))
+
+
+def strip_line(line: bytes) -> bytes:
+    """
+    Strips a line like the text file path's str.strip, e.g. a trailing U+00A0 is removed
+    :param line: utf8 bytes
+    :return: bytes, lines that are not valid utf8 are only stripped of ascii whitespace
+    """
+    line = line.strip()
+    if line and (line[0] in _TEXT_ONLY_WHITESPACE or line[-1] in _TEXT_ONLY_WHITESPACE):
+        try:
+            return line.decode('utf8').strip().encode('utf8')
+        except UnicodeDecodeError:
+            pass
+    return line
+
+
+class MappedWordlist:
+    """
+    Memory mapped wordlist read as bytes, with no decode/encode round trip.
+    Shards are byte ranges aligned to line starts, found without scanning the whole file.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: wordlist path
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        self.size = self._file.seek(0, 2)
+        # empty files cannot be mapped
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def line_start(self, position: int):
+        """
+        Offset of the first line starting at or after position
+        :param position: byte offset
+        :return: int
+        """
+        if position <= 0:
+            return 0
+        if position >= self.size:
+            return self.size
+        newline = self.data.find(b'\n', position - 1)
+        return self.size if newline == -1 else newline + 1
+
+    def line_index(self, position: int, block_size: int = 1 << 24):
+        """
+        Number of lines before position, the index of the line starting there
+        :param position: a line start
+        :param block_size: bytes counted at a time
+        :return: int
+        """
+        lines = 0
+        for start in range(0, min(position, self.size), block_size):
+            lines += self.data[start:min(start + block_size, position)].count(b'\n')
+        return lines
+
+    def shard(self, index: int, count: int) -> Tuple[int, int]:
+        """
+        Byte range of shard index (0 based) out of count, every line falls in exactly one shard
+        :param index: int
+        :param count: int
+        :return: (start, end)
+        """
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f'Invalid shard {index} of {count}')
+        return (self.line_start(self.size * index // count),
+                self.line_start(self.size * (index + 1) // count))
+
+    def shards(self, count: int) -> List[Tuple[int, int]]:
+        """
+        Every shard's byte range
+        :param count: int
+        :return: list of (start, end)
+        """
+        return [self.shard(index, count) for index in range(count)]
+
+    def reader(self, start: int = 0, end: int = None):
+        """
+        Plaintexts of the lines in [start, end)
+        :return: MappedLineReader
+        """
+        return MappedLineReader(self.data, start, self.size if end is None else end)
+
+
+class MappedLineReader:
+    """
+    Iterates the stripped lines of a byte range, tracking the offset consumed
+    """
+
+    def __init__(self, data, start: int, end: int):
+        self.data = data
+        self.start = start
+        self.end = end
+        self.offset = start
+
+    @property
+    def bytes_read(self):
+        return self.offset - self.start
+
+    def position(self):
+        return self.bytes_read
+
+    def __iter__(self) -> Iterator[bytes]:
+        for _, plaintext in self.lines():
+            yield plaintext
+
+    def lines(self) -> Iterator[Tuple[int, bytes]]:
+        """
+        Yields (offset of the line, stripped line)
+        """
+        data = self.data
+        end = self.end
+        while self.offset < end:
+            line_start = self.offset
+            newline = data.find(b'\n', line_start, end)
+            line_end = end if newline == -1 else newline + 1
+            self.offset = line_end
+            yield line_start, strip_line(data[line_start:line_end])
@@ -4,11 +4,12 @@ setup(
     name='scram',
     author='Matthew Lazeroff',
     version='0.1dev',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks']),
     package_data={'scram': ['*']},
     include_package_data=True,
     setup_requires=['wheel'],
     install_requires=['cryptography', 'pytest', 'pytest-mock'],
+    extras_require={'batch': ['numpy']},
     entry_points={'console_scripts': 'scram = scram.scrammer:main'},
     tests='tests',
     tests_require=['pytest', 'pytest-mock']
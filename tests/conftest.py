@@ -0,0 +1,20 @@
+from pathlib import Path
+import pytest
+from scram import backends
+
+RESOURCES = Path(__file__).parent / 'resources'
+SMALL_DICT = RESOURCES / 'small_dictionary.txt'
+SMALL_DICT_WORDS = [b'johnny', b'walker', b'porsche', b'ligma', b'avatar']
+# StoredKeys of SMALL_DICT_WORDS, salt 1234 and 4096 iterations
+SMALL_DICT_SALT = '1234'
+SMALL_DICT_HEX = ['c89a8efabda245d57e178bbf1b23a0fb282301f7', '7bcc94a7fad21b166a46ea5f6e7ace3a53f83583',
+                  '1907d2a38a46200722a30e9f2c3c20edf20a051e', 'd63705b127777e7aa8ace460a5aa1c6a91051a55',
+                  '29a7bca35ab4817e9460506912c1d3e69c8efcb0']
+
+
+@pytest.fixture
+def restore_backend():
+    # tests that select a backend leave the session's one active afterwards
+    active = backends.get_backend()
+    yield
+    backends.set_backend(active.name)
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from scram import aio
+from tests.conftest import SMALL_DICT_HEX, SMALL_DICT_WORDS
+
+plaintext = b'pencil'
+salt = 'QSXCR+Q6sek8bf92'
+iterations = 4096
+STORED_KEY = 'e9d94660c39d65c38fbad91c358f14da0eef2bd6'
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_scramsha1():
+    assert run(aio.scramsha1(plaintext, salt, iterations)).hex() == STORED_KEY
+
+
+def test_validation_before_offload():
+    with pytest.raises(TypeError):
+        run(aio.scramsha1('not bytes', salt, iterations))
+    with pytest.raises(ValueError):
+        run(aio.AsyncScram().scramsha1(plaintext, 'im a bad salt', iterations))
+
+
+def test_bad_concurrency(mocker):
+    executor = mocker.patch('scram.aio.ThreadPoolExecutor')
+    with pytest.raises(ValueError):
+        aio.AsyncScram(concurrency=0)
+    # checked before a pool is created, nothing is left to shut down
+    executor.assert_not_called()
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_gather_keeps_order(processes):
+    async def main():
+        async with aio.AsyncScram(processes=processes, workers=2) as scram:
+            return await scram.gather(SMALL_DICT_WORDS, '1234', 4096)
+    assert run(main()) == SMALL_DICT_HEX
+
+
+def test_keys_and_format():
+    async def main():
+        async with aio.AsyncScram(concurrency=1) as scram:
+            keys = await scram.scram_keys(plaintext, salt, iterations)
+            record = await scram.hash_line(plaintext, salt, iterations, mode='hashcat')
+        return keys, record
+    keys, record = run(main())
+    assert keys.stored_key.hex() == STORED_KEY
+    assert record == '4096:QSXCR+Q6sek8bf92:6dlGYMOdZcOPutkcNY8U2g7vK9Y='
+
+
+def test_process_pool_without_initializer(monkeypatch):
+    # the path taken before 3.7, where ProcessPoolExecutor has no initializer
+    monkeypatch.setattr(aio, 'POOL_INITIALIZER', False)
+
+    async def main():
+        async with aio.AsyncScram(processes=True, workers=2) as scram:
+            return await scram.gather(SMALL_DICT_WORDS, '1234', 4096)
+    assert run(main()) == SMALL_DICT_HEX
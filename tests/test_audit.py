@@ -0,0 +1,67 @@
+import itertools
+import pytest
+from scram import audit, scrammer
+from tests.conftest import SMALL_DICT
+
+PENCIL_RECORD = '4096:QSXCR+Q6sek8bf92:6dlGYMOdZcOPutkcNY8U2g7vK9Y='
+PORSCHE_RECORD = '4096:1234:GQfSo4pGIAciow6fLDwg7fIKBR4='
+AVATAR_RECORD = '4096:1234:Kae8o1q0gX6UYFBpEsHT5pyO/LA='
+TARGETS = [PENCIL_RECORD, PORSCHE_RECORD, AVATAR_RECORD, '']
+
+
+def test_parse_hashcat():
+    iterations, salt, stored_key = audit.parse_hashcat(PENCIL_RECORD)
+    assert iterations == 4096
+    assert salt == 'QSXCR+Q6sek8bf92'
+    assert stored_key.hex() == 'e9d94660c39d65c38fbad91c358f14da0eef2bd6'
+
+
+@pytest.mark.parametrize('record', ['4096:1234', 'many:1234:GQfSo4pGIAciow6fLDwg7fIKBR4=', '4096:1234:not b64'])
+def test_parse_bad_hashcat(record):
+    with pytest.raises(ValueError):
+        audit.parse_hashcat(record)
+
+
+def test_load_targets_groups():
+    targets = audit.load_targets(TARGETS)
+    assert set(targets) == {('QSXCR+Q6sek8bf92', 4096), ('1234', 4096)}
+    assert len(targets[('1234', 4096)]) == 2
+
+
+def test_audit_derives_once_per_group(mocker):
+    spy = mocker.spy(audit, 'SCRAMSHA1')
+    targets = audit.load_targets(TARGETS)
+    hits = list(audit.audit([b'nope'], targets))
+    assert hits == []
+    assert spy.call_count == 2
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_audit_hits(jobs):
+    targets = audit.load_targets(TARGETS)
+    candidates = [b'johnny', b'porsche', b'pencil', b'avatar']
+    hits = list(audit.audit(candidates, targets, jobs=jobs))
+    assert hits == [(b'porsche', PORSCHE_RECORD), (b'pencil', PENCIL_RECORD), (b'avatar', AVATAR_RECORD)]
+
+
+def test_audit_mode(tmp_path, capsys):
+    target_file = tmp_path / 'targets.txt'
+    target_file.write_text('\n'.join(TARGETS))
+    scrammer.main(['-a', str(target_file), '-f', str(SMALL_DICT)])
+    out = capsys.readouterr().out.split()
+    assert out == ['porsche:' + PORSCHE_RECORD, 'avatar:' + AVATAR_RECORD]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_audit_reports_each_key_once(jobs):
+    targets = audit.load_targets([PENCIL_RECORD, PORSCHE_RECORD])
+    candidates = [b'pencil', b'johnny', b'pencil', b'porsche', b'porsche']
+    hits = list(audit.audit(candidates, targets, jobs=jobs, chunk_size=1))
+    assert hits == [(b'pencil', PENCIL_RECORD), (b'porsche', PORSCHE_RECORD)]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_audit_stops_when_all_found(jobs):
+    targets = audit.load_targets([PENCIL_RECORD])
+    candidates = itertools.chain([b'johnny', b'pencil'], itertools.repeat(b'nope'))
+    assert list(audit.audit(candidates, targets, jobs=jobs, chunk_size=1)) == [(b'pencil', PENCIL_RECORD)]
@@ -0,0 +1,63 @@
+import hashlib
+import pytest
+from scram import backends
+from scram.scramsha1 import SCRAMSHA1
+from scram import scrammer
+
+plaintext = b'pencil'
+salt = 'QSXCR+Q6sek8bf92'
+iterations = 4096
+STORED_KEY = 'e9d94660c39d65c38fbad91c358f14da0eef2bd6'
+
+
+pytestmark = pytest.mark.usefixtures('restore_backend')
+
+
+def test_hashlib_always_available():
+    assert 'hashlib' in backends.available_backends()
+
+
+@pytest.mark.parametrize('name', backends.BACKENDS)
+def test_backend_vector(name):
+    try:
+        backends.set_backend(name)
+    except ImportError:
+        pytest.skip(f'{name} not installed')
+    assert SCRAMSHA1(plaintext, salt, iterations).hex() == STORED_KEY
+
+
+def test_auto_backend():
+    backend = backends.set_backend('auto')
+    assert backend.name in backends.available_backends()
+    assert SCRAMSHA1(plaintext, salt, iterations).hex() == STORED_KEY
+
+
+def test_check_vector():
+    plaintext, salt, iterations, expected = backends.CHECK_VECTOR
+    assert iterations <= 2
+    assert hashlib.pbkdf2_hmac('sha1', plaintext, salt, iterations) == expected
+
+
+def test_failed_check(monkeypatch):
+    monkeypatch.setitem(backends.BACKENDS, 'broken', lambda: backends.Backend('broken', lambda *args: bytes(20),
+                                                                               None, None))
+    with pytest.raises(RuntimeError):
+        backends.load_backend('broken')
+
+
+def test_using_backend():
+    active = backends.get_backend()
+    with backends.using_backend('hashlib') as backend:
+        assert backends.get_backend() is backend and backend.name == 'hashlib'
+    assert backends.get_backend() is active
+
+
+def test_not_a_backend():
+    with pytest.raises(ValueError):
+        backends.set_backend('fake')
+
+
+def test_backend_flag(capsys):
+    scrammer.main(['pencil', '-s', salt, '--backend', 'hashlib'])
+    assert backends.get_backend().name == 'hashlib'
+    assert capsys.readouterr().out.strip() == STORED_KEY
@@ -0,0 +1,46 @@
+import pytest
+from scram.scramsha1 import SCRAMSHA1
+from scram import scrammer
+
+np = pytest.importorskip('numpy')
+from scram.batch import batch_scram_sha1
+
+salt = 'QSXCR+Q6sek8bf92'
+PLAINTEXTS = [b'pencil', b'johnny', b'', b'x' * 64, b'y' * 100]
+
+
+@pytest.mark.parametrize('iterations', [1, 2, 50])
+def test_batch_matches_scalar(iterations):
+    result = batch_scram_sha1(PLAINTEXTS, salt, iterations)
+    assert result.shape == (len(PLAINTEXTS), 20)
+    assert result.dtype == np.uint8
+    for plaintext, stored_key in zip(PLAINTEXTS, result):
+        assert stored_key.tobytes() == SCRAMSHA1(plaintext, salt, iterations)
+
+
+def test_batch_empty():
+    assert batch_scram_sha1([], salt, 10).shape == (0, 20)
+
+
+def test_batch_non_bytes():
+    with pytest.raises(TypeError):
+        batch_scram_sha1([b'pencil', 'pencil'], salt, 10)
+
+
+def test_batch_bad_salt():
+    with pytest.raises(ValueError):
+        batch_scram_sha1([b'pencil'], 'im a bad salt', 10)
+
+
+def test_batch_size_needs_salt():
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(['-f', 'hi.txt', '--batch-size', '10'])
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_file_mode_batch(tmp_path, capsys, jobs):
+    words = tmp_path / 'words.txt'
+    words.write_text('\n'.join(p.decode() for p in PLAINTEXTS))
+    scrammer.main(['-f', str(words), '-s', salt, '--batch-size', '2', '-j', jobs, '-i', '16'])
+    out = capsys.readouterr().out.splitlines()
+    assert out == [SCRAMSHA1(p, salt, 16).hex() for p in PLAINTEXTS]
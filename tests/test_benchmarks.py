@@ -0,0 +1,36 @@
+from benchmarks import suite
+
+
+def make_run(**values):
+    results = {}
+    for name, (value, higher_is_better) in values.items():
+        results[name] = suite.result(value, 'unit', higher_is_better)
+    return {'meta': {}, 'results': results}
+
+
+def test_compare_flags_slowdown():
+    baseline = make_run(rate=(100, True), startup=(50, False))
+    current = make_run(rate=(80, True), startup=(50, False))
+    rows = {row[0]: row for row in suite.compare(baseline, current, threshold=0.1)}
+    assert rows['rate'][-1] is True
+    assert rows['startup'][-1] is False
+
+
+def test_compare_lower_is_better():
+    baseline = make_run(startup=(50, False))
+    current = make_run(startup=(40, False))
+    (name, base, value, change, regressed), = suite.compare(baseline, current)
+    assert change > 0 and not regressed
+
+
+def test_compare_ignores_missing():
+    assert suite.compare(make_run(rate=(1, True)), make_run()) == []
+
+
+def test_compare_exit_code(tmp_path):
+    base = tmp_path / 'base.json'
+    current = tmp_path / 'current.json'
+    base.write_text('{"meta": {}, "results": {"rate": {"value": 100, "unit": "x", "higher_is_better": true}}}')
+    current.write_text('{"meta": {}, "results": {"rate": {"value": 50, "unit": "x", "higher_is_better": true}}}')
+    assert suite.main(['compare', str(base), str(current)]) == 1
+    assert suite.main(['compare', str(base), str(base)]) == 0
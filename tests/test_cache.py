@@ -0,0 +1,131 @@
+import os
+import sys
+import pytest
+from scram import cache, scrammer
+from scram.scramsha1 import SCRAMSHA1
+
+plaintext = b'pencil'
+salt = 'QSXCR+Q6sek8bf92'
+raw_salt = bytes.fromhex('4125c247e43ab1e93c6dff76')
+STORED_KEY = 'e9d94660c39d65c38fbad91c358f14da0eef2bd6'
+
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    yield
+    cache.disable_cache()
+
+
+def test_lru_eviction():
+    lru = cache.SaltedPasswordCache(size=2)
+    for word in (b'a', b'b', b'c'):
+        lru.put(word, raw_salt, 1, word * 20)
+    assert lru.get(b'a', raw_salt, 1) is None
+    assert lru.get(b'c', raw_salt, 1) == b'c' * 20
+    assert (lru.hits, lru.misses) == (1, 1)
+
+
+def test_key_is_not_plaintext():
+    lru = cache.SaltedPasswordCache()
+    key = lru.key(plaintext, raw_salt, 4096)
+    assert plaintext not in key
+    assert key != lru.key(plaintext, raw_salt, 4097)
+    assert key != lru.key(plaintext + b'x', raw_salt, 4096)
+
+
+def test_cached_scram():
+    active = cache.enable_cache()
+    assert SCRAMSHA1(plaintext, salt, 4096).hex() == STORED_KEY
+    assert SCRAMSHA1(plaintext, salt, 4096).hex() == STORED_KEY
+    assert (active.hits, active.misses) == (1, 1)
+
+
+def test_disk_cache_persists(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache.enable_cache(path=path)
+    SCRAMSHA1(plaintext, salt, 4096)
+    cache.disable_cache()
+    if sys.platform != 'win32':
+        assert os.stat(path).st_mode & 0o077 == 0
+    active = cache.enable_cache(path=path)
+    assert SCRAMSHA1(plaintext, salt, 4096).hex() == STORED_KEY
+    assert (active.hits, active.misses) == (1, 0)
+
+
+def test_disk_cache_eviction(tmp_path):
+    disk = cache.SaltedPasswordCache(size=1, path=str(tmp_path / 'cache.db'), disk_size=2)
+    for word in (b'a', b'b', b'c'):
+        disk.put(word, raw_salt, 1, word * 20)
+    disk.flush()
+    assert disk.get(b'a', raw_salt, 1) is None
+    assert disk.get(b'b', raw_salt, 1) == b'b' * 20
+    disk.close()
+
+
+def test_cache_flag_reports(tmp_path, capsys):
+    words = tmp_path / 'words.txt'
+    words.write_text('pencil\npencil\n')
+    scrammer.main(['-f', str(words), '-s', salt, '--cache'])
+    captured = capsys.readouterr()
+    assert captured.out.split() == [STORED_KEY, STORED_KEY]
+    assert '1 hits, 1 misses' in captured.err
+    assert cache.get_cache() is None
+
+
+def test_cache_file_jobs(tmp_path, capsys):
+    words = tmp_path / 'words.txt'
+    words.write_text(''.join(f'word{i}\n' for i in range(100)))
+    path = tmp_path / 'cache.db'
+    args = ['-f', str(words), '-s', '1234', '-i', '2', '-j', '2', '--chunk-size', '7', '--cache-file', str(path)]
+    scrammer.main(args)
+    first = capsys.readouterr()
+    assert '0 hits, 100 misses' in first.err
+    # every worker committed its writes before exiting
+    scrammer.main(args)
+    second = capsys.readouterr()
+    assert second.out == first.out
+    assert '100 hits, 0 misses' in second.err
+
+
+def test_worker_options_commit_every_write(tmp_path):
+    parent = cache.SaltedPasswordCache(path=str(tmp_path / 'cache.db'))
+    worker = cache.SaltedPasswordCache(**parent.options())
+    worker.put(b'a', raw_salt, 1, b'a' * 20)
+    # nothing left uncommitted, so no write lock held
+    assert not worker._db.in_transaction
+    assert worker.get(b'a', raw_salt, 1) == b'a' * 20
+    assert worker.get(b'b', raw_salt, 1) is None
+    assert (parent.hits, parent.misses) == (1, 1)
+    worker.close()
+    parent.close()
+
+
+def test_cache_shared_between_threads(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    cached = cache.SaltedPasswordCache(size=8, path=str(tmp_path / 'cache.db'), commit_interval=3)
+    values = {bytes([i]): bytes([i]) * 20 for i in range(64)}
+
+    def use(item):
+        key, value = item
+        cached.put(key, raw_salt, 1, value)
+        return cached.get(key, raw_salt, 1)
+    with ThreadPoolExecutor(4) as executor:
+        assert all(executor.map(use, values.items()))
+    assert cached.hits == 64 and len(cached._memory) == 8
+    cached.close()
+
+
+def test_async_scram_disk_cache(tmp_path):
+    import asyncio
+    from scram import aio
+    cache.enable_cache(path=str(tmp_path / 'cache.db'))
+
+    async def main():
+        async with aio.AsyncScram(workers=4) as scram:
+            return await scram.gather([b'pencil'] * 8, salt, 16)
+    loop = asyncio.new_event_loop()
+    try:
+        records = loop.run_until_complete(main())
+    finally:
+        loop.close()
+    assert len(set(records)) == 1
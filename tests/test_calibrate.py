@@ -0,0 +1,70 @@
+import pytest
+from scram import backends, calibrate, scrammer
+
+
+pytestmark = pytest.mark.usefixtures('restore_backend')
+
+
+def test_fit():
+    samples = [(count, 0.002 + count * 1e-6) for count in (1000, 2000, 8000)]
+    overhead, per_iteration = calibrate.fit(samples)
+    assert overhead == pytest.approx(0.002)
+    assert per_iteration == pytest.approx(1e-6)
+
+
+def test_fit_invalid():
+    with pytest.raises(ValueError):
+        calibrate.fit([(1000, 0.1), (1000, 0.2)])
+    with pytest.raises(ValueError):
+        calibrate.fit([(1000, 0.2), (2000, 0.1)])
+
+
+def test_recommend():
+    assert calibrate.recommend(0.05, 0.002, 1e-6) == 48000
+    # a budget below the fixed overhead still gets a valid count
+    assert calibrate.recommend(0.001, 0.002, 1e-6) == 1
+
+
+def test_core_counts():
+    assert calibrate.core_counts(1) == [1]
+    assert calibrate.core_counts(6) == [1, 2, 4, 6]
+    assert calibrate.core_counts(8) == [1, 2, 4, 8]
+
+
+def test_calibrate():
+    overhead, per_iteration, samples = calibrate.calibrate(0.005, repeat=1)
+    assert per_iteration > 0 and overhead >= 0
+    assert len(samples) >= 4
+
+
+def test_calibrate_command(capsys):
+    assert scrammer.main(['calibrate', '--target-ms', '2', '--repeat', '1', '--cores', '3', '-i', '1,64',
+                          '--backend', 'hashlib']) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith('backend hashlib:')
+    iterations = int(lines[1].split()[1])
+    assert iterations >= 1 and lines[1].endswith('ms)')
+    assert lines[2].startswith('-i 1 takes') and lines[3].startswith('-i 64 takes')
+    assert lines[4].split() == ['cores', '-i', '1', '-i', '64', '-i', str(iterations)]
+    assert [line.split()[0] for line in lines[5:]] == ['1', '2', '3']
+
+
+def test_calibrate_single_and_bulk_backends(capsys):
+    bulk = backends.get_backend().name
+    assert scrammer.main(['calibrate', '--target-ms', '2', '--repeat', '1', '--cores', '1']) == 0
+    lines = capsys.readouterr().out.splitlines()
+    # single derivations run on the stdlib backend, bulk modes keep the active one
+    assert lines[0].startswith(f'backend {bulk}')
+    if bulk != scrammer.SINGLE_MODE_BACKEND:
+        assert lines[1].startswith(f'backend {scrammer.SINGLE_MODE_BACKEND}, single runs below')
+        # the recommendation is for the library's backend, single mode is reported after it
+        iterations = int(lines[2].split()[1])
+        assert lines[2] == f'-i {iterations} meets 2 ms (predicted 2.0 ms)'
+        assert lines[3].startswith(f'scram <plaintext> -i {iterations} takes')
+    assert backends.get_backend().name == bulk
+
+
+@pytest.mark.parametrize('args', [['--target-ms', '0'], ['--repeat', '0'], ['--cores', '0'], ['-i', 'x']])
+def test_calibrate_arguments(args):
+    with pytest.raises(SystemExit):
+        calibrate.calibrate_main(args)
@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+import pytest
+from scram import scrammer
+from tests.conftest import SMALL_DICT, SMALL_DICT_HEX
+
+
+def run_args(output, *extra):
+    return ['-f', str(SMALL_DICT), '-s', '1234', '-o', str(output), '--checkpoint-interval', '0'] + list(extra)
+
+
+def interrupt_after(mocker, calls):
+    real = scrammer.hash_line
+    count = {'calls': 0}
+
+    def hash_line(*args, **kwargs):
+        count['calls'] += 1
+        if count['calls'] > calls:
+            raise KeyboardInterrupt()
+        return real(*args, **kwargs)
+    return mocker.patch('scram.scrammer.hash_line', side_effect=hash_line)
+
+
+def test_checkpoint_complete(tmp_path):
+    output = tmp_path / 'out.txt'
+    scrammer.main(run_args(output, '--checkpoint'))
+    state = json.loads(Path(str(output) + '.ckpt').read_text())
+    assert state['complete']
+    assert state['input_offset'] == SMALL_DICT.stat().st_size
+    assert state['output_offset'] == output.stat().st_size
+    assert output.read_text().split() == SMALL_DICT_HEX
+
+
+@pytest.mark.parametrize('calls', [0, 1, 3])
+def test_resume_after_interrupt(tmp_path, mocker, calls):
+    output = tmp_path / 'out.txt'
+    interrupt_after(mocker, calls)
+    with pytest.raises(KeyboardInterrupt):
+        scrammer.main(run_args(output, '--checkpoint'))
+    assert output.read_text().split() == SMALL_DICT_HEX[:calls]
+    mocker.stopall()
+    scrammer.main(run_args(output, '--resume'))
+    assert output.read_text().split() == SMALL_DICT_HEX
+
+
+def test_resume_drops_unrecorded_output(tmp_path, mocker):
+    output = tmp_path / 'out.txt'
+    interrupt_after(mocker, 2)
+    with pytest.raises(KeyboardInterrupt):
+        scrammer.main(run_args(output, '--checkpoint'))
+    mocker.stopall()
+    # a record that reached the file after the last checkpoint
+    with open(output, 'a') as file:
+        file.write(SMALL_DICT_HEX[2] + '\n')
+    scrammer.main(run_args(output, '--resume'))
+    assert output.read_text().split() == SMALL_DICT_HEX
+
+
+def test_resume_different_run(tmp_path):
+    output = tmp_path / 'out.txt'
+    scrammer.main(run_args(output, '--checkpoint'))
+    with pytest.raises(ValueError):
+        scrammer.main(run_args(output, '--resume', '-i', '10'))
+
+
+def test_resume_different_rules(tmp_path, mocker):
+    output = tmp_path / 'out.txt'
+    interrupt_after(mocker, 2)
+    with pytest.raises(KeyboardInterrupt):
+        scrammer.main(run_args(output, '--checkpoint'))
+    mocker.stopall()
+    with pytest.raises(ValueError):
+        scrammer.main(run_args(output, '--resume', '--rules', 'digits'))
+    assert output.read_text().split() == SMALL_DICT_HEX[:2]
+
+
+def test_checkpoint_needs_output():
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(['-f', 'hi.txt', '--resume'])
@@ -0,0 +1,124 @@
+import json
+import os
+import socket
+import threading
+import pytest
+from scram import scrammer
+from scram.daemon import Daemon, ScramClient
+
+PLAINTEXT = 'pencil'
+SALT = 'QSXCR+Q6sek8bf92'
+ITERATIONS = 4096
+STORED_KEY = 'e9d94660c39d65c38fbad91c358f14da0eef2bd6'
+SERVER_KEY = '0fe09258b3ac852ba502cc62ba903eaacdbf7d31'
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='needs Unix sockets')
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    daemon = Daemon(str(tmp_path / 'scram.sock'), workers=2, processes=False, cache_size=4)
+    ready = threading.Event()
+    thread = threading.Thread(target=daemon.run, kwargs={'ready': ready.set})
+    thread.start()
+    assert ready.wait(10)
+    yield daemon
+    daemon.stop()
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+def test_hash(daemon):
+    with ScramClient(daemon.path) as client:
+        stored_key, server_key = client.hash(PLAINTEXT, SALT, ITERATIONS)
+    assert stored_key.hex() == STORED_KEY
+    assert server_key.hex() == SERVER_KEY
+
+
+def test_verify(daemon):
+    with ScramClient(daemon.path) as client:
+        assert client.verify(PLAINTEXT, SALT, ITERATIONS, STORED_KEY)
+        assert client.verify(b'pencil', SALT, ITERATIONS, bytes.fromhex(STORED_KEY))
+        assert client.verify(PLAINTEXT, SALT, ITERATIONS, '6dlGYMOdZcOPutkcNY8U2g7vK9Y=')
+        assert not client.verify('pen', SALT, ITERATIONS, STORED_KEY)
+
+
+def test_repeat_logins_hit_the_cache(daemon):
+    with ScramClient(daemon.path) as client:
+        assert client.verify_many([(PLAINTEXT, SALT, ITERATIONS, STORED_KEY)] * 5) == [True] * 5
+        client.hash(PLAINTEXT, SALT, ITERATIONS)
+    # concurrent misses share one derivation, later requests hit the cache
+    assert daemon.derivations == 1
+    assert daemon.cache.hits >= 1
+
+
+def test_large_batch(daemon):
+    # far more than the daemon's pipeline depth and the socket buffers hold
+    checks = [(PLAINTEXT, SALT, 1, '11a29dce5d2903e46e9ecbf681ef1d52fb9217c7')] * 5000
+    with ScramClient(daemon.path, timeout=10) as client:
+        assert client.verify_many(checks) == [True] * 5000
+
+
+def test_socket_private(daemon):
+    assert os.stat(daemon.path).st_mode & 0o077 == 0
+
+
+def test_pipelined_responses_in_order(daemon):
+    words = [f'word{i}' for i in range(20)]
+    with ScramClient(daemon.path) as client:
+        responses = client.request_many({'op': 'hash', 'plaintext': word, 'salt': '1234', 'iterations': i + 1}
+                                        for i, word in enumerate(words))
+    assert [response['id'] for response in responses] == list(range(20))
+    assert [response['stored_key'] for response in responses] == [
+        scrammer.hash_line(word.encode('utf8'), '1234', i + 1) for i, word in enumerate(words)]
+
+
+def test_connection_reuse(daemon):
+    with ScramClient(daemon.path) as client:
+        client.hash(PLAINTEXT, SALT, 1)
+        sock = client._sock
+        client.hash(PLAINTEXT, SALT, 2)
+        assert client._sock is sock
+
+
+def test_bad_requests(daemon):
+    with ScramClient(daemon.path) as client:
+        responses = client.request_many([{'op': 'nope'}, {'op': 'hash', 'plaintext': PLAINTEXT, 'salt': SALT},
+                                         {'op': 'hash', 'plaintext': PLAINTEXT, 'salt': '!!', 'iterations': 1},
+                                         {'op': 'verify', 'plaintext': PLAINTEXT, 'salt': SALT, 'iterations': 1,
+                                          'expected': 'zz'}])
+        assert [response['ok'] for response in responses] == [False] * 4
+        assert 'iterations' in responses[1]['error']
+        with pytest.raises(ValueError):
+            client.hash(PLAINTEXT, SALT, 0)
+        # the connection survives failed requests
+        assert client.verify(PLAINTEXT, SALT, ITERATIONS, STORED_KEY)
+
+
+def test_invalid_json(daemon):
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(daemon.path)
+        sock.sendall(b'not json\n')
+        response = json.loads(sock.makefile('rb').readline())
+    assert response['ok'] is False and response['id'] is None
+
+
+def test_client_reconnects(tmp_path):
+    path = str(tmp_path / 'scram.sock')
+    with ScramClient(path) as client:
+        for _ in range(2):
+            daemon = Daemon(path, workers=1, processes=False)
+            ready = threading.Event()
+            thread = threading.Thread(target=daemon.run, kwargs={'ready': ready.set})
+            thread.start()
+            assert ready.wait(10)
+            assert client.hash(PLAINTEXT, SALT, ITERATIONS)[0].hex() == STORED_KEY
+            daemon.stop()
+            thread.join(10)
+    with pytest.raises(OSError):
+        ScramClient(path).hash(PLAINTEXT, SALT, ITERATIONS)
+
+
+def test_refuses_live_socket(daemon):
+    with pytest.raises(OSError):
+        Daemon(daemon.path, workers=1, processes=False).run()
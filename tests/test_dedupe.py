@@ -0,0 +1,78 @@
+import pytest
+from scram import scrammer
+from scram.dedupe import BloomFilter, BoundedRecords, Deduper
+
+SALT = 'QSXCR+Q6sek8bf92'
+WORDS = [b'a', b'b', b'a', b'a', b'c', b'b', b'a']
+
+
+def fake_hash(calls):
+    def hash_records(plaintexts):
+        for plaintext in plaintexts:
+            calls.append(plaintext)
+            yield plaintext.decode('utf8').upper()
+    return hash_records
+
+
+def fallback(plaintext):
+    return plaintext.decode('utf8').upper()
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(1000, 0.01)
+    words = [f'word{i}'.encode('utf8') for i in range(1000)]
+    assert not any(bloom.add(word) for word in words[:1])
+    for word in words:
+        bloom.add(word)
+    assert all(word in bloom for word in words)
+    false_positives = sum(f'other{i}'.encode('utf8') in bloom for i in range(10000))
+    assert false_positives < 300
+    with pytest.raises(ValueError):
+        BloomFilter(0)
+
+
+def test_bounded_records():
+    records = BoundedRecords(2)
+    records[b'a'] = 'A'
+    records[b'b'] = 'B'
+    assert records.get(b'a') == 'A'
+    records[b'c'] = 'C'
+    assert b'b' not in records and b'a' in records and len(records) == 2
+
+
+def test_exact_dedupe():
+    calls = []
+    deduper = Deduper()
+    records = list(deduper.dedupe(WORDS, fake_hash(calls), fallback))
+    assert records == ['A', 'B', 'A', 'A', 'C', 'B', 'A']
+    assert calls == [b'a', b'b', b'c']
+    assert (deduper.lines, deduper.derived) == (7, 3)
+
+
+def test_bounded_dedupe():
+    calls = []
+    deduper = Deduper(max_entries=1, expected=100)
+    records = list(deduper.dedupe(WORDS, fake_hash(calls), fallback))
+    assert records == ['A', 'B', 'A', 'A', 'C', 'B', 'A']
+    # first sightings are never remembered, the second is derived again
+    assert calls == [b'a', b'b', b'a', b'c', b'b', b'a']
+
+
+@pytest.mark.parametrize('extra', [['--dedupe'], ['--dedupe', '--jobs', '2', '--chunk-size', '1'],
+                                   ['--dedupe-memory', '1'], ['--dedupe', '--mmap']])
+def test_dedupe_mode(tmp_path, capsys, extra):
+    wordlist = tmp_path / 'words.txt'
+    wordlist.write_text('\n'.join(word.decode('utf8') for word in WORDS))
+    scrammer.main(['-f', str(wordlist), '-s', SALT, '-i', '2'])
+    expected = capsys.readouterr().out.split()
+    scrammer.main(['-f', str(wordlist), '-s', SALT, '-i', '2'] + extra)
+    captured = capsys.readouterr()
+    assert captured.out.split() == expected
+    assert '[dedupe] 7 lines' in captured.err
+
+
+@pytest.mark.parametrize('args', [['--dedupe'], ['pencil', '-s', SALT, '--dedupe'],
+                                  ['-s', SALT, '--dedupe-memory', '0']])
+def test_dedupe_arguments(args):
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(args)
@@ -0,0 +1,172 @@
+import socket
+import subprocess
+import sys
+import threading
+import pytest
+from scram import scrammer
+from scram.distributed import Coordinator, recv_frame, run_worker, send_frame
+from scram.wordlist import MappedWordlist
+
+SCRAM_CMD = [sys.executable, '-c', 'import sys; from scram.scrammer import main; sys.exit(main())']
+JOB = {'mode': 'hash', 'salt': '1234', 'iterations': 2, 'format': 'hex', 'rules': None}
+
+
+@pytest.fixture
+def wordlist(tmp_path):
+    path = tmp_path / 'words.txt'
+    path.write_text(''.join(f'password{i}\n' for i in range(200)))
+    return path
+
+
+def expected(path, capsys, *extra):
+    scrammer.main(['-f', str(path), '-s', '1234', '-i', '2'] + list(extra))
+    return capsys.readouterr().out.split()
+
+
+def run_threads(coordinator, count):
+    threads = [threading.Thread(target=run_worker, args=(coordinator.address,)) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_frames():
+    left, right = socket.socketpair()
+    with left, right:
+        send_frame(left, {'type': 'chunk', 'id': 3}, b'a\nb\n')
+        send_frame(left, {'type': 'done'})
+        assert recv_frame(right) == ({'type': 'chunk', 'id': 3}, b'a\nb\n')
+        assert recv_frame(right) == ({'type': 'done'}, b'')
+        left.close()
+        with pytest.raises(ConnectionError):
+            recv_frame(right)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_coordinator_in_order(wordlist, capsys, workers):
+    with MappedWordlist(str(wordlist)) as words:
+        with Coordinator(words, JOB, ('127.0.0.1', 0), chunk_bytes=100, window=4) as coordinator:
+            threads = run_threads(coordinator, workers)
+            records = '\n'.join(coordinator.results()).split()
+        for thread in threads:
+            thread.join()
+    assert records == expected(wordlist, capsys)
+
+
+def test_dead_worker_chunk_reassigned(wordlist, capsys):
+    with MappedWordlist(str(wordlist)) as words:
+        with Coordinator(words, JOB, ('127.0.0.1', 0), chunk_bytes=100) as coordinator:
+            # takes a chunk and dies without answering
+            with socket.create_connection(coordinator.address) as sock:
+                send_frame(sock, {'type': 'hello'})
+                assert recv_frame(sock)[0]['type'] == 'job'
+                header, body = recv_frame(sock)
+                assert header == {'type': 'chunk', 'id': 0} and body.startswith(b'password0\n')
+            threads = run_threads(coordinator, 1)
+            records = '\n'.join(coordinator.results()).split()
+        threads[0].join()
+    assert coordinator.reassigned == 1
+    assert records == expected(wordlist, capsys)
+
+
+def test_worker_processes(wordlist, capsys):
+    with MappedWordlist(str(wordlist)) as words:
+        with Coordinator(words, JOB, ('127.0.0.1', 0), chunk_bytes=200) as coordinator:
+            host, port = coordinator.address
+            workers = [subprocess.Popen(SCRAM_CMD + ['worker', f'{host}:{port}'], stderr=subprocess.DEVNULL)
+                       for _ in range(2)]
+            records = '\n'.join(coordinator.results()).split()
+        assert [worker.wait(timeout=30) for worker in workers] == [0, 0]
+    assert records == expected(wordlist, capsys)
+
+
+@pytest.mark.parametrize('job', [JOB, {'mode': 'audit', 'targets': [scrammer.hash_line(b'password150', '1234', 2,
+                                                                                       mode='hashcat')]}])
+def test_worker_pool_per_session(wordlist, mocker, job):
+    import multiprocessing
+    pool = mocker.spy(multiprocessing, 'Pool')
+    with MappedWordlist(str(wordlist)) as words:
+        with Coordinator(words, job, ('127.0.0.1', 0), chunk_bytes=200) as coordinator:
+            processed = []
+            thread = threading.Thread(target=lambda: processed.append(run_worker(coordinator.address, 2)))
+            thread.start()
+            assert list(coordinator.results())
+        thread.join()
+    assert processed[0] > 1
+    assert pool.call_count == 1
+
+
+def test_distributed_audit(wordlist):
+    target = scrammer.hash_line(b'Password42', '1234', 2, mode='hashcat')
+    job = {'mode': 'audit', 'targets': [target], 'rules': ['case']}
+    with MappedWordlist(str(wordlist)) as words:
+        with Coordinator(words, job, ('127.0.0.1', 0), chunk_bytes=100) as coordinator:
+            threads = run_threads(coordinator, 2)
+            hits = list(coordinator.results())
+        for thread in threads:
+            thread.join()
+    assert hits == [f'Password42:{target}']
+
+
+def test_distributed_audit_bad_targets(wordlist, tmp_path):
+    targets = tmp_path / 'targets.txt'
+    targets.write_text('not a hashcat record\n')
+    with pytest.raises(ValueError):
+        scrammer.main(['-f', str(wordlist), '-a', str(targets), '--distribute', '127.0.0.1:0',
+                       '--distribute-token', 'secret'])
+
+
+def test_distributed_audit_reports_once_and_stops(tmp_path):
+    path = tmp_path / 'words.txt'
+    path.write_text('pencil\n' + ''.join(f'word{i}\n' for i in range(200)) + 'pencil\n')
+    target = scrammer.hash_line(b'pencil', 'QSXCR+Q6sek8bf92', 2, mode='hashcat')
+    job = {'mode': 'audit', 'targets': [target, target], 'rules': None}
+    with MappedWordlist(str(path)) as words:
+        with Coordinator(words, job, ('127.0.0.1', 0), chunk_bytes=8, window=2) as coordinator:
+            processed = []
+            thread = threading.Thread(target=lambda: processed.append(run_worker(coordinator.address)))
+            thread.start()
+            hits = list(coordinator.results())
+        thread.join()
+    # both records of the key, from the first chunk only, and the worker was told `done` early
+    assert hits == [f'pencil:{target}\npencil:{target}']
+    assert processed[0] < 10
+
+
+def test_empty_input(tmp_path):
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+    with MappedWordlist(str(path)) as words:
+        with Coordinator(words, JOB, ('127.0.0.1', 0)) as coordinator:
+            assert list(coordinator.results()) == []
+
+
+@pytest.mark.parametrize('args', [['--distribute', '127.0.0.1:0'], ['-f', 'w.txt', '--distribute', 'nohost'],
+                                  ['-f', 'w.txt', '-s', '1234', '--distribute', '127.0.0.1:0', '--dedupe']])
+def test_distribute_arguments(args):
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(args + ['--distribute-token', 'secret'])
+
+
+def test_distribute_needs_token(monkeypatch):
+    monkeypatch.delenv(scrammer.DISTRIBUTE_TOKEN_ENV, raising=False)
+    args = ['-f', 'w.txt', '-s', '1234', '--distribute', '127.0.0.1:0']
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(args)
+    monkeypatch.setenv(scrammer.DISTRIBUTE_TOKEN_ENV, 'secret')
+    assert scrammer.parse_args(args).distribute_token == 'secret'
+
+
+def test_worker_token(wordlist, capsys):
+    with MappedWordlist(str(wordlist)) as words:
+        with Coordinator(words, JOB, ('127.0.0.1', 0), chunk_bytes=100, token='secret') as coordinator:
+            # a worker without the token gets nothing and cannot hand in records
+            with pytest.raises(ConnectionError):
+                run_worker(coordinator.address, token='wrong')
+            with pytest.raises(ConnectionError):
+                run_worker(coordinator.address)
+            thread = threading.Thread(target=run_worker, args=(coordinator.address,), kwargs={'token': 'secret'})
+            thread.start()
+            records = '\n'.join(coordinator.results()).split()
+        thread.join()
+    assert records == expected(wordlist, capsys)
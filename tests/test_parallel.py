@@ -0,0 +1,40 @@
+import pytest
+from scram import parallel
+
+
+def square(x):
+    return x * x
+
+
+def test_chunked():
+    chunks = list(parallel.chunked(range(7), 3))
+    assert chunks == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_imap_ordered_keeps_order():
+    result = list(parallel.imap_ordered(square, range(500), jobs=3, chunk_size=7))
+    assert result == [x * x for x in range(500)]
+
+
+def test_imap_ordered_empty():
+    assert list(parallel.imap_ordered(square, [], jobs=2)) == []
+
+
+def test_imap_ordered_bad_chunk_size():
+    with pytest.raises(ValueError):
+        list(parallel.imap_ordered(square, range(5), jobs=2, chunk_size=0))
+
+
+def test_imap_ordered_idle():
+    taken, results = [], []
+
+    def items():
+        for item in range(6):
+            if item == 3:
+                # the partial chunk's results are handed out before the input waits
+                assert results == [0, 1, 4]
+            taken.append(item)
+            yield item
+    for result in parallel.imap_ordered(square, items(), jobs=2, chunk_size=10, idle=lambda: len(taken) == 3):
+        results.append(result)
+    assert results == [x * x for x in range(6)]
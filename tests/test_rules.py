@@ -0,0 +1,70 @@
+import pytest
+from scram import rules, scrammer
+from scram.audit import audit, load_targets
+from tests.conftest import SMALL_DICT
+
+
+def test_parse_rules():
+    assert rules.parse_rules('case, digits') == ['case', 'digits']
+    with pytest.raises(ValueError):
+        rules.parse_rules('case,reverse')
+    with pytest.raises(ValueError):
+        rules.parse_rules(',')
+
+
+def test_expand_case():
+    assert list(rules.expand(b'pEncil', ['case'])) == [b'pEncil', b'pencil', b'PENCIL', b'Pencil', b'PeNCIL']
+
+
+def test_expand_composes_in_order():
+    candidates = list(rules.expand(b'ab', ['case', 'digits']))
+    assert candidates[:3] == [b'ab', b'ab0', b'ab1']
+    assert b'AB9' in candidates and b'Ab5' in candidates
+    assert len(candidates) == len(set(candidates)) == 3 * 11
+
+
+def test_expand_leet():
+    assert list(rules.expand(b'password', ['leet'])) == [b'password', b'p455w0rd']
+    assert list(rules.expand(b'xyz', ['leet'])) == [b'xyz']
+
+
+def test_expand_is_lazy():
+    candidates = rules.expand(b'word', ['digits2', 'digits2', 'digits2'])
+    assert next(candidates) == b'word'
+    assert next(candidates) == b'word00'
+
+
+def test_rules_records_per_line(tmp_path, capsys):
+    scrammer.main(['-f', str(SMALL_DICT), '-s', '1234', '-i', '1', '--rules', 'leet'])
+    expanded = capsys.readouterr().out.split()
+    wordlist = tmp_path / 'expanded.txt'
+    wordlist.write_text('\n'.join(candidate.decode('utf8') for candidate in
+                                  rules.expand_all((word.encode('utf8') for word in
+                                                    SMALL_DICT.read_text().split()), ['leet'])))
+    scrammer.main(['-f', str(wordlist), '-s', '1234', '-i', '1'])
+    assert expanded == capsys.readouterr().out.split()
+
+
+def test_rules_jobs(capsys):
+    scrammer.main(['-f', str(SMALL_DICT), '-s', '1234', '-i', '1', '--rules', 'case,digits'])
+    serial = capsys.readouterr().out
+    scrammer.main(['-f', str(SMALL_DICT), '-s', '1234', '-i', '1', '--rules', 'case,digits', '-j', '2',
+                   '--chunk-size', '1'])
+    assert capsys.readouterr().out == serial
+    assert len(serial.split()) == 5 * 3 * 11
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_audit_with_rules(jobs):
+    targets = load_targets([scrammer.hash_line(b'P0r5ch37', '1234', 2, mode='hashcat')])
+    hits = list(audit([b'johnny', b'porsche'], targets, jobs=jobs, chunk_size=1,
+                      rules=['case', 'leet', 'digits']))
+    assert [plaintext for plaintext, _ in hits] == [b'P0r5ch37']
+
+
+def test_rules_arguments():
+    assert scrammer.parse_args(['--rules', 'case']).rules == ['case']
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(['--rules', 'nope'])
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(['--rules', 'case', '-s', '1234', '--batch-size', '8'])
@@ -0,0 +1,128 @@
+from base64 import b64encode
+from itertools import islice
+import pytest
+from scram import salts, scrammer
+from scram.scramsha1 import SCRAMSHA1
+from tests.conftest import SMALL_DICT
+
+
+def test_random_salts_blocks(mocker):
+    urandom = mocker.patch('scram.salts.os.urandom', side_effect=lambda size: bytes(range(size)))
+    generated = list(islice(salts.random_salts(4, block_size=10), 5))
+    # blocks are rounded down to whole salts
+    assert generated == [b'\x00\x01\x02\x03', b'\x04\x05\x06\x07', b'\x00\x01\x02\x03', b'\x04\x05\x06\x07',
+                         b'\x00\x01\x02\x03']
+    assert [call[0] for call in urandom.call_args_list] == [(8,), (8,), (8,)]
+
+
+def test_random_salts_distinct():
+    generated = list(islice(salts.random_salts(), 1000))
+    assert len(set(generated)) == 1000
+    assert {len(salt) for salt in generated} == {salts.SALT_LEN}
+
+
+def test_seeded_salts():
+    first = list(islice(salts.seeded_salts(b'seed'), 5))
+    assert len(set(first)) == 5
+    assert list(islice(salts.seeded_salts(b'seed', 3), 2)) == first[3:]
+    assert next(salts.seeded_salts(b'other')) != first[0]
+    with pytest.raises(TypeError):
+        next(salts.seeded_salts('seed'))
+
+
+def test_raw_salt_derivation():
+    raw = bytes(range(20))
+    assert SCRAMSHA1(b'pencil', raw, 2) == SCRAMSHA1(b'pencil', b64encode(raw).decode('utf8'), 2)
+    assert scrammer.hash_line(b'pencil', raw, 2, mode='hashcat') == \
+        scrammer.hash_line(b'pencil', b64encode(raw).decode('utf8'), 2, mode='hashcat')
+
+
+def test_seeded_runs_reproducible(tmp_path, capsys):
+    base = ['-f', str(SMALL_DICT), '-i', '2', '--format', 'hashcat', '--salt-seed', 'seed']
+    scrammer.main(base)
+    serial = capsys.readouterr().out.split()
+    scrammer.main(base + ['-j', '2', '--chunk-size', '1'])
+    assert capsys.readouterr().out.split() == serial
+    sharded = []
+    for shard in ('1/2', '2/2'):
+        scrammer.main(base + ['--shard', shard])
+        sharded += capsys.readouterr().out.split()
+    assert sharded == serial
+    assert len({record.split(':')[1] for record in serial}) == len(serial)
+
+
+def test_salts_file(tmp_path, capsys):
+    salts_file = tmp_path / 'salts.txt'
+    salts_file.write_text('QSXCR+Q6sek8bf92\n\n1234\n')
+    scrammer.main(['pencil', '--salts', str(salts_file), '--format', 'hashcat'])
+    records = capsys.readouterr().out.split()
+    assert records == ['4096:QSXCR+Q6sek8bf92:6dlGYMOdZcOPutkcNY8U2g7vK9Y=',
+                       scrammer.hash_line(b'pencil', '1234', 4096, mode='hashcat')]
+
+
+def test_salt_count(capsys):
+    base = ['Temp-Passw0rd', '-i', '2', '--format', 'hashcat', '--salt-count', '50']
+    scrammer.main(base)
+    records = capsys.readouterr().out.split()
+    assert len({record.split(':')[1] for record in records}) == 50
+    count, salt, _ = records[7].split(':')
+    assert records[7] == scrammer.hash_line(b'Temp-Passw0rd', salt, int(count), mode='hashcat')
+
+
+def test_salt_count_seeded_jobs(capsys):
+    base = ['Temp-Passw0rd', '-i', '2', '--format', 'credential', '--salt-count', '20', '--salt-seed', 'seed']
+    scrammer.main(base)
+    serial = capsys.readouterr().out
+    scrammer.main(base + ['-j', '2', '--chunk-size', '3'])
+    assert capsys.readouterr().out == serial
+    assert len(serial.split()) == 20
+
+
+def test_salts_file_bad_salt(tmp_path, capsys):
+    salts_file = tmp_path / 'salts.txt'
+    salts_file.write_text('1234\n!!\n')
+    scrammer.main(['pencil', '--salts', str(salts_file), '-i', '1'])
+    captured = capsys.readouterr()
+    assert 'Invalid salt' in captured.err
+
+
+@pytest.mark.parametrize('args', [['--salt-count', '3'], ['pencil', '--salt-count', '0'],
+                                  ['pencil', '--salt-count', '3', '-s', '1234'],
+                                  ['pencil', '--salts', 's.txt', '--salt-seed', 'seed'],
+                                  ['pencil', '--salt-count', '3', '-i', '1,2']])
+def test_salts_mode_arguments(args):
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(args)
+
+
+def test_salt_seed_arguments():
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(['-f', 'w.txt', '-s', '1234', '--salt-seed', 'seed'])
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(['-f', 'w.txt', '--salt-seed', 'seed', '--distribute', '127.0.0.1:0'])
+
+
+def test_candidate_salt():
+    line_salt = bytes(range(20))
+    assert salts.candidate_salt(line_salt, 0) == line_salt
+    derived = [salts.candidate_salt(line_salt, number) for number in range(1, 5)]
+    assert len(set(derived + [line_salt])) == 5
+    assert {len(salt) for salt in derived} == {20}
+
+
+def test_rule_candidates_salted(capsys):
+    base = ['-f', str(SMALL_DICT), '-i', '2', '--format', 'hashcat', '--rules', 'case', '--salt-seed', 'seed']
+    scrammer.main(base)
+    serial = capsys.readouterr().out.split()
+    assert len({record.split(':')[1] for record in serial}) == len(serial)
+    scrammer.main(base + ['-j', '2', '--chunk-size', '1'])
+    assert capsys.readouterr().out.split() == serial
+    scrammer.main(base[:-2])
+    records = capsys.readouterr().out.split()
+    assert len({record.split(':')[1] for record in records}) == len(records)
+
+
+def test_salt_stage_timed():
+    snapshots = []
+    scrammer.main(['-f', str(SMALL_DICT), '-i', '1'], stats_callback=snapshots.append)
+    assert snapshots[-1]['stages']['salt'] > 0
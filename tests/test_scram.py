@@ -1,5 +1,5 @@
 import pytest
-from scram.scramsha1 import SCRAMSHA1
+from scram.scramsha1 import SCRAMSHA1, scram_keys, scram_keys_salts, scram_sha1_multi, scram_sha1_salts
 
 plaintext = b'pencil'
 salt = 'QSXCR+Q6sek8bf92'
@@ -41,3 +41,66 @@ def test_consecutive_hashes():
     for i in range(10):
         result2 = SCRAMSHA1(plaintext, salt, iterations)
     assert result == result2
+
+
+def test_keys():
+    keys = scram_keys(plaintext, salt, iterations)
+    assert keys.salted_password.hex() == '1d96ee3a529b5a5f9e47c01f229a2cb8a6e15f7d'
+    assert keys.client_key.hex() == 'e234c47bf6c36696dd6d852b99aaa2ba26555728'
+    assert keys.stored_key == SCRAMSHA1(plaintext, salt, iterations)
+    assert keys.server_key.hex() == '0fe09258b3ac852ba502cc62ba903eaacdbf7d31'
+
+
+def test_keys_non_bytes_plaintext():
+    with pytest.raises(TypeError):
+        scram_keys('not bytes', salt, iterations)
+
+
+@pytest.mark.parametrize('single_pass', [True, False, None])
+def test_multi_matches_single(single_pass):
+    counts = [1, 2, 100, 4096]
+    result = scram_sha1_multi(plaintext, salt, counts, single_pass=single_pass)
+    assert result == [SCRAMSHA1(plaintext, salt, count) for count in counts]
+    assert result[-1].hex() == 'e9d94660c39d65c38fbad91c358f14da0eef2bd6'
+
+
+def test_multi_unsorted_iterations():
+    with pytest.raises(ValueError):
+        scram_sha1_multi(plaintext, salt, [4096, 10])
+
+
+def test_multi_empty_iterations():
+    with pytest.raises(TypeError):
+        scram_sha1_multi(plaintext, salt, [])
+
+
+def test_multi_long_plaintext():
+    long_plaintext = b'x' * 100
+    result = scram_sha1_multi(long_plaintext, salt, [3, 7], single_pass=True)
+    assert result == [SCRAMSHA1(long_plaintext, salt, 3), SCRAMSHA1(long_plaintext, salt, 7)]
+
+
+@pytest.mark.parametrize('reuse_pads', [True, False, None])
+@pytest.mark.parametrize('count', [1, 4096])
+def test_salts_match_single(reuse_pads, count):
+    salts = [salt, '1234', bytes(range(20))]
+    keys = list(scram_keys_salts(plaintext, salts, count, reuse_pads=reuse_pads))
+    assert keys == [scram_keys(plaintext, each, count) for each in salts]
+
+
+def test_salts_long_plaintext():
+    long_plaintext = b'x' * 100
+    result = list(scram_sha1_salts(long_plaintext, [salt, '1234'], 2, reuse_pads=True))
+    assert result == [SCRAMSHA1(long_plaintext, salt, 2), SCRAMSHA1(long_plaintext, '1234', 2)]
+
+
+def test_salts_vector():
+    result = list(scram_sha1_salts(plaintext, iter([salt]), iterations))
+    assert result[0].hex() == 'e9d94660c39d65c38fbad91c358f14da0eef2bd6'
+
+
+def test_salts_invalid():
+    with pytest.raises(TypeError):
+        list(scram_sha1_salts('not bytes', [salt], iterations))
+    with pytest.raises(ValueError):
+        list(scram_sha1_salts(plaintext, [salt, 'im a bad salt'], iterations))
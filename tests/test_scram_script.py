@@ -1,15 +1,14 @@
 from base64 import b64decode
-from pathlib import Path
 import pytest
 from subprocess import PIPE
 import subprocess
 import os
 import sys
 from scram import scrammer
+from tests.conftest import RESOURCES, SMALL_DICT_HEX
 
 OUTPUT_SWITCHES = ['-hc', '-b64']
 
-RESOURCES = Path(__file__).parent / 'resources'
 PYTHON_CMD = 'py' if sys.platform == 'win32' else 'python3'
 
 
@@ -48,6 +47,14 @@ class TestArguments:
         args = scrammer.parse_args(['hello', '--iter', '5000'])
         assert args.iterations == 5000
 
+    def test_multiple_iterations(self):
+        args = scrammer.parse_args(['hello', '-i', '10000,4096,15000'])
+        assert args.iterations == [4096, 10000, 15000]
+
+    def test_bad_iterations(self):
+        with pytest.raises(SystemExit):
+            scrammer.parse_args(['hello', '-i', '4096,lots'])
+
     def test_format_short(self):
         args = scrammer.parse_args(['hello', '-fmt', 'b64'])
         assert args.format == 'b64'
@@ -82,6 +89,14 @@ class TestArguments:
         args = scrammer.parse_args(['hello'])
         assert args.output_file is None
 
+    def test_default_jobs(self):
+        args = scrammer.parse_args(['hello'])
+        assert args.jobs == 1
+
+    def test_jobs(self):
+        args = scrammer.parse_args(['-f', 'hi.txt', '--jobs', '4'])
+        assert args.jobs == 4
+
 
 class TestHashFormat:
     HASH = bytes.fromhex('e9d94660c39d65c38fbad91c358f14da0eef2bd6')
@@ -95,6 +110,15 @@ class TestHashFormat:
         result = scrammer.hash_format(self.HASH, self.SALT, self.ITERATIONS, mode)
         assert result == output
 
+    def test_credential(self):
+        server_key = bytes.fromhex('0fe09258b3ac852ba502cc62ba903eaacdbf7d31')
+        result = scrammer.hash_format(self.HASH, self.SALT, self.ITERATIONS, 'credential', server_key=server_key)
+        assert result == 'SCRAM-SHA-1$4096:QSXCR+Q6sek8bf92$6dlGYMOdZcOPutkcNY8U2g7vK9Y=:D+CSWLOshSulAsxiupA+qs2/fTE='
+
+    def test_credential_without_server_key(self):
+        with pytest.raises(ValueError):
+            scrammer.hash_format(self.HASH, self.SALT, self.ITERATIONS, 'credential')
+
     def test_not_a_format(self):
         with pytest.raises(ValueError):
             scrammer.hash_format(b'', '', 20, mode='fake')
@@ -119,11 +143,18 @@ class TestModes:
         scrammer.main(['hello', '-s', self.SALT])
         assert mocked_salter.call_count == 0
 
-    def test_file_mode_gen_salt(self, mocker):
+    def test_file_mode_bulk_salts(self, mocker, capsys):
         mocked_salter = mocker.patch('scram.scrammer.gen_salt', return_value=self.SALT)
+        mocked_urandom = mocker.patch('scram.salts.os.urandom', wraps=os.urandom)
         file_path = RESOURCES / 'small_dictionary.txt'
-        scrammer.main(['-f', str(file_path)])
-        assert mocked_salter.call_count == len(TestScriptOutput.SMALL_DICT_HEX)
+        scrammer.main(['-f', str(file_path), '--format', 'hashcat'])
+        records = capsys.readouterr().out.split()
+        # one block of randomness for the whole file, sliced into distinct salts
+        assert mocked_salter.call_count == 0
+        assert mocked_urandom.call_count == 1
+        salts = [record.split(':')[1] for record in records]
+        assert len(set(salts)) == len(TestScriptOutput.SMALL_DICT_HEX)
+        assert all(len(b64decode(salt, validate=True)) == scrammer.HASH_LEN for salt in salts)
 
     def test_file_mode_no_gen_salt(self, mocker):
         mocked_salter = mocker.patch('scram.scrammer.gen_salt', return_value=self.SALT)
@@ -131,17 +162,19 @@ class TestModes:
         scrammer.main(['-f', str(file_path), '-s', '1234'])
         assert mocked_salter.call_count == 0
 
-    def test_one_stdin_mode_gen_salt(self, mocker):
+    def test_one_stdin_mode_bulk_salts(self, mocker, capsys):
         mocker.patch('scram.scrammer.input', side_effect=['pencil', ''])
         mocked_salter = mocker.patch('scram.scrammer.gen_salt', return_value=self.SALT)
-        scrammer.main([])
-        assert mocked_salter.call_count == 1
+        scrammer.main(['--format', 'hashcat'])
+        assert mocked_salter.call_count == 0
+        assert len(capsys.readouterr().out.split()) == 1
 
-    def test_multi_stdin_mode_gen_salt(self, mocker):
+    def test_multi_stdin_mode_bulk_salts(self, mocker, capsys):
         mocker.patch('scram.scrammer.input', side_effect=['pencil'] * 10 + [''])
         mocked_salter = mocker.patch('scram.scrammer.gen_salt', return_value=self.SALT)
-        scrammer.main([])
-        assert mocked_salter.call_count == 10
+        scrammer.main(['--format', 'hashcat'])
+        assert mocked_salter.call_count == 0
+        assert len({record.split(':')[1] for record in capsys.readouterr().out.split()}) == 10
 
     def test_one_stdin_mode_no_gen_salt(self, mocker):
         mocker.patch('scram.scrammer.input', side_effect=['pencil', ''])
@@ -219,9 +252,7 @@ class TestScriptOutput:
     PENCIL_SALT = 'QSXCR+Q6sek8bf92'
     PENCIL_HEX = 'e9d94660c39d65c38fbad91c358f14da0eef2bd6'
     SMALL_DICT_SALT = '1234'
-    SMALL_DICT_HEX = ['c89a8efabda245d57e178bbf1b23a0fb282301f7', '7bcc94a7fad21b166a46ea5f6e7ace3a53f83583',
-                      '1907d2a38a46200722a30e9f2c3c20edf20a051e', 'd63705b127777e7aa8ace460a5aa1c6a91051a55',
-                      '29a7bca35ab4817e9460506912c1d3e69c8efcb0']
+    SMALL_DICT_HEX = SMALL_DICT_HEX
 
     def test_pencil_scram(self, capsys):
         args = ['pencil', '-s', 'QSXCR+Q6sek8bf92']
@@ -247,6 +278,20 @@ class TestScriptOutput:
         out = captured.out
         assert out.strip() == '4096:QSXCR+Q6sek8bf92:6dlGYMOdZcOPutkcNY8U2g7vK9Y='
 
+    def test_pencil_multiple_iterations(self, capsys):
+        scrammer_args = ['pencil', '-s', 'QSXCR+Q6sek8bf92', '--format', 'hashcat', '-i', '4096,2']
+        scrammer.main(scrammer_args)
+        out = capsys.readouterr().out.split()
+        assert len(out) == 2
+        assert out[0].startswith('2:QSXCR+Q6sek8bf92:')
+        assert out[1] == '4096:QSXCR+Q6sek8bf92:6dlGYMOdZcOPutkcNY8U2g7vK9Y='
+
+    def test_pencil_credential(self, capsys):
+        scrammer_args = ['pencil', '-s', 'QSXCR+Q6sek8bf92', '--format', 'credential']
+        scrammer.main(scrammer_args)
+        out = capsys.readouterr().out
+        assert out.strip() == 'SCRAM-SHA-1$4096:QSXCR+Q6sek8bf92$6dlGYMOdZcOPutkcNY8U2g7vK9Y=:D+CSWLOshSulAsxiupA+qs2/fTE='
+
     def test_pencil_b64(self, capsys):
         scrammer_args = ['pencil', '-s', 'QSXCR+Q6sek8bf92', '--format', 'b64']
         scrammer.main(scrammer_args)
@@ -267,6 +312,13 @@ class TestScriptOutput:
             line = line.strip()
             assert line == correct[ind]
 
+    def test_small_dictionary_jobs(self, capsys):
+        file_path = RESOURCES / 'small_dictionary.txt'
+        scrammer_args = ['-f', str(file_path), '-s', '1234', '--jobs', '2', '--chunk-size', '1']
+        scrammer.main(scrammer_args)
+        out = capsys.readouterr().out
+        assert out.split() == self.SMALL_DICT_HEX
+
     def test_stdin_pencil_to_stdout(self, mocker, capsys):
         mocked_input = mocker.patch('scram.scrammer.input')
         mocked_input.side_effect = ['pencil', '']
@@ -286,6 +338,27 @@ class TestScriptOutput:
             line = content.read().split()[0]
             assert line == self.PENCIL_HEX
 
+    def test_stdin_interrupt_keeps_output(self, mocker, tmp_path):
+        mocked_input = mocker.patch('scram.scrammer.input')
+        mocked_input.side_effect = ['pencil', KeyboardInterrupt('inter')]
+        file = tmp_path / 'stdin_interrupt.txt'
+        scrammer.main(['-s', self.PENCIL_SALT, '-o', str(file)])
+        with open(file) as content:
+            assert content.read().split() == [self.PENCIL_HEX]
+
+    def test_small_dictionary_to_file(self, tmp_path):
+        file_path = RESOURCES / 'small_dictionary.txt'
+        file = tmp_path / 'file_to_file.txt'
+        scrammer.main(['-f', str(file_path), '-s', self.SMALL_DICT_SALT, '-o', str(file)])
+        with open(file) as content:
+            assert content.read().split() == self.SMALL_DICT_HEX
+
+    def test_pencil_to_file(self, tmp_path):
+        file = tmp_path / 'single.txt'
+        scrammer.main(['pencil', '-s', self.PENCIL_SALT, '-o', str(file)])
+        with open(file) as content:
+            assert content.read().strip() == self.PENCIL_HEX
+
     def test_stdin_multiple_to_stdout(self, mocker, capsys):
         """
         tests for interactive input
@@ -327,3 +400,30 @@ class TestScriptOutput:
             for ind, line in lines:
                 assert line == self.SMALL_DICT_HEX[ind]
 
+
+class TestStartup:
+    def test_single_mode_imports(self):
+        code = ('import sys; from scram.scrammer import main; '
+                "main(['pencil', '-s', 'QSXCR+Q6sek8bf92', '-i', '1']); "
+                "print(*sorted(name for name in ['cryptography', 'multiprocessing', 'sqlite3', 'numpy', "
+                "'scram.audit', 'scram.table', 'scram.wordlist'] if name in sys.modules))")
+        out = subprocess.run([sys.executable, '-c', code], stdout=PIPE, encoding='utf8', check=True).stdout
+        assert out.splitlines()[-1].strip() == ''
+
+    def test_single_mode_backend(self, mocker, capsys):
+        from scram import backends
+        active = backends.get_backend()
+        used = []
+        mocker.patch('scram.scrammer.single_mode', side_effect=lambda args: used.append(backends.get_backend().name))
+        scrammer.main(['pencil', '-s', 'QSXCR+Q6sek8bf92'])
+        assert used == [scrammer.SINGLE_MODE_BACKEND]
+        # only for that run
+        assert backends.get_backend() is active
+        mocker.stopall()
+        scrammer.main(['pencil', '-s', 'QSXCR+Q6sek8bf92'])
+        assert capsys.readouterr().out.strip() == 'e9d94660c39d65c38fbad91c358f14da0eef2bd6'
+
+    def test_single_mode_long_derivation(self, mocker):
+        using_backend = mocker.patch('scram.scrammer.using_backend')
+        scrammer.main(['pencil', '-s', 'QSXCR+Q6sek8bf92', '-i', f'1,{scrammer.SINGLE_MODE_MAX_ITERATIONS}'])
+        using_backend.assert_not_called()
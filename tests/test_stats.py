@@ -0,0 +1,52 @@
+from scram import scrammer, stats
+from tests.conftest import SMALL_DICT
+
+
+def test_snapshot_eta():
+    run = stats.RunStats(total_bytes=100, position=lambda: 25)
+    run.lines = 10
+    snapshot = run.snapshot()
+    assert snapshot['lines'] == 10
+    assert snapshot['bytes_read'] == 25
+    assert snapshot['eta'] is not None and snapshot['eta'] >= 0
+    assert set(stats.STAGES) <= set(snapshot['stages'])
+
+
+def test_timed_and_written():
+    run = stats.RunStats()
+    records = list(run.written(run.timed('read', ['a', 'b', 'c'])))
+    assert records == ['a', 'b', 'c']
+    assert run.lines == 3
+
+
+def test_format_snapshot():
+    run = stats.RunStats(total_bytes=100, position=lambda: 50)
+    assert 'ETA' in stats.format_snapshot(run.snapshot())
+    assert stats.format_snapshot(run.snapshot(final=True)).startswith('[stats] done')
+
+
+def test_stats_callback():
+    snapshots = []
+    scrammer.main(['-f', str(SMALL_DICT), '-s', '1234'], stats_callback=snapshots.append)
+    final = snapshots[-1]
+    assert final['final']
+    assert final['lines'] == 5
+    assert final['bytes_read'] == final['total_bytes'] == SMALL_DICT.stat().st_size
+    assert final['stages']['pbkdf2'] > 0
+
+
+def test_stats_flag(capsys):
+    scrammer.main(['-f', str(SMALL_DICT), '-s', '1234', '--stats'])
+    captured = capsys.readouterr()
+    assert len(captured.out.split()) == 5
+    assert '[stats] done, 5 lines' in captured.err
+
+
+def test_stats_count_rule_candidates():
+    snapshots = []
+    scrammer.main(['-f', str(SMALL_DICT), '-s', '1234', '-i', '1,2', '--rules', 'case'],
+                  stats_callback=snapshots.append)
+    final = snapshots[-1]
+    assert final['lines'] == 5
+    # johnny, walker, porsche, ligma and avatar each expand to 3 case candidates, hashed at 2 counts
+    assert final['hashes'] == 5 * 3 * 2
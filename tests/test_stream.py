@@ -0,0 +1,140 @@
+import io
+import select
+import subprocess
+import sys
+import pytest
+from scram import scrammer
+from scram.stream import BlockLineReader, RecordWriter
+
+PENCIL_SALT = 'QSXCR+Q6sek8bf92'
+PENCIL_1 = '11a29dce5d2903e46e9ecbf681ef1d52fb9217c7'
+EMPTY_1 = '54cb414ede04300c2bcf7dd01589628d4d28c968'
+INPUT = b'pencil\n\npencil\r\nlast'
+
+
+class Recorder(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+@pytest.mark.parametrize('block_size', [1, 3, 1 << 16])
+@pytest.mark.parametrize('empty, expected', [('skip', [b'pencil', b'pencil', b'last']),
+                                             ('stop', [b'pencil']),
+                                             ('hash', [b'pencil', b'', b'pencil', b'last'])])
+def test_block_line_reader(block_size, empty, expected):
+    reader = BlockLineReader(io.BytesIO(INPUT), block_size, empty)
+    assert list(reader) == expected
+    if empty != 'stop':
+        assert reader.bytes_read == len(INPUT)
+
+
+def test_block_line_reader_unicode_whitespace():
+    # stripped like the text paths, see wordlist.strip_line
+    reader = BlockLineReader(io.BytesIO('pencil\u00a0\n\u3000pencil'.encode('utf8')), block_size=5)
+    assert list(reader) == [b'pencil', b'pencil']
+
+
+def test_block_line_reader_arguments():
+    with pytest.raises(ValueError):
+        BlockLineReader(io.BytesIO(), 0)
+    with pytest.raises(ValueError):
+        BlockLineReader(io.BytesIO(), empty='ignore')
+
+
+def test_record_writer_flushes_on_size():
+    raw = Recorder()
+    writer = RecordWriter(raw, flush_size=10, flush_interval=3600)
+    writer.write('abcd\n')
+    assert raw.getvalue() == b''
+    assert writer.tell() == 5
+    writer.write('efghij\n')
+    assert raw.getvalue() == b'abcd\nefghij\n'
+    writer.write('k\n')
+    writer.flush()
+    assert raw.getvalue() == b'abcd\nefghij\nk\n'
+    assert raw.writes == 2
+
+
+def test_record_writer_flushes_on_age():
+    raw = Recorder()
+    writer = RecordWriter(raw, flush_size=1 << 20, flush_interval=0)
+    writer.write('abcd\n')
+    assert raw.getvalue() == b'abcd\n'
+
+
+@pytest.mark.parametrize('extra', [[], ['--jobs', '2', '--chunk-size', '1'], ['--empty', 'hash']])
+def test_stream_mode(tmp_path, monkeypatch, extra):
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(INPUT)))
+    output = tmp_path / 'out.txt'
+    scrammer.main(['--stream', '-s', PENCIL_SALT, '-i', '1', '-o', str(output), '--block-size', '4'] + extra)
+    lines = output.read_text().split()
+    if '--empty' in extra:
+        assert lines[:3] == [PENCIL_1, EMPTY_1, PENCIL_1]
+    else:
+        assert lines[:2] == [PENCIL_1, PENCIL_1]
+    assert len(lines) == (4 if '--empty' in extra else 3)
+
+
+def test_stream_pipe():
+    lines = b''.join(b'pencil\n\n' for _ in range(500))
+    proc = subprocess.run([sys.executable, '-c', 'from scram.scrammer import main; main()', '--stream', '-s',
+                           PENCIL_SALT, '-i', '1', '--flush-size', '100'], input=lines, stdout=subprocess.PIPE,
+                          check=True)
+    assert proc.stdout.decode('utf8').split('\n') == [PENCIL_1] * 500 + ['']
+
+
+def test_block_line_reader_on_wait():
+    waits = []
+    reader = BlockLineReader(io.BytesIO(b'a\nb\n'), block_size=2, on_wait=lambda: waits.append(reader.bytes_read))
+    assert list(reader) == [b'a', b'b']
+    # an in-memory stream cannot be polled, every read is treated as one that may wait
+    assert waits == [0, 2, 4]
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='polls a pipe')
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_stream_idle_producer_flushes(jobs):
+    proc = subprocess.Popen([sys.executable, '-c', 'from scram.scrammer import main; main()', '--stream', '-s',
+                             PENCIL_SALT, '-i', '1', '--flush-interval', '60', '-j', jobs], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE)
+    try:
+        proc.stdin.write(b'pencil\n')
+        proc.stdin.flush()
+        # the producer stays open, the record must not wait for the next line or the interval
+        assert select.select([proc.stdout], [], [], 30)[0]
+        assert proc.stdout.readline().decode('utf8').strip() == PENCIL_1
+    finally:
+        proc.stdin.close()
+        proc.wait(30)
+        proc.stdout.close()
+
+
+def test_block_line_reader_idle():
+    reader = BlockLineReader(io.BytesIO(b'a\nb\nc'), block_size=4)
+    lines = iter(reader)
+    assert reader.idle()
+    assert next(lines) == b'a'
+    # b is still buffered, c needs another read
+    assert not reader.idle()
+    assert next(lines) == b'b'
+    assert reader.idle()
+
+
+def test_stdin_empty_policy(mocker, capsys):
+    mocker.patch('scram.scrammer.input', side_effect=['pencil', '', 'pencil', EOFError()])
+    scrammer.main(['-s', PENCIL_SALT, '-i', '1', '--empty', 'skip'])
+    assert capsys.readouterr().out.split() == [PENCIL_1, PENCIL_1]
+
+
+def test_stream_arguments():
+    assert scrammer.parse_args(['--stream']).empty == 'skip'
+    assert scrammer.parse_args([]).empty == 'stop'
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(['--stream', 'pencil'])
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(['--stream', '--block-size', '0'])
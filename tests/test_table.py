@@ -0,0 +1,122 @@
+from base64 import b64decode
+import io
+import pytest
+from scram import scrammer
+from scram.table import (RECORD, Table, TableHeader, parse_stored_key, read_header, read_line, read_table_header,
+                         sort_table, write_table)
+from tests.conftest import SMALL_DICT, SMALL_DICT_HEX, SMALL_DICT_WORDS
+
+
+def build_table(tmp_path, *extra):
+    table = tmp_path / 'words.tbl'
+    scrammer.main(['-f', str(SMALL_DICT), '-s', '1234', '--format', 'binary', '-o', str(table)] + list(extra))
+    return table
+
+
+def records(path):
+    header = read_table_header(str(path))
+    data = path.read_bytes()[header.size:]
+    return [RECORD.unpack_from(data, position) for position in range(0, len(data), RECORD.size)]
+
+
+def test_header_round_trip():
+    header = TableHeader(b'\x01\x02\x03', 4096, 7, True)
+    assert read_header(header.pack()) == header
+    with pytest.raises(ValueError):
+        read_header(b'NOTATABLE' + bytes(40))
+    with pytest.raises(ValueError):
+        read_header(header.pack()[:-1])
+
+
+def test_write_table_counts_records():
+    file = io.BytesIO()
+    count = write_table(file, [RECORD.pack(bytes(20), offset) for offset in range(3)], b'salt', 1)
+    assert count == 3
+    header = read_header(file.getvalue())
+    assert header == TableHeader(b'salt', 1, 3, False)
+    assert len(file.getvalue()) == header.size + 3 * RECORD.size
+
+
+@pytest.mark.parametrize('extra', [[], ['--jobs', '2', '--chunk-size', '1']])
+def test_binary_format(tmp_path, extra):
+    table = build_table(tmp_path, *extra)
+    header = read_table_header(str(table))
+    assert header == TableHeader(b64decode('1234'), 4096, 5, False)
+    rows = records(table)
+    assert [digest.hex() for digest, _ in rows] == SMALL_DICT_HEX
+    with open(SMALL_DICT, 'rb') as wordlist:
+        assert [read_line(wordlist, offset) for _, offset in rows] == SMALL_DICT_WORDS
+
+
+@pytest.mark.parametrize('max_records', [1, 2, 100])
+def test_sort_table(tmp_path, max_records):
+    table = build_table(tmp_path)
+    sorted_path = tmp_path / 'words.idx'
+    header = sort_table(str(table), str(sorted_path), max_records)
+    assert header.sorted and header.count == 5
+    assert records(sorted_path) == sorted(records(table))
+    assert read_table_header(str(sorted_path)).sorted
+
+
+def test_find(tmp_path):
+    table = build_table(tmp_path)
+    scrammer.main(['index', str(table)])
+    with Table(str(table)) as index, open(SMALL_DICT, 'rb') as wordlist:
+        assert len(index) == 5
+        for word, stored_key in zip(SMALL_DICT_WORDS, SMALL_DICT_HEX):
+            offsets = index.find(bytes.fromhex(stored_key))
+            assert [read_line(wordlist, offset) for offset in offsets] == [word]
+        assert index.find(bytes(20)) == []
+        assert index.find(b'\xff' * 20) == []
+
+
+def test_find_duplicates(tmp_path):
+    wordlist = tmp_path / 'words.txt'
+    wordlist.write_text('pencil\nother\npencil\n')
+    table = tmp_path / 'words.tbl'
+    scrammer.main(['-f', str(wordlist), '-s', 'QSXCR+Q6sek8bf92', '--format', 'binary', '-o', str(table)])
+    scrammer.main(['index', str(table)])
+    with Table(str(table)) as index:
+        assert index.find(bytes.fromhex('e9d94660c39d65c38fbad91c358f14da0eef2bd6')) == [0, 13]
+
+
+def test_read_line_unicode_whitespace(tmp_path):
+    wordlist = tmp_path / 'words.txt'
+    wordlist.write_bytes('other\npencil\u00a0\n'.encode('utf8'))
+    with open(wordlist, 'rb') as file:
+        assert read_line(file, 6) == b'pencil'
+
+
+def test_unsorted_table_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        Table(str(build_table(tmp_path)))
+
+
+def test_lookup_command(tmp_path, capsys):
+    table = build_table(tmp_path)
+    assert scrammer.main(['index', str(table), '-o', str(tmp_path / 'words.idx')]) == 0
+    code = scrammer.main(['lookup', str(tmp_path / 'words.idx'), str(SMALL_DICT), SMALL_DICT_HEX[3],
+                          'Kae8o1q0gX6UYFBpEsHT5pyO/LA='])
+    assert code == 0
+    assert capsys.readouterr().out.split() == [f'{SMALL_DICT_HEX[3]}:ligma', 'Kae8o1q0gX6UYFBpEsHT5pyO/LA=:avatar']
+    assert scrammer.main(['lookup', str(tmp_path / 'words.idx'), str(SMALL_DICT), '00' * 20]) == 1
+
+
+def test_parse_stored_key():
+    assert parse_stored_key(SMALL_DICT_HEX[0]) == bytes.fromhex(SMALL_DICT_HEX[0])
+    with pytest.raises(ValueError):
+        parse_stored_key('not a key')
+
+
+def test_plaintext_named_like_a_command(capsys):
+    scrammer.main(['-s', '1234', '-i', '1', '--', 'index'])
+    assert len(capsys.readouterr().out.strip()) == 40
+
+
+@pytest.mark.parametrize('args', [['-f', str(SMALL_DICT), '--format', 'binary', '-o', 'out.tbl'],
+                                  ['-f', str(SMALL_DICT), '-s', '1234', '--format', 'binary'],
+                                  ['-f', str(SMALL_DICT), '-s', '1234', '--format', 'binary', '-o', 'out.tbl',
+                                   '-i', '1,2']])
+def test_binary_format_arguments(args):
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(args)
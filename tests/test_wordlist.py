@@ -0,0 +1,77 @@
+import codecs
+import locale
+import pytest
+from scram import scrammer
+from scram.wordlist import MappedWordlist, strip_line
+from tests.conftest import SMALL_DICT, SMALL_DICT_HEX, SMALL_DICT_WORDS
+
+
+def test_reader_lines():
+    with MappedWordlist(str(SMALL_DICT)) as wordlist:
+        reader = wordlist.reader()
+        assert list(reader) == SMALL_DICT_WORDS
+        assert reader.bytes_read == wordlist.size
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 5, 7, 40])
+def test_shards_cover_every_line_once(count):
+    with MappedWordlist(str(SMALL_DICT)) as wordlist:
+        shards = wordlist.shards(count)
+        assert shards[0][0] == 0 and shards[-1][1] == wordlist.size
+        lines = []
+        for start, end in shards:
+            assert start in (0, wordlist.size) or wordlist.data[start - 1:start] == b'\n'
+            lines.extend(wordlist.reader(start, end))
+    assert lines == SMALL_DICT_WORDS
+
+
+def test_crlf_and_empty(tmp_path):
+    path = tmp_path / 'crlf.txt'
+    path.write_bytes(b'one\r\ntwo\r\n')
+    with MappedWordlist(str(path)) as wordlist:
+        assert list(wordlist.reader()) == [b'one', b'two']
+    empty = tmp_path / 'empty.txt'
+    empty.write_bytes(b'')
+    with MappedWordlist(str(empty)) as wordlist:
+        assert list(wordlist.reader()) == []
+        assert wordlist.shard(0, 2) == (0, 0)
+
+
+@pytest.mark.parametrize('line', ['pencil\u00a0', '\u3000pencil \r\n', 'pencil\x1c', 'caf\u00e9', '\u00a0'])
+def test_strip_line_like_text(line):
+    assert strip_line(line.encode('utf8')) == line.strip().encode('utf8')
+
+
+def test_strip_line_invalid_utf8():
+    assert strip_line(b' pencil\xa0 ') == b'pencil\xa0'
+
+
+@pytest.mark.skipif(codecs.lookup(locale.getpreferredencoding(False)).name != 'utf-8',
+                    reason='the text path decodes with the locale encoding')
+def test_mmap_unicode_whitespace(tmp_path, capsys):
+    path = tmp_path / 'nbsp.txt'
+    path.write_bytes('pencil\u00a0\n\u2003johnny\n'.encode('utf8'))
+    base = ['-f', str(path), '-s', 'QSXCR+Q6sek8bf92']
+    scrammer.main(base)
+    text = capsys.readouterr().out
+    scrammer.main(base + ['--mmap'])
+    assert capsys.readouterr().out == text
+    assert text.split()[0] == 'e9d94660c39d65c38fbad91c358f14da0eef2bd6'
+
+
+def test_bad_shard_arg():
+    with pytest.raises(SystemExit):
+        scrammer.parse_args(['-f', 'hi.txt', '--shard', '0/2'])
+
+
+def test_mmap_mode(capsys):
+    scrammer.main(['-f', str(SMALL_DICT), '-s', '1234', '--mmap'])
+    assert capsys.readouterr().out.split() == SMALL_DICT_HEX
+
+
+def test_shard_mode(capsys):
+    out = []
+    for shard in ('1/3', '2/3', '3/3'):
+        scrammer.main(['-f', str(SMALL_DICT), '-s', '1234', '--shard', shard])
+        out.extend(capsys.readouterr().out.split())
+    assert out == SMALL_DICT_HEX